@@ -0,0 +1,300 @@
+import argparse
+import asyncio
+import cProfile
+import json
+import os
+import pstats
+import random
+import tempfile
+from time import perf_counter
+from typing import Any, Dict
+from utils import FakeBackend, MTRAIGBENCH, load_backend, load_checkpoint, load_dead_letter, load_prompt_registry, load_rate_limiter, load_retry_policy, load_tracer
+
+from main import evaluate, generate_insight, stream_generate_and_evaluate
+from mt_raig_eval._load_config import JUDGE_MODEL_NAME
+
+
+STAGES = [
+    'generate_insight',
+    'table_aware_insight_decomposition', 'claim_verification',
+    'question_aware_insight_decomposition_pred', 'question_aware_insight_decomposition_gt', 'topic_semantic_matching'
+]
+
+# Functions whose cumulative time is reported with --profile (`sorted` covers the key regroups, `append` the checkpoint writes)
+PROFILED_FUNCTIONS = ['sorted', 'serialize_table', '_render_table', 'render_prompt', 'extract_from_numbered_list', 'collect_evaluation_results', 'append']
+
+TYPES = ['Analysis & Summary', 'Comparison & Relationship', 'Performance & Outcome', 'Trend & Pattern']
+
+
+def write_synthetic_bench(
+    path_dir: str,
+    num_of_items: int,
+    num_of_tables: int,
+    tables_per_item: int,
+    num_of_rows: int,
+    num_of_columns: int,
+    seed: int=0
+    ):
+    """Synthetic MT-RAIG Bench writing (benchmark, table corpus and retrieval results in the original layout)"""
+    rng = random.Random(seed)
+
+    table_corpus = [
+        {
+            'id': f'table_{table_idx}',
+            'title': f'synthetic table {table_idx}',
+            'header': [f'column {column_idx + 1}' for column_idx in range(num_of_columns)],
+            'cell': [
+                [f'entity {row_idx + 1}'] + [str(rng.randint(0, 10000)) for _ in range(num_of_columns - 1)]
+                for row_idx in range(num_of_rows)
+            ]
+        }
+        for table_idx in range(num_of_tables)
+    ]
+
+    retrieved_table_ids_set = [
+        [table['id'] for table in rng.sample(table_corpus, min(tables_per_item, num_of_tables))]
+        for _ in range(num_of_items)
+    ]
+
+    benchmark = [
+        {
+            'gold_table_id_set': table_ids[:rng.randint(1, min(3, len(table_ids)))],
+            'question': f'How do the values of synthetic question {idx} compare across the tables?',
+            'insight': f'Synthetic insight {idx}. The first table leads on column 2. The values rise over the rows.',
+            'type': TYPES[idx % len(TYPES)]
+        }
+        for idx, table_ids in enumerate(retrieved_table_ids_set)
+    ]
+
+    for file_name, data in [('benchmark.json', benchmark), ('table_corpus.json', table_corpus), ('dpr_top_10_retrieved_table_ids_set.json', retrieved_table_ids_set)]:
+        with open(f'{path_dir}/{file_name}', 'w') as file:
+            json.dump(data, file)
+
+
+def profile_summary(profiler: cProfile.Profile) -> Dict[str, Dict[str, float]]:
+    """Number of calls and cumulative time of the profiled functions"""
+    summary = dict()
+
+    for (_, _, function_name), (_, num_of_calls, _, cumulative_time, _) in pstats.Stats(profiler).stats.items():
+        name = function_name.strip('<>').split(' ')[-1].split('.')[-1]
+        if name in PROFILED_FUNCTIONS:
+            entry = summary.setdefault(name, {'num_of_calls': 0, 'cumulative_seconds': 0.0})
+            entry['num_of_calls'] += num_of_calls
+            entry['cumulative_seconds'] += cumulative_time
+
+    return summary
+
+
+def run(
+    mt_raig_bench: MTRAIGBENCH,
+    model_name: str,
+    checkpoint_dir: str,
+    streaming: bool=False,
+    queue_size: int=64
+    ) -> Dict[str, Any]:
+    """Orchestration run (generation then evaluation, or both pipelined) with per-phase timing"""
+    checkpoints = {stage: load_checkpoint(path_dir=checkpoint_dir, stage=stage) for stage in STAGES}
+    phase_seconds = dict()
+
+    started_at = perf_counter()
+    num_of_serialized_tables = mt_raig_bench.precompute_serialized_tables()
+    phase_seconds['serialization'] = perf_counter() - started_at
+
+    if streaming:
+        started_at = perf_counter()
+        faithfulness_score_set, completeness_score_set = asyncio.run(stream_generate_and_evaluate(
+            mt_raig_bench=mt_raig_bench,
+            model_name=model_name,
+            flag='openai',
+            checkpoints=checkpoints,
+            queue_size=queue_size
+        ))
+        phase_seconds['generation_and_evaluation'] = perf_counter() - started_at
+
+    else:
+        started_at = perf_counter()
+        generated_insight_set = generate_insight(
+            retrieved_tables_set=mt_raig_bench.retrieved_tables_set,
+            benchmark=[data for data in mt_raig_bench],
+            model_name=model_name,
+            flag='openai',
+            checkpoint=checkpoints['generate_insight']
+        )
+        phase_seconds['generation'] = perf_counter() - started_at
+
+        started_at = perf_counter()
+        faithfulness_score_set, completeness_score_set = evaluate(
+            inputs={
+                'predicted_insight_set': [output['response'] for output in generated_insight_set],
+                'ground_truth_insight_set': [data['insight'] for data in mt_raig_bench],
+                'question_set': [data['question'] for data in mt_raig_bench],
+                'retrieved_tables_set': mt_raig_bench.retrieved_tables_set
+            },
+            checkpoints=checkpoints
+        )
+        phase_seconds['evaluation'] = perf_counter() - started_at
+
+    num_of_outputs = {stage: len(checkpoint) for stage, checkpoint in checkpoints.items()}
+
+    for checkpoint in checkpoints.values():
+        checkpoint.close()
+
+    # Items excluded because of failed calls have no score
+    faithfulness_score_set = [score for score in faithfulness_score_set if score is not None]
+    completeness_score_set = [score for score in completeness_score_set if score is not None]
+
+    return {
+        'num_of_serialized_tables': num_of_serialized_tables,
+        'phase_seconds': phase_seconds,
+        'num_of_outputs': num_of_outputs,
+        'mean_faithfulness_score': sum(faithfulness_score_set) / max(1, len(faithfulness_score_set)),
+        'mean_completeness_score': sum(completeness_score_set) / max(1, len(completeness_score_set))
+    }
+
+
+def throughput(run_results: Dict[str, Any], num_of_items: int) -> Dict[str, float]:
+    """Items per second of each phase and outputs per second of each stage within its phase"""
+    phase_seconds = run_results['phase_seconds']
+    items_per_second = {phase: num_of_items / seconds for phase, seconds in phase_seconds.items() if phase != 'serialization' and seconds > 0}
+
+    for stage, num_of_outputs in run_results['num_of_outputs'].items():
+        phase = 'generation_and_evaluation' if 'generation_and_evaluation' in phase_seconds else 'generation' if stage == 'generate_insight' else 'evaluation'
+        if phase_seconds[phase] > 0:
+            items_per_second[stage] = num_of_outputs / phase_seconds[phase]
+
+    return items_per_second
+
+
+def main(
+    num_of_items: int=100,
+    num_of_tables: int=None,
+    tables_per_item: int=10,
+    num_of_claims: int=3,
+    num_of_rows: int=10,
+    num_of_columns: int=5,
+    latency: float=0.05,
+    error_rate: float=0.0,
+    rate_limit_rate: float=0.0,
+    seed: int=0,
+    streaming: bool=False,
+    queue_size: int=64,
+    profile: bool=False,
+    output_path: str='benchmark_report.json'
+    ):
+    model_name = 'gpt-4o-2024-08-06'
+    num_of_tables = num_of_tables or max(tables_per_item, num_of_items * tables_per_item // 2)
+
+    backend = load_backend(backend=FakeBackend(
+        latency=latency,
+        error_rate=error_rate,
+        rate_limit_rate=rate_limit_rate,
+        num_of_claims=num_of_claims,
+        seed=seed
+    ))
+    load_prompt_registry()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.makedirs(f'{temp_dir}/bench')
+        write_synthetic_bench(
+            path_dir=f'{temp_dir}/bench',
+            num_of_items=num_of_items,
+            num_of_tables=num_of_tables,
+            tables_per_item=tables_per_item,
+            num_of_rows=num_of_rows,
+            num_of_columns=num_of_columns,
+            seed=seed
+        )
+        mt_raig_bench = MTRAIGBENCH(path_dir=f'{temp_dir}/bench')
+
+        profiler = cProfile.Profile() if profile else None
+        if profiler is not None:
+            profiler.enable()
+
+        started_at = perf_counter()
+        run_results = run(mt_raig_bench=mt_raig_bench, model_name=model_name, checkpoint_dir=f'{temp_dir}/checkpoints', streaming=streaming, queue_size=queue_size)
+        wall_seconds = perf_counter() - started_at
+
+        if profiler is not None:
+            profiler.disable()
+
+    rate_limiters = {'generator': load_rate_limiter(model_name=model_name), 'judge': load_rate_limiter(model_name=JUDGE_MODEL_NAME)}
+
+    report = {
+        'config': {
+            'num_of_items': num_of_items,
+            'num_of_tables': num_of_tables,
+            'tables_per_item': tables_per_item,
+            'num_of_claims': num_of_claims,
+            'num_of_rows': num_of_rows,
+            'num_of_columns': num_of_columns,
+            'latency': latency,
+            'error_rate': error_rate,
+            'rate_limit_rate': rate_limit_rate,
+            'seed': seed,
+            'streaming': streaming,
+            'queue_size': queue_size
+        },
+        'wall_seconds': wall_seconds,
+        **run_results,
+        'items_per_second': throughput(run_results=run_results, num_of_items=num_of_items),
+        # Simulated I/O summed over calls (overlapping calls count separately) against the serialization time
+        'io_wait_seconds': backend.latency_seconds,
+        'serialization_seconds': run_results['phase_seconds']['serialization'],
+        'semaphore_occupancy': {
+            name: {
+                'max_concurrency': rate_limiter.max_concurrency,
+                'peak_in_flight': rate_limiter.peak_in_flight,
+                'mean_in_flight': rate_limiter.busy_seconds / wall_seconds if wall_seconds > 0 else 0.0
+            }
+            for name, rate_limiter in rate_limiters.items()
+        },
+        'backend': backend.stats(),
+        'num_of_retries': load_retry_policy().num_of_retries + load_retry_policy(sweep=True).num_of_retries,
+        'num_of_rate_limited': sum(rate_limiter.num_of_rate_limited for rate_limiter in rate_limiters.values()),
+        'num_of_dead_letters': len(load_dead_letter()),
+        'trace': load_tracer().summary()
+    }
+
+    if profiler is not None:
+        report['profile'] = profile_summary(profiler=profiler)
+
+    with open(output_path, 'w') as file:
+        json.dump(report, file, indent=4)
+
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-of-items', type=int, default=100)
+    parser.add_argument('--num-of-tables', type=int, default=None)
+    parser.add_argument('--tables-per-item', type=int, default=10)
+    parser.add_argument('--num-of-claims', type=int, default=3)
+    parser.add_argument('--num-of-rows', type=int, default=10)
+    parser.add_argument('--num-of-columns', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--streaming', action='store_true')
+    parser.add_argument('--queue-size', type=int, default=64)
+    parser.add_argument('--profile', action='store_true')
+    parser.add_argument('--output-path', type=str, default='benchmark_report.json')
+    args, _ = parser.parse_known_args()
+
+    main(
+        num_of_items=args.num_of_items,
+        num_of_tables=args.num_of_tables,
+        tables_per_item=args.tables_per_item,
+        num_of_claims=args.num_of_claims,
+        num_of_rows=args.num_of_rows,
+        num_of_columns=args.num_of_columns,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+        streaming=args.streaming,
+        queue_size=args.queue_size,
+        profile=args.profile,
+        output_path=args.output_path
+    )
\ No newline at end of file
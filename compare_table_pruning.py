@@ -0,0 +1,51 @@
+import argparse
+import asyncio
+import json
+from mt_raig_eval import compare_table_pruning, load_decomposed_claims_set
+from utils import load_mt_raig_bench, load_prompt_registry, load_response_cache
+
+
+def main(baseline: str, path_dir: str, pruning_token_budget: int, checkpoint_dir: str='checkpoints', num_of_items: int=50, cache_path: str=None):
+    mt_raig_bench = load_mt_raig_bench(path_dir=path_dir)
+    load_prompt_registry()
+    response_cache = load_response_cache(path=cache_path)
+
+    # Claims come from the table-aware insight decomposition checkpoint of a previous run
+    key_set, decomposed_claims_set = load_decomposed_claims_set(path_dir=f'{checkpoint_dir}/{baseline}', num_of_items=num_of_items)
+
+    comparison = asyncio.run(compare_table_pruning(
+        decomposed_claims_set=decomposed_claims_set,
+        retrieved_tables_set=[mt_raig_bench.retrieved_tables_set[key] for key in key_set],
+        pruning_token_budget=pruning_token_budget
+    ))
+    comparison['num_of_items'] = len(key_set)
+    comparison['pruning_token_budget'] = pruning_token_budget
+
+    with open(f'{checkpoint_dir}/{baseline}/table_pruning_comparison.json', 'w') as file:
+        json.dump(comparison, file, indent=4)
+
+    print(json.dumps(comparison, indent=4))
+
+    if response_cache is not None:
+        print(response_cache)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--baseline', type=str, choices=['o3-mini', 'GPT-4o', 'DeepSeek-R1-8B'], required=True)
+    parser.add_argument('--path-dir', type=str, default='mt_raig_bench')
+    parser.add_argument('--pruning-token-budget', type=int, default=1024)
+    parser.add_argument('--checkpoint-dir', type=str, default='checkpoints')
+    parser.add_argument('--num-of-items', type=int, default=50)
+    # Cached calls cost nothing, which would skew the cost comparison; a cache is only used when given
+    parser.add_argument('--cache-path', type=str, default=None)
+    args, _ = parser.parse_known_args()
+
+    main(
+        baseline=args.baseline,
+        path_dir=args.path_dir,
+        pruning_token_budget=args.pruning_token_budget,
+        checkpoint_dir=args.checkpoint_dir,
+        num_of_items=args.num_of_items,
+        cache_path=args.cache_path
+    )
\ No newline at end of file
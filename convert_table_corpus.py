@@ -0,0 +1,17 @@
+import argparse
+import json
+from utils import convert_table_corpus
+
+
+def main(path_dir: str):
+    table_corpus = json.load(open(f'{path_dir}/table_corpus.json', 'r'))
+    num_of_tables = convert_table_corpus(table_corpus=table_corpus, path_dir=path_dir)
+    print(f"{num_of_tables} tables written to {path_dir}/table_corpus.idx and {path_dir}/table_corpus.bin")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--path-dir', type=str, default='mt_raig_bench')
+    args, _ = parser.parse_known_args()
+
+    main(path_dir=args.path_dir)
\ No newline at end of file
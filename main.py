@@ -1,157 +1,443 @@
 import argparse
 import asyncio
-from collections import defaultdict
-from typing import Any, Dict, List, Literal
-from utils import load_batch_size, load_mt_raig_bench
+import json
+from typing import Any, Dict, List, Optional, Tuple, Union
+from utils import Backend, Checkpoint, FakeBackend, MTRAIGBENCH, OpenAIBackend, load_backend, load_batch_size, load_checkpoint, load_dead_letter, load_mt_raig_bench, load_prompt_registry, load_response_cache, load_tracer, load_truncation_report
 from utils_openai import OpenAIGenerator
+from utils_retrieval import retrieve_tables
 from utils_vllm import VLLMGenerator
 
 from mt_raig_eval import (
-    table_aware_insight_decomposition, claim_verification,
-    compute_faithfulness_score,
-    question_aware_insight_decomposition, topic_semantic_matching,
-    compute_completeness_score
+    collect_evaluation_results, evaluate_insight, evaluate_insights, sweep_evaluation_failures,
+    aggregate_scores, compute_faithfulness_score, compute_completeness_score
 )
 
 
-def generate_insight(
-    retrieved_tables_set: List[List[Dict[str, Any]]],
-    benchmark: List[Dict[str, Any]],
+def load_generator(
     model_name: str,
-    flag: str
-    ) -> List[Dict[str, Any]]:
-    """Insight generation"""
-
+    flag: str,
+    continuous_batching: bool=False,
+    window_size: int=0,
+    enable_prefix_caching: bool=False,
+    num_of_workers: int=1,
+    engine: str='vllm'
+    ) -> Union[OpenAIGenerator, VLLMGenerator]:
+    """Generator loading"""
     if flag == 'openai':
         generator_class = OpenAIGenerator
+        generator_params = dict()
     elif flag == 'vllm':
         generator_class = VLLMGenerator
+        generator_params = {
+            'continuous_batching': continuous_batching,
+            'window_size': window_size,
+            'enable_prefix_caching': enable_prefix_caching,
+            'num_of_workers': num_of_workers,
+            'engine': engine
+        }
     else:
         generator_class = None
+        generator_params = dict()
     
-    generator = generator_class(model_name=model_name, batch_size=load_batch_size(flag=flag))
+    return generator_class(model_name=model_name, batch_size=load_batch_size(flag=flag), **generator_params)
+
+
+def generate_insight(
+    retrieved_tables_set: List[List[Dict[str, Any]]],
+    benchmark: List[Dict[str, Any]],
+    model_name: str,
+    flag: str,
+    checkpoint: Checkpoint=None,
+    continuous_batching: bool=False,
+    window_size: int=0,
+    enable_prefix_caching: bool=False,
+    num_of_workers: int=1,
+    engine: str='vllm',
+    pruning_token_budget: int=None,
+    serialization_token_budget: int=None,
+    truncation_policy: str='rank'
+    ) -> List[Dict[str, Any]]:
+    """Insight generation"""
+    generator = load_generator(
+        model_name=model_name,
+        flag=flag,
+        continuous_batching=continuous_batching,
+        window_size=window_size,
+        enable_prefix_caching=enable_prefix_caching,
+        num_of_workers=num_of_workers,
+        engine=engine
+    )
     
-    input_set = generator.preprocess_data(tables_set=retrieved_tables_set, dataset=benchmark)
+    input_set = generator.preprocess_data(
+        tables_set=retrieved_tables_set,
+        dataset=benchmark,
+        pruning_token_budget=pruning_token_budget,
+        serialization_token_budget=serialization_token_budget,
+        truncation_policy=truncation_policy
+    )
+    if serialization_token_budget is not None:
+        for idx, task_input in enumerate(input_set):
+            load_truncation_report()[('generate_insight', idx)] = task_input['num_of_dropped_tokens']
+
     generated_insight_set, _ = generator.generate(
         task=f'{flag}_generate_insight',
-        input_set=input_set
+        input_set=input_set,
+        checkpoint=checkpoint
     )
 
     return generated_insight_set
 
 
+def score(evaluation_results: Dict[str, Any]) -> Tuple[List[Optional[float]], List[Optional[float]]]:
+    """Scoring (faithfulness and completeness; None for items excluded because of failed calls)"""
+    faithfulness_score_set = compute_faithfulness_score(
+        claim_verification_results_with_key=evaluation_results['claim_verification_results_with_key'],
+        num_of_items=len(evaluation_results['decomposed_pred_topics_set'])
+    )
+
+    _, _, completeness_score_set = compute_completeness_score(
+        topic_semantic_matching_results_with_key=evaluation_results['topic_semantic_matching_results_with_key'],
+        decomposed_pred_topics_set=evaluation_results['decomposed_pred_topics_set'],
+        decomposed_gt_topics_set=evaluation_results['decomposed_gt_topics_set']
+    )
+
+    excluded_item_ids = {dimension: set(item_ids) for dimension, item_ids in evaluation_results['excluded_item_ids'].items()}
+    faithfulness_score_set = [None if idx in excluded_item_ids['faithfulness'] else item_score for idx, item_score in enumerate(faithfulness_score_set)]
+    completeness_score_set = [None if idx in excluded_item_ids['completeness'] else item_score for idx, item_score in enumerate(completeness_score_set)]
+
+    return faithfulness_score_set, completeness_score_set
+
+
 def evaluate(
     inputs: Dict[str, Any],
-    demension: Literal['faithfulness', 'completeness']
-    ) -> List[float]:
-    """Evaluation"""
-    if demension == 'faithfulness':
-        decomposed_claims_set, _ = asyncio.run(table_aware_insight_decomposition(
-            predicted_insight_set=inputs['predicted_insight_set'],
-            retrieved_tables_set=inputs['retrieved_tables_set']
-        ))
-        
-        claim_verification_results_with_key, _ = asyncio.run(claim_verification(
-            decomposed_claims_set=decomposed_claims_set,
-            retrieved_tables_set=inputs['retrieved_tables_set']
-        ))
-        
-        score_set = compute_faithfulness_score(
-            claim_verification_results_with_key=claim_verification_results_with_key
-        )
-    
-    elif demension == 'completeness':
-        decomposed_pred_topics_set, _ = asyncio.run(question_aware_insight_decomposition(
-            insight_set=inputs['predicted_insight_set'],
-            question_set=inputs['question_set']
-        ))
-        
-        decomposed_gt_topics_set, _ = asyncio.run(question_aware_insight_decomposition(
-            insight_set=inputs['ground_truth_insight_set'],
-            question_set=inputs['question_set']
-        ))
-        
-        topic_semantic_matching_results_with_key, _ = asyncio.run(topic_semantic_matching(
-            decomposed_pred_topics_set=decomposed_pred_topics_set,
-            decomposed_gt_topics_set=decomposed_gt_topics_set
-        ))
-        
-        _, _, score_set = compute_completeness_score(
-            topic_semantic_matching_results_with_key=topic_semantic_matching_results_with_key,
-            decomposed_pred_topics_set=decomposed_pred_topics_set,
-            decomposed_gt_topics_set=decomposed_gt_topics_set
+    checkpoints: Dict[str, Checkpoint]=None,
+    batched_verification: bool=False,
+    scorer: str='sampling',
+    pruning_token_budget: int=None,
+    serialization_token_budget: int=None,
+    truncation_policy: str='rank'
+    ) -> Tuple[List[Optional[float]], List[Optional[float]]]:
+    """Evaluation (faithfulness and completeness)"""
+    evaluation_results, _ = asyncio.run(evaluate_insights(
+        predicted_insight_set=inputs['predicted_insight_set'],
+        ground_truth_insight_set=inputs['ground_truth_insight_set'],
+        question_set=inputs['question_set'],
+        retrieved_tables_set=inputs['retrieved_tables_set'],
+        checkpoints=checkpoints,
+        batched_verification=batched_verification,
+        scorer=scorer,
+        pruning_token_budget=pruning_token_budget,
+        serialization_token_budget=serialization_token_budget,
+        truncation_policy=truncation_policy,
+        generation_errors=inputs['generation_errors']
+    ))
+
+    return score(evaluation_results=evaluation_results)
+
+
+async def stream_generate_and_evaluate(
+    mt_raig_bench: MTRAIGBENCH,
+    model_name: str,
+    flag: str,
+    checkpoints: Dict[str, Checkpoint]=None,
+    queue_size: int=64,
+    continuous_batching: bool=False,
+    window_size: int=0,
+    enable_prefix_caching: bool=False,
+    num_of_workers: int=1,
+    engine: str='vllm',
+    batched_verification: bool=False,
+    scorer: str='sampling',
+    pruning_token_budget: int=None,
+    serialization_token_budget: int=None,
+    truncation_policy: str='rank'
+    ) -> Tuple[List[Optional[float]], List[Optional[float]]]:
+    """Streaming insight generation and evaluation
+
+    Each generated insight goes straight into evaluation through a bounded queue, so
+    generation and evaluation overlap and at most `queue_size` insights wait in between.
+    """
+    checkpoints = checkpoints or dict()
+    generator = load_generator(
+        model_name=model_name,
+        flag=flag,
+        continuous_batching=continuous_batching,
+        window_size=window_size,
+        enable_prefix_caching=enable_prefix_caching,
+        num_of_workers=num_of_workers,
+        engine=engine
+    )
+    insight_queue = asyncio.Queue(maxsize=queue_size)
+    verification_buffer = dict()
+    item_output_set = []
+
+    def preprocess(idx: int, tables: List[Dict[str, Any]], data: Dict[str, Any]) -> Dict[str, Any]:
+        task_input = generator.preprocess_data(
+            tables_set=[tables],
+            dataset=[data],
+            pruning_token_budget=pruning_token_budget,
+            serialization_token_budget=serialization_token_budget,
+            truncation_policy=truncation_policy
+        )[0]
+        if serialization_token_budget is not None:
+            load_truncation_report()[('generate_insight', idx)] = task_input['num_of_dropped_tokens']
+        return task_input
+
+    async def produce():
+        keyed_input_set = (
+            (idx, preprocess(idx=idx, tables=tables, data=data))
+            for idx, (tables, data) in enumerate(zip(mt_raig_bench.retrieved_tables_set, mt_raig_bench))
         )
-    
-    else:
-        score_set = None
-    
-    return score_set
+        async for task_output in generator.stream_generate(
+            task=f'{flag}_generate_insight',
+            keyed_input_set=keyed_input_set,
+            checkpoint=checkpoints.get('generate_insight')
+        ):
+            await insight_queue.put(task_output)
+
+        for _ in range(queue_size):
+            await insight_queue.put(None)
+
+    async def consume():
+        while (task_output := await insight_queue.get()) is not None:
+            idx = task_output['key']
+            item_output_set.append(await evaluate_insight(
+                idx=idx,
+                predicted_insight=task_output['response'],
+                ground_truth_insight=mt_raig_bench[idx]['insight'],
+                question=mt_raig_bench[idx]['question'],
+                tables=mt_raig_bench.retrieved_tables_set[idx],
+                checkpoints=checkpoints,
+                verification_buffer=verification_buffer,
+                batched_verification=batched_verification,
+                scorer=scorer,
+                pruning_token_budget=pruning_token_budget,
+                serialization_token_budget=serialization_token_budget,
+                truncation_policy=truncation_policy,
+                generation_error=task_output.get('error')
+            ))
+
+    await asyncio.gather(produce(), *[consume() for _ in range(queue_size)])
+
+    item_output_set = await sweep_evaluation_failures(
+        item_output_set=item_output_set,
+        checkpoints=checkpoints,
+        verification_buffer=verification_buffer,
+        scorer=scorer,
+        pruning_token_budget=pruning_token_budget,
+        serialization_token_budget=serialization_token_budget,
+        truncation_policy=truncation_policy
+    )
+
+    evaluation_results, _ = collect_evaluation_results(item_output_set=item_output_set)
+
+    return score(evaluation_results=evaluation_results)
 
 
 def compute(
     type_set: List[str],
-    faithfulness_score_set: List[int],
-    completeness_score_set: List[int]
+    faithfulness_score_set: List[Optional[float]],
+    completeness_score_set: List[Optional[float]]
     ) -> str:
-    """Computation"""
-    scores_per_type = defaultdict(list)
-    
-    for type, faith_score, comp_score in zip(type_set, faithfulness_score_set, completeness_score_set):
-        scores_per_type[('faithfulness', type)].append(faith_score)
-        scores_per_type[('faithfulness', 'Total')].append(faith_score)
-        scores_per_type[('completeness', type)].append(comp_score)
-        scores_per_type[('completeness', 'Total')].append(comp_score)
-    
-    average_scores = {
-        type_with_demension: sum(scores) / len(scores)
-        for type_with_demension, scores in scores_per_type.items()
-    }
+    """Computation (per-type means with 95% bootstrap confidence intervals, over the items that were not excluded)"""
+    aggregated_scores = aggregate_scores(
+        type_set=type_set,
+        score_sets={'faithfulness': faithfulness_score_set, 'completeness': completeness_score_set}
+    )
     
-    sorted_average_scores = dict(sorted(
-        list(average_scores.items()),
+    sorted_aggregated_scores = dict(sorted(
+        list(aggregated_scores.items()),
         key=lambda x: (['faithfulness', 'completeness'].index(x[0][0]), x[0][1])
     ))
     
-    scores_str = '\n'.join(f'{type_with_demension}: {score * 100:.2f}' for type_with_demension, score in sorted_average_scores.items())
+    scores_str = '\n'.join(
+        f"{type_with_demension}: {score['mean'] * 100:.2f} [{score['ci_lower'] * 100:.2f}, {score['ci_upper'] * 100:.2f}]"
+        + (f" ({score['num_of_excluded']} item(s) excluded for failed calls)" if score['num_of_excluded'] else "")
+        for type_with_demension, score in sorted_aggregated_scores.items()
+    )
     
     return scores_str
 
 
-def main(baseline: str, model_name: str, path_dir: str):
+def parse_shard(shard: str) -> Tuple[int, int]:
+    """Shard parsing ('i/N' with a 0-based shard index i)"""
+    shard_index, num_of_shards = (int(_) for _ in shard.split('/'))
+
+    if not 0 <= shard_index < num_of_shards:
+        raise ValueError(shard)
+
+    return shard_index, num_of_shards
+
+
+def write_results(
+    path: str,
+    mt_raig_bench: MTRAIGBENCH,
+    faithfulness_score_set: List[float],
+    completeness_score_set: List[float]
+    ):
+    """Per-item results writing (keyed by the position in the full benchmark, so shards can be merged)"""
+    with open(path, 'w') as file:
+        for idx, data, faith_score, comp_score in zip(mt_raig_bench.item_ids, mt_raig_bench, faithfulness_score_set, completeness_score_set):
+            file.write(json.dumps({
+                'idx': idx,
+                'type': data['type'],
+                'faithfulness_score': faith_score,
+                'completeness_score': comp_score
+            }, ensure_ascii=False) + '\n')
+
+
+def summarize_reuse(checkpoints: Dict[str, Checkpoint]) -> Dict[str, Any]:
+    """Reuse summary of an incremental run
+
+    Per stage, outputs served from the last run, shared from a duplicate claim's call of this run, and
+    recomputed by a call of this run. An item is reused if it was evaluated without any call of its own.
+    """
+    evaluated_item_ids = set()
+    recomputed_item_ids = set()
+    stages = dict()
+
+    for stage, checkpoint in checkpoints.items():
+        shared_keys = checkpoint.shared_keys - checkpoint.computed_keys
+        reused_keys = checkpoint.reused_keys - checkpoint.computed_keys - shared_keys
+        stages[stage] = {
+            'num_of_reused': len(reused_keys),
+            'num_of_shared': len(shared_keys),
+            'num_of_recomputed': len(checkpoint.computed_keys)
+        }
+        evaluated_item_ids.update(key[0] if isinstance(key, tuple) else key for key in reused_keys | shared_keys | checkpoint.computed_keys)
+        recomputed_item_ids.update(key[0] if isinstance(key, tuple) else key for key in checkpoint.computed_keys)
+
+    return {
+        'num_of_evaluated_items': len(evaluated_item_ids),
+        'num_of_reused_items': len(evaluated_item_ids - recomputed_item_ids),
+        'stages': stages
+    }
+
+
+def main(
+    baseline: str,
+    model_name: str,
+    path_dir: str,
+    cache_path: str=None,
+    cache_max_entries: int=1000000,
+    checkpoint_dir: str='checkpoints',
+    resume: bool=False,
+    incremental: bool=False,
+    streaming: bool=False,
+    queue_size: int=64,
+    continuous_batching: bool=False,
+    window_size: int=0,
+    enable_prefix_caching: bool=False,
+    num_of_workers: int=1,
+    engine: str='vllm',
+    batched_verification: bool=False,
+    scorer: str='sampling',
+    pruning_token_budget: int=None,
+    serialization_token_budget: int=None,
+    truncation_policy: str='rank',
+    retriever: str='dpr',
+    top_k: int=10,
+    embedder: str='dpr',
+    index_dtype: str='float32',
+    backend: Backend=None,
+    trace_path: str=None,
+    shard: Tuple[int, int]=None
+    ):
+    backend = load_backend(backend=backend)
+    tracer = load_tracer(path=trace_path)
     mt_raig_bench = load_mt_raig_bench(path_dir=path_dir)
+
+    # In-process retrieval over the whole benchmark replaces the precomputed DPR results
+    if retriever != 'dpr':
+        _, recall = retrieve_tables(mt_raig_bench=mt_raig_bench, retriever=retriever, top_k=top_k, embedder=embedder, dtype=index_dtype)
+        print(f"{retriever} recall@{top_k}: {recall * 100:.2f}")
+
+    # A shard runs its slice of the benchmark end to end and keeps its outputs in its own folder
+    if shard is not None:
+        mt_raig_bench = mt_raig_bench.shard(shard_index=shard[0], num_of_shards=shard[1])
+        run_dir = f'{checkpoint_dir}/{baseline}/shard_{shard[0]}_of_{shard[1]}'
+    else:
+        run_dir = f'{checkpoint_dir}/{baseline}'
+
+    mt_raig_bench.precompute_serialized_tables()
+    load_prompt_registry()
+    response_cache = load_response_cache(path=cache_path, max_entries=cache_max_entries)
     flag = 'openai' if baseline in ['o3-mini', 'GPT-4o'] else 'vllm' if baseline in ['DeepSeek-R1-8B'] else None
 
-    # Insight generation
-    generated_insight_set = generate_insight(
-        retrieved_tables_set=mt_raig_bench.retrieved_tables_set,
-        benchmark=[data for data in mt_raig_bench],
-        model_name=model_name,
-        flag=flag
-    )
+    # Incremental runs regenerate insights but serve every evaluation call whose inputs are unchanged from the last run
+    checkpoints = {
+        stage: load_checkpoint(
+            path_dir=run_dir,
+            stage=stage,
+            resume=resume or (incremental and stage != 'generate_insight'),
+            incremental=incremental and stage != 'generate_insight'
+        )
+        for stage in [
+            'generate_insight',
+            'table_aware_insight_decomposition', 'claim_verification',
+            'question_aware_insight_decomposition_pred', 'question_aware_insight_decomposition_gt', 'topic_semantic_matching'
+        ]
+    }
+
+    if streaming:
+        # Insight generation & MT-RAIG Eval, pipelined per item
+        faithfulness_score_set, completeness_score_set = asyncio.run(stream_generate_and_evaluate(
+            mt_raig_bench=mt_raig_bench,
+            model_name=model_name,
+            flag=flag,
+            checkpoints=checkpoints,
+            queue_size=queue_size,
+            continuous_batching=continuous_batching,
+            window_size=window_size,
+            enable_prefix_caching=enable_prefix_caching,
+            num_of_workers=num_of_workers,
+            engine=engine,
+            batched_verification=batched_verification,
+            scorer=scorer,
+            pruning_token_budget=pruning_token_budget,
+            serialization_token_budget=serialization_token_budget,
+            truncation_policy=truncation_policy
+        ))
+
+    else:
+        # Insight generation
+        generated_insight_set = generate_insight(
+            retrieved_tables_set=mt_raig_bench.retrieved_tables_set,
+            benchmark=[data for data in mt_raig_bench],
+            model_name=model_name,
+            flag=flag,
+            checkpoint=checkpoints['generate_insight'],
+            continuous_batching=continuous_batching,
+            window_size=window_size,
+            enable_prefix_caching=enable_prefix_caching,
+            num_of_workers=num_of_workers,
+            engine=engine,
+            pruning_token_budget=pruning_token_budget,
+            serialization_token_budget=serialization_token_budget,
+            truncation_policy=truncation_policy
+        )
+        predicted_insight_set = [output['response'] for output in generated_insight_set]
+        # Insights that failed for good are not evaluated, so their empty responses are not scored as zeros
+        generation_errors = {output['key']: output['error'] for output in generated_insight_set if output.get('error')}
 
-    inputs = {
-        'faithfulness': {
-            'predicted_insight_set': generated_insight_set,
-            'retrieved_tables_set': mt_raig_bench.retrieved_tables_set
-        },
-        'completeness': {
-            'predicted_insight_set': generated_insight_set,
+        inputs = {
+            'predicted_insight_set': predicted_insight_set,
             'ground_truth_insight_set': [data['insight'] for data in mt_raig_bench],
-            'question_set': [data['question'] for data in mt_raig_bench]
+            'question_set': [data['question'] for data in mt_raig_bench],
+            'retrieved_tables_set': mt_raig_bench.retrieved_tables_set,
+            'generation_errors': generation_errors
         }
-    }
-
-    # MT-RAIG Eval Faithfulness
-    faithfulness_score_set = evaluate(
-        inputs=inputs['faithfulness'],
-        demension='faithfulness'
-    )
 
-    # MT-RAIG Eval Completeness
-    completeness_score_set = evaluate(
-        inputs=inputs['completeness'],
-        demension='completeness'
-    )
+        # MT-RAIG Eval Faithfulness & Completeness
+        faithfulness_score_set, completeness_score_set = evaluate(
+            inputs=inputs,
+            checkpoints=checkpoints,
+            batched_verification=batched_verification,
+            scorer=scorer,
+            pruning_token_budget=pruning_token_budget,
+            serialization_token_budget=serialization_token_budget,
+            truncation_policy=truncation_policy
+        )
 
     # Computation
     print(compute(
@@ -160,13 +446,96 @@ def main(baseline: str, model_name: str, path_dir: str):
         completeness_score_set=completeness_score_set
     ))
 
+    write_results(
+        path=f'{run_dir}/results.jsonl',
+        mt_raig_bench=mt_raig_bench,
+        faithfulness_score_set=faithfulness_score_set,
+        completeness_score_set=completeness_score_set
+    )
+
+    if incremental:
+        reuse_summary = summarize_reuse(
+            checkpoints={stage: checkpoint for stage, checkpoint in checkpoints.items() if stage != 'generate_insight'}
+        )
+        with open(f'{run_dir}/reuse_summary.json', 'w') as file:
+            json.dump(reuse_summary, file, indent=4)
+        print(f"{reuse_summary['num_of_reused_items']}/{reuse_summary['num_of_evaluated_items']} item(s) reused without any new evaluation call")
+        for stage, stage_summary in reuse_summary['stages'].items():
+            print(f"{stage}: {stage_summary['num_of_reused']} reused, {stage_summary['num_of_shared']} shared, {stage_summary['num_of_recomputed']} recomputed")
+
+    for checkpoint in checkpoints.values():
+        checkpoint.close()
+
+    dead_letter = load_dead_letter()
+    if dead_letter:
+        with open(f'{run_dir}/dead_letter.jsonl', 'w') as file:
+            file.writelines(json.dumps(entry, ensure_ascii=False) + '\n' for entry in dead_letter)
+        print(f"{len(dead_letter)} call(s) failed for good; see {run_dir}/dead_letter.jsonl and rerun with --resume")
+
+    # Table tokens dropped per item to fit the serialization token budget
+    truncation_report = load_truncation_report()
+    if truncation_report:
+        with open(f'{run_dir}/truncation_report.jsonl', 'w') as file:
+            file.writelines(
+                json.dumps({'stage': stage, 'idx': mt_raig_bench.item_ids[idx], 'num_of_dropped_tokens': num_of_dropped_tokens}, ensure_ascii=False) + '\n'
+                for (stage, idx), num_of_dropped_tokens in sorted(truncation_report.items())
+            )
+        for stage in sorted({stage for stage, _ in truncation_report}):
+            dropped_token_counts = [num_of_dropped_tokens for (_stage, _), num_of_dropped_tokens in truncation_report.items() if _stage == stage]
+            print(f"{stage}: {sum(count > 0 for count in dropped_token_counts)}/{len(dropped_token_counts)} item(s) truncated, {sum(dropped_token_counts)} table token(s) dropped")
+
+    # Per-stage call telemetry (queue wait, latency, tokens, retries and cost)
+    with open(f'{run_dir}/trace_summary.json', 'w') as file:
+        json.dump(tracer.summary(), file, indent=4)
+    print(tracer)
+    tracer.close()
+
+    if response_cache is not None:
+        print(response_cache)
+
+    if isinstance(backend, FakeBackend):
+        print(backend)
+
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--baseline', type=str, choices=['o3-mini', 'GPT-4o', 'DeepSeek-R1-8B'], required=True)
     parser.add_argument('--path-dir', type=str, default='mt_raig_bench')
+    parser.add_argument('--cache-path', type=str, default='cache/response_cache.sqlite')
+    parser.add_argument('--cache-max-entries', type=int, default=1000000)
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--checkpoint-dir', type=str, default='checkpoints')
+    parser.add_argument('--resume', action='store_true')
+    parser.add_argument('--incremental', action='store_true')
+    parser.add_argument('--streaming', action='store_true')
+    parser.add_argument('--queue-size', type=int, default=64)
+    parser.add_argument('--continuous-batching', action='store_true')
+    parser.add_argument('--window-size', type=int, default=0)
+    parser.add_argument('--enable-prefix-caching', action='store_true')
+    parser.add_argument('--num-of-workers', type=int, default=1)
+    parser.add_argument('--engine', type=str, choices=['vllm', 'stub'], default='vllm')
+    parser.add_argument('--batched-verification', action='store_true')
+    parser.add_argument('--scorer', type=str, choices=['sampling', 'logprob'], default='sampling')
+    parser.add_argument('--pruning-token-budget', type=int, default=None)
+    parser.add_argument('--serialization-token-budget', type=int, default=None)
+    parser.add_argument('--truncation-policy', type=str, choices=['rank', 'rows', 'even'], default='rank')
+    parser.add_argument('--retriever', type=str, choices=['dpr', 'bm25', 'dense'], default='dpr')
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--embedder', type=str, choices=['dpr', 'hashing'], default='dpr')
+    parser.add_argument('--index-dtype', type=str, choices=['float32', 'float16'], default='float32')
+    parser.add_argument('--backend', type=str, choices=['openai', 'fake'], default='openai')
+    parser.add_argument('--fake-latency', type=float, default=0.05)
+    parser.add_argument('--fake-error-rate', type=float, default=0.0)
+    parser.add_argument('--fake-rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--fake-seed', type=int, default=0)
+    parser.add_argument('--trace-path', type=str, default=None)
+    parser.add_argument('--shard', type=parse_shard, default=None)
+    parser.add_argument('--api-key-path', type=str, default='config/openai_api_key.yaml')
     args, _ = parser.parse_known_args()
 
+    if args.batched_verification and args.scorer == 'logprob':
+        parser.error("--batched-verification cannot be combined with --scorer=logprob")
+
     MODEL_NAME = {
         'o3-mini': 'o3-mini-2025-01-31',
         'GPT-4o': 'gpt-4o-2024-08-06',
@@ -176,5 +545,34 @@ if __name__ == '__main__':
     main(
         baseline=args.baseline,
         model_name=MODEL_NAME[args.baseline],
-        path_dir=args.path_dir
+        path_dir=args.path_dir,
+        cache_path=None if args.no_cache else args.cache_path,
+        cache_max_entries=args.cache_max_entries,
+        checkpoint_dir=args.checkpoint_dir,
+        resume=args.resume,
+        incremental=args.incremental,
+        streaming=args.streaming,
+        queue_size=args.queue_size,
+        continuous_batching=args.continuous_batching,
+        window_size=args.window_size,
+        enable_prefix_caching=args.enable_prefix_caching,
+        num_of_workers=args.num_of_workers,
+        engine=args.engine,
+        batched_verification=args.batched_verification,
+        scorer=args.scorer,
+        pruning_token_budget=args.pruning_token_budget,
+        serialization_token_budget=args.serialization_token_budget,
+        truncation_policy=args.truncation_policy,
+        retriever=args.retriever,
+        top_k=args.top_k,
+        embedder=args.embedder,
+        index_dtype=args.index_dtype,
+        backend=FakeBackend(
+            latency=args.fake_latency,
+            error_rate=args.fake_error_rate,
+            rate_limit_rate=args.fake_rate_limit_rate,
+            seed=args.fake_seed
+        ) if args.backend == 'fake' else OpenAIBackend(api_key_path=args.api_key_path),
+        trace_path=args.trace_path,
+        shard=args.shard
     )
\ No newline at end of file
@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+from typing import Any, Dict, List
+from main import compute
+from utils import load_mt_raig_bench
+
+
+def load_shard_results(path_dir: str, num_of_shards: int, num_of_items: int) -> List[Dict[str, Any]]:
+    """Per-item results of every shard, in benchmark order (each of the `num_of_items` benchmark items exactly once)"""
+    match_result_with_idx = dict()
+
+    for shard_index in range(num_of_shards):
+        path = f'{path_dir}/shard_{shard_index}_of_{num_of_shards}/results.jsonl'
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Shard {shard_index}/{num_of_shards} has not finished: {path} is missing")
+
+        with open(path, 'r') as file:
+            for line in file:
+                result = json.loads(line)
+                if result['idx'] in match_result_with_idx:
+                    raise ValueError(f"Item {result['idx']} appears in more than one shard")
+                match_result_with_idx[result['idx']] = result
+
+    unknown_idx_set = sorted(set(match_result_with_idx) - set(range(num_of_items)))
+    if unknown_idx_set:
+        raise ValueError(f"Items {unknown_idx_set[:10]} are not in the benchmark of {num_of_items} items")
+
+    missing_idx_set = sorted(set(range(num_of_items)) - set(match_result_with_idx))
+    if missing_idx_set:
+        raise ValueError(f"Items {missing_idx_set[:10]} are missing from the shard results")
+
+    return [match_result_with_idx[idx] for idx in range(num_of_items)]
+
+
+def main(path_dir: str, baseline: str, num_of_shards: int, checkpoint_dir: str='checkpoints'):
+    run_dir = f'{checkpoint_dir}/{baseline}'
+    # The expected items come from the benchmark itself, so shards missing their trailing items are caught too
+    results = load_shard_results(path_dir=run_dir, num_of_shards=num_of_shards, num_of_items=len(load_mt_raig_bench(path_dir=path_dir)))
+
+    with open(f'{run_dir}/results.jsonl', 'w') as file:
+        file.writelines(json.dumps(result, ensure_ascii=False) + '\n' for result in results)
+
+    dead_letter = []
+    for shard_index in range(num_of_shards):
+        path = f'{run_dir}/shard_{shard_index}_of_{num_of_shards}/dead_letter.jsonl'
+        if os.path.exists(path):
+            with open(path, 'r') as file:
+                dead_letter.extend(file.readlines())
+
+    if dead_letter:
+        with open(f'{run_dir}/dead_letter.jsonl', 'w') as file:
+            file.writelines(dead_letter)
+        print(f"{len(dead_letter)} call(s) failed for good; see {run_dir}/dead_letter.jsonl and rerun the affected shards with --resume")
+
+    # Computation over the union, in benchmark order as in a single run
+    print(compute(
+        type_set=[result['type'] for result in results],
+        faithfulness_score_set=[result['faithfulness_score'] for result in results],
+        completeness_score_set=[result['completeness_score'] for result in results]
+    ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--path-dir', type=str, default='mt_raig_bench')
+    parser.add_argument('--baseline', type=str, choices=['o3-mini', 'GPT-4o', 'DeepSeek-R1-8B'], required=True)
+    parser.add_argument('--num-of-shards', type=int, required=True)
+    parser.add_argument('--checkpoint-dir', type=str, default='checkpoints')
+    args, _ = parser.parse_known_args()
+
+    main(
+        path_dir=args.path_dir,
+        baseline=args.baseline,
+        num_of_shards=args.num_of_shards,
+        checkpoint_dir=args.checkpoint_dir
+    )
\ No newline at end of file
@@ -1,4 +1,9 @@
+from ._aggregate_scores import aggregate_scores, bootstrap_confidence_intervals, grouped_mean, precision_recall_f1
+from ._calibrate_claim_verification import calibrate_claim_verification
+from ._compare_claim_scores import compare_claim_scores, load_decomposed_claims_set
+from ._compare_table_pruning import compare_table_pruning
 from ._compute_completeness_score import compute_completeness_score
 from ._compute_faithfulness_score import compute_faithfulness_score
 from ._eval_completeness import question_aware_insight_decomposition, topic_semantic_matching
-from ._eval_faithfulness import table_aware_insight_decomposition, claim_verification
\ No newline at end of file
+from ._eval_faithfulness import table_aware_insight_decomposition, claim_verification
+from ._evaluate_insights import collect_evaluation_results, evaluate_insight, evaluate_insights, sweep_evaluation_failures
\ No newline at end of file
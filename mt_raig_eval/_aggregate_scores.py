@@ -0,0 +1,159 @@
+import numpy as np
+from typing import Dict, List, Sequence, Tuple
+
+
+def grouped_mean(group_ids: np.ndarray, values: np.ndarray, num_of_groups: int, default: float=0.0) -> np.ndarray:
+    """Per-group means of flat values
+
+    [Params]
+    group_ids     : np.ndarray (group of each value, in [0, num_of_groups))
+    values        : np.ndarray
+    num_of_groups : int
+    default       : float (mean of an empty group)
+
+    [Return]
+    means : np.ndarray
+    """
+    sums = np.bincount(group_ids, weights=values, minlength=num_of_groups)
+    counts = np.bincount(group_ids, minlength=num_of_groups)
+
+    return np.divide(sums, counts, out=np.full(num_of_groups, default, dtype=np.float64), where=counts > 0)
+
+
+def bootstrap_confidence_intervals(
+    values: np.ndarray,
+    group_ids: np.ndarray,
+    num_of_groups: int,
+    num_of_resamples: int=1000,
+    confidence: float=0.95,
+    seed: int=0,
+    max_block_size: int=10000000
+    ) -> Tuple[np.ndarray, np.ndarray]:
+    """Percentile bootstrap confidence intervals of the per-group means
+
+    Each group is resampled with replacement within itself. All resamples of a group are drawn as one
+    index matrix (split in blocks of at most `max_block_size` indices to bound memory).
+
+    [Params]
+    values           : np.ndarray
+    group_ids        : np.ndarray
+    num_of_groups    : int
+    num_of_resamples : int
+    confidence       : float
+    seed             : int
+    max_block_size   : int
+
+    [Returns]
+    lower_bounds : np.ndarray
+    upper_bounds : np.ndarray
+    """
+    rng = np.random.default_rng(seed)
+    lower_bounds = np.full(num_of_groups, np.nan)
+    upper_bounds = np.full(num_of_groups, np.nan)
+
+    order = np.argsort(group_ids, kind='stable')
+    boundaries = np.searchsorted(group_ids[order], np.arange(num_of_groups + 1))
+
+    for group_id in range(num_of_groups):
+        group_values = values[order[boundaries[group_id]:boundaries[group_id + 1]]]
+        if len(group_values) == 0:
+            continue
+
+        block_size = max(1, max_block_size // len(group_values))
+        resampled_means = np.concatenate([
+            group_values[rng.integers(0, len(group_values), size=(min(block_size, num_of_resamples - start), len(group_values)))].mean(axis=1)
+            for start in range(0, num_of_resamples, block_size)
+        ])
+
+        lower_bounds[group_id], upper_bounds[group_id] = np.quantile(resampled_means, [(1 - confidence) / 2, (1 + confidence) / 2])
+
+    return lower_bounds, upper_bounds
+
+
+def aggregate_scores(
+    type_set: Sequence[str],
+    score_sets: Dict[str, np.ndarray],
+    num_of_resamples: int=1000,
+    confidence: float=0.95,
+    seed: int=0
+    ) -> Dict[Tuple[str, str], Dict[str, float]]:
+    """Per-type (and 'Total') means with bootstrap confidence intervals
+
+    Score arrays are per item, or stacked per run (runs x items); stacked runs are averaged per item
+    before resampling, so the intervals reflect the spread over items. Missing scores (None or NaN, for
+    items excluded because of failed calls) are left out and counted as 'num_of_excluded'.
+
+    [Params]
+    type_set         : Sequence[str]
+    score_sets       : Dict[str, np.ndarray] (dimension -> scores)
+    num_of_resamples : int
+    confidence       : float
+    seed             : int
+
+    [Return]
+    aggregated_scores : Dict[Tuple[str, str], Dict[str, float]]
+    e.g. {('faithfulness', 'Total'): {'mean': ..., 'ci_lower': ..., 'ci_upper': ..., 'num_of_items': ..., 'num_of_excluded': ...}}
+    """
+    types, type_ids = np.unique(np.asarray(type_set), return_inverse=True)
+    group_names = list(types) + ['Total']
+    # Every item also counts towards 'Total', the last group
+    all_group_ids = np.concatenate([type_ids, np.full(len(type_ids), len(types))])
+    all_counts = np.bincount(all_group_ids, minlength=len(group_names))
+
+    aggregated_scores = dict()
+
+    for dimension, scores in score_sets.items():
+        item_scores = np.asarray(scores, dtype=np.float64)
+        if item_scores.ndim > 1:
+            stacked_scores = item_scores.reshape(-1, item_scores.shape[-1])
+            num_of_runs = np.sum(~np.isnan(stacked_scores), axis=0)
+            item_scores = np.divide(np.nansum(stacked_scores, axis=0), num_of_runs, out=np.full(len(num_of_runs), np.nan), where=num_of_runs > 0)
+
+        values = np.concatenate([item_scores, item_scores])
+        is_scored = ~np.isnan(values)
+        values, group_ids = values[is_scored], all_group_ids[is_scored]
+        counts = np.bincount(group_ids, minlength=len(group_names))
+
+        # A group whose items were all excluded has no mean
+        means = grouped_mean(group_ids=group_ids, values=values, num_of_groups=len(group_names), default=np.nan)
+        lower_bounds, upper_bounds = bootstrap_confidence_intervals(
+            values=values,
+            group_ids=group_ids,
+            num_of_groups=len(group_names),
+            num_of_resamples=num_of_resamples,
+            confidence=confidence,
+            seed=seed
+        )
+
+        for group_id, group_name in enumerate(group_names):
+            aggregated_scores[(dimension, str(group_name))] = {
+                'mean': float(means[group_id]),
+                'ci_lower': float(lower_bounds[group_id]),
+                'ci_upper': float(upper_bounds[group_id]),
+                'num_of_items': int(counts[group_id]),
+                'num_of_excluded': int(all_counts[group_id] - counts[group_id])
+            }
+
+    return aggregated_scores
+
+
+def precision_recall_f1(
+    num_of_matched_pred: np.ndarray,
+    num_of_pred: np.ndarray,
+    num_of_matched_gt: np.ndarray,
+    num_of_gt: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per-item precision, recall and F1 (0 where undefined)"""
+    precision = np.divide(num_of_matched_pred, num_of_pred, out=np.zeros(len(num_of_pred)), where=num_of_pred > 0)
+    recall = np.divide(num_of_matched_gt, num_of_gt, out=np.zeros(len(num_of_gt)), where=num_of_gt > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros(len(precision)), where=precision + recall > 0)
+
+    return precision, recall, f1
+
+
+def to_arrays(results_with_key: List[Dict[str, float]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Flat (item index, result) arrays of keyed results (keys are an item index or an (item index, ...) tuple)"""
+    item_ids = np.fromiter((res['key'][0] if isinstance(res['key'], (list, tuple)) else res['key'] for res in results_with_key), dtype=np.int64, count=len(results_with_key))
+    results = np.fromiter((res['result'] for res in results_with_key), dtype=np.float64, count=len(results_with_key))
+
+    return item_ids, results
\ No newline at end of file
@@ -0,0 +1,47 @@
+from typing import Any, Dict, List
+from utils import RateLimiter
+from ._compare_claim_scores import compare_claim_scores
+from ._eval_faithfulness import claim_verification
+
+
+async def calibrate_claim_verification(
+    decomposed_claims_set: List[List[str]],
+    retrieved_tables_set: List[List[Dict[str, Any]]],
+    rate_limiter: RateLimiter=None
+    ) -> Dict[str, float]:
+    """Calibration check of batched claim verification against one claim per request
+
+    Both modes verify the same claims; claims that failed in either mode are left out of the comparison.
+
+    [Params]
+    decomposed_claims_set : List[List[str]]
+    retrieved_tables_set  : List[List[Dict[str, Any]]]
+    rate_limiter          : RateLimiter
+
+    [Return]
+    calibration : Dict[str, float]
+    e.g. dict_keys(['num_of_claims', 'single_mean', 'batched_mean', 'mean_absolute_difference', 'agreement', 'correlation',
+                    'faithfulness_mean_absolute_difference', 'single_cost', 'batched_cost'])
+    """
+    single_results_with_key, single_cost = await claim_verification(
+        decomposed_claims_set=decomposed_claims_set,
+        retrieved_tables_set=retrieved_tables_set,
+        rate_limiter=rate_limiter
+    )
+    batched_results_with_key, batched_cost = await claim_verification(
+        decomposed_claims_set=decomposed_claims_set,
+        retrieved_tables_set=retrieved_tables_set,
+        rate_limiter=rate_limiter,
+        batched=True
+    )
+
+    calibration = compare_claim_scores(
+        reference_results_with_key=single_results_with_key,
+        candidate_results_with_key=batched_results_with_key,
+        reference_name='single',
+        candidate_name='batched'
+    )
+    calibration['single_cost'] = single_cost
+    calibration['batched_cost'] = batched_cost
+
+    return calibration
\ No newline at end of file
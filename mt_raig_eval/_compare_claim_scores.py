@@ -0,0 +1,93 @@
+import json
+from typing import Dict, List, Tuple, Union
+from utils import extract_from_numbered_list
+from ._compute_faithfulness_score import compute_faithfulness_score
+
+
+def _pearson_correlation(x: List[float], y: List[float]) -> float:
+    """Pearson correlation (0.0 if either side is constant)"""
+    mean_x, mean_y = sum(x) / len(x), sum(y) / len(y)
+    covariance = sum((_x - mean_x) * (_y - mean_y) for _x, _y in zip(x, y))
+    variance_x = sum((_x - mean_x) ** 2 for _x in x)
+    variance_y = sum((_y - mean_y) ** 2 for _y in y)
+
+    return covariance / (variance_x * variance_y) ** 0.5 if variance_x and variance_y else 0.0
+
+
+def load_decomposed_claims_set(path_dir: str, num_of_items: int) -> Tuple[List[int], List[List[str]]]:
+    """Load the decomposed claims of the first items from the table-aware insight decomposition checkpoint of a previous run
+
+    [Params]
+    path_dir     : str (checkpoint directory of the run)
+    num_of_items : int
+
+    [Returns]
+    key_set               : List[int]
+    decomposed_claims_set : List[List[str]]
+    """
+    decomposition_outputs = dict()
+    with open(f'{path_dir}/table_aware_insight_decomposition.jsonl', 'r') as file:
+        for line in file:
+            try:
+                output = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            decomposition_outputs[output['key']] = output
+
+    key_set = sorted(decomposition_outputs)[:num_of_items]
+    decomposed_claims_set = [extract_from_numbered_list(response=decomposition_outputs[key]['response']) for key in key_set]
+
+    return key_set, decomposed_claims_set
+
+
+def compare_claim_scores(
+    reference_results_with_key: List[Dict[str, Union[float, int]]],
+    candidate_results_with_key: List[Dict[str, Union[float, int]]],
+    reference_name: str,
+    candidate_name: str
+    ) -> Dict[str, float]:
+    """Comparison of two claim verification runs over the same claims
+
+    Claims missing from either run (failed calls) are left out of the comparison.
+
+    [Params]
+    reference_results_with_key : List[Dict[str, Union[float, int]]]
+    candidate_results_with_key : List[Dict[str, Union[float, int]]]
+    reference_name             : str (e.g. 'single')
+    candidate_name             : str (e.g. 'batched')
+
+    [Return]
+    comparison : Dict[str, float]
+    e.g. dict_keys(['num_of_claims', 'single_mean', 'batched_mean', 'mean_absolute_difference', 'agreement', 'correlation',
+                    'faithfulness_mean_absolute_difference'])
+    """
+    match_candidate_result_with_key = {res['key']: res for res in candidate_results_with_key}
+    paired_results_with_key = [
+        (res, match_candidate_result_with_key[res['key']])
+        for res in reference_results_with_key
+        if res['key'] in match_candidate_result_with_key
+    ]
+
+    if not paired_results_with_key:
+        return {'num_of_claims': 0}
+
+    reference_scores = [reference_res['result'] for reference_res, _ in paired_results_with_key]
+    candidate_scores = [candidate_res['result'] for _, candidate_res in paired_results_with_key]
+
+    reference_faithfulness_score_set = compute_faithfulness_score([reference_res for reference_res, _ in paired_results_with_key])
+    candidate_faithfulness_score_set = compute_faithfulness_score([candidate_res for _, candidate_res in paired_results_with_key])
+
+    comparison = {
+        'num_of_claims': len(paired_results_with_key),
+        f'{reference_name}_mean': sum(reference_scores) / len(reference_scores),
+        f'{candidate_name}_mean': sum(candidate_scores) / len(candidate_scores),
+        'mean_absolute_difference': sum(abs(x - y) for x, y in zip(reference_scores, candidate_scores)) / len(reference_scores),
+        # Share of claims judged the same way once the sampled scores are thresholded at 0.5
+        'agreement': sum((x >= 0.5) == (y >= 0.5) for x, y in zip(reference_scores, candidate_scores)) / len(reference_scores),
+        'correlation': _pearson_correlation(reference_scores, candidate_scores),
+        'faithfulness_mean_absolute_difference': sum(
+            abs(x - y) for x, y in zip(reference_faithfulness_score_set, candidate_faithfulness_score_set)
+        ) / len(reference_faithfulness_score_set)
+    }
+
+    return comparison
\ No newline at end of file
@@ -0,0 +1,66 @@
+from typing import Any, Dict, List
+from utils import RateLimiter, estimate_tokens, prune_tables, serialize_table
+from ._compare_claim_scores import compare_claim_scores
+from ._eval_faithfulness import claim_verification
+
+
+async def compare_table_pruning(
+    decomposed_claims_set: List[List[str]],
+    retrieved_tables_set: List[List[Dict[str, Any]]],
+    pruning_token_budget: int,
+    rate_limiter: RateLimiter=None
+    ) -> Dict[str, float]:
+    """Comparison of claim verification against the full and the pruned retrieved tables
+
+    Both runs verify the same claims one per request; claims that failed in either run are left out of
+    the comparison. Table tokens are the estimated tokens of the serialized tables of each request.
+
+    [Params]
+    decomposed_claims_set : List[List[str]]
+    retrieved_tables_set  : List[List[Dict[str, Any]]]
+    pruning_token_budget  : int
+    rate_limiter          : RateLimiter
+
+    [Return]
+    comparison : Dict[str, float]
+    e.g. dict_keys(['num_of_claims', 'full_mean', 'pruned_mean', 'mean_absolute_difference', 'agreement', 'correlation',
+                    'faithfulness_mean_absolute_difference', 'full_cost', 'pruned_cost', 'full_table_tokens', 'pruned_table_tokens'])
+    """
+    full_results_with_key, full_cost = await claim_verification(
+        decomposed_claims_set=decomposed_claims_set,
+        retrieved_tables_set=retrieved_tables_set,
+        rate_limiter=rate_limiter
+    )
+    pruned_results_with_key, pruned_cost = await claim_verification(
+        decomposed_claims_set=decomposed_claims_set,
+        retrieved_tables_set=retrieved_tables_set,
+        rate_limiter=rate_limiter,
+        pruning_token_budget=pruning_token_budget
+    )
+
+    full_table_tokens_set = [
+        estimate_tokens('\n'.join(serialize_table(table=table) for table in tables))
+        for tables in retrieved_tables_set
+    ]
+    full_table_tokens = sum(
+        full_table_tokens * len(decomposed_claims)
+        for full_table_tokens, decomposed_claims in zip(full_table_tokens_set, decomposed_claims_set)
+    )
+    pruned_table_tokens = sum(
+        estimate_tokens('\n'.join(serialize_table(table=table) for table in prune_tables(tables=tables, query=claim, token_budget=pruning_token_budget)))
+        for decomposed_claims, tables in zip(decomposed_claims_set, retrieved_tables_set)
+        for claim in decomposed_claims
+    )
+
+    comparison = compare_claim_scores(
+        reference_results_with_key=full_results_with_key,
+        candidate_results_with_key=pruned_results_with_key,
+        reference_name='full',
+        candidate_name='pruned'
+    )
+    comparison['full_cost'] = full_cost
+    comparison['pruned_cost'] = pruned_cost
+    comparison['full_table_tokens'] = full_table_tokens
+    comparison['pruned_table_tokens'] = pruned_table_tokens
+
+    return comparison
\ No newline at end of file
@@ -1,5 +1,12 @@
+import numpy as np
 import re
 from typing import Dict, List, Tuple, Union
+from ._aggregate_scores import precision_recall_f1
+
+
+def _count_matched_topics(matched: re.Match) -> int:
+    """Number of topic numbers in a matched topic subset"""
+    return len([t.strip() for t in matched.group(1).split(',') if t.strip()]) if matched else 0
 
 
 def compute_completeness_score(
@@ -19,31 +26,23 @@ def compute_completeness_score(
     completeness_recall_score_set    : List[float]
     completeness_f1_score_set  : List[float]
     """
-    idx_len = max(_['key'] for _ in topic_semantic_matching_results_with_key) + 1
-    
-    completeness_precision_score_set = [0.0 for _ in range(idx_len)]
-    completeness_recall_score_set = [0.0 for _ in range(idx_len)]
+    num_of_items = len(decomposed_pred_topics_set)
+
+    num_of_matched_pred = np.zeros(num_of_items)
+    num_of_matched_gt = np.zeros(num_of_items)
     
     for res in topic_semantic_matching_results_with_key:
         idx = res['key']
         response = res['result']
         
-        match_pred = re.search(r"Matched topic subset of B: \[(.*?)\]", response)
-        match_gt = re.search(r"Matched topic subset of A: \[(.*?)\]", response)
-        
-        if match_pred and decomposed_pred_topics_set[idx]:
-            matched_pred_topics = match_pred.group(1).split(',')
-            num_of_topics = len(t.strip() for t in matched_pred_topics if t.strip())
-            completeness_precision_score_set[idx] = num_of_topics / len(decomposed_pred_topics_set[idx])
-        
-        if match_gt and decomposed_gt_topics_set[idx]:
-            matched_gt_topics = match_gt.group(1).split(',')
-            num_of_topics = len(t.strip() for t in matched_gt_topics if t.strip())
-            completeness_recall_score_set[idx] = num_of_topics / len(decomposed_gt_topics_set[idx])
-    
-    completeness_f1_score_set = [
-        2 * (p_score * r_score) / (p_score + r_score) if p_score + r_score > 0 else 0.0
-        for p_score, r_score in zip(completeness_precision_score_set, completeness_recall_score_set)
-    ]
+        num_of_matched_pred[idx] = _count_matched_topics(re.search(r"Matched topic subset of B: \[(.*?)\]", response))
+        num_of_matched_gt[idx] = _count_matched_topics(re.search(r"Matched topic subset of A: \[(.*?)\]", response))
+
+    completeness_precision_score_set, completeness_recall_score_set, completeness_f1_score_set = precision_recall_f1(
+        num_of_matched_pred=num_of_matched_pred,
+        num_of_pred=np.fromiter((len(topics) for topics in decomposed_pred_topics_set), dtype=np.float64, count=num_of_items),
+        num_of_matched_gt=num_of_matched_gt,
+        num_of_gt=np.fromiter((len(topics) for topics in decomposed_gt_topics_set), dtype=np.float64, count=num_of_items)
+    )
     
-    return completeness_precision_score_set, completeness_recall_score_set, completeness_f1_score_set
\ No newline at end of file
+    return completeness_precision_score_set.tolist(), completeness_recall_score_set.tolist(), completeness_f1_score_set.tolist()
\ No newline at end of file
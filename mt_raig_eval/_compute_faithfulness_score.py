@@ -1,27 +1,27 @@
 from typing import Dict, List, Union
+from ._aggregate_scores import grouped_mean, to_arrays
 
 
 def compute_faithfulness_score(
-    claim_verification_results_with_key: List[Dict[str, Union[float, int]]]
+    claim_verification_results_with_key: List[Dict[str, Union[float, int]]],
+    num_of_items: int=None
     ) -> List[float]:
     """ MT-RAIG Eval Faithfulness
 
-    [Param]
+    Per-item mean of the claim scores (0.0 for items without claims).
+
+    [Params]
     claim_verification_results_with_key : List[Dict[str, Union[float, int]]]
+    num_of_items                        : int (default: the largest item index in the results + 1)
 
     [Return]
     faithfulness_score_set : List[float]
     """
-    idx_len = max(_['key'][0] for _ in claim_verification_results_with_key) + 1
-    
-    faithfulness_scores_set = [[] for _ in range(idx_len)]
-    
-    for res in claim_verification_results_with_key:
-        idx, _ = res['key']
-        score = res['result']
-        
-        faithfulness_scores_set[idx].append(score)
-    
-    faithfulness_score_set = [sum(scores) / len(scores) if scores else 0.0 for scores in faithfulness_scores_set]
+    item_ids, scores = to_arrays(results_with_key=claim_verification_results_with_key)
+
+    if num_of_items is None:
+        num_of_items = int(item_ids.max()) + 1 if len(item_ids) else 0
+
+    faithfulness_score_set = grouped_mean(group_ids=item_ids, values=scores, num_of_groups=num_of_items).tolist()
     
     return faithfulness_score_set
\ No newline at end of file
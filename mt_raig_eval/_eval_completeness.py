@@ -1,43 +1,101 @@
-import asyncio
 from tqdm.asyncio import tqdm_asyncio
-from typing import Dict, List, Tuple, Union
-from utils import extract_from_numbered_list, load_batch_size, load_prompt
+from typing import Any, Dict, List, Tuple, Union
+from utils import Checkpoint, RateLimiter, extract_from_numbered_list, fingerprint_stage, load_prompt, load_rate_limiter, render_prompt, sweep_failures, trace_stage
 from ._get_async_gpt_4o_mini_response import get_async_gpt_4o_mini_response
+from ._load_config import JUDGE_MODEL_NAME
+
+
+async def _decompose_question_aware_insight(
+        rate_limiter: RateLimiter,
+        insight: str,
+        question: str,
+        key: Any,
+        checkpoint: Checkpoint=None
+    ) -> Dict[str, Any]:
+    """Decompose a single question-aware insight"""
+    task_input = {
+        'insight': insight,
+        'question': question
+    }
+    fingerprint = fingerprint_stage(task='question_aware_insight_decomposition', task_input=task_input, model_name=JUDGE_MODEL_NAME)
+
+    if checkpoint is not None and (checkpoint_output := checkpoint.get(key=key, fingerprint=fingerprint)) is not None:
+        return checkpoint_output
+
+    with trace_stage(stage='question_aware_insight_decomposition'):
+        task_output = await get_async_gpt_4o_mini_response(
+            rate_limiter=rate_limiter,
+            system_prompt=load_prompt(role='system', task='question_aware_insight_decomposition'),
+            user_prompt=render_prompt(role='user', task='question_aware_insight_decomposition', task_input=task_input),
+            key=key
+        )
+
+    if checkpoint is not None:
+        checkpoint.append(task_output, fingerprint=fingerprint)
+
+    return task_output
+
+
+async def _match_topics(
+        rate_limiter: RateLimiter,
+        pred_topics: List[str],
+        gt_topics: List[str],
+        key: Any,
+        checkpoint: Checkpoint=None
+    ) -> Dict[str, Any]:
+    """Match a single pair of topic sets semantically"""
+    task_input = {
+        'pred_topics': '\n'.join(f'{index + 1}. {topic}' for index, topic in enumerate(pred_topics)),
+        'gt_topics': '\n'.join(f'{index + 1}. {topic}' for index, topic in enumerate(gt_topics))
+    }
+    fingerprint = fingerprint_stage(task='topic_semantic_matching', task_input=task_input, model_name=JUDGE_MODEL_NAME)
+
+    if checkpoint is not None and (checkpoint_output := checkpoint.get(key=key, fingerprint=fingerprint)) is not None:
+        return checkpoint_output
+
+    with trace_stage(stage='topic_semantic_matching'):
+        task_output = await get_async_gpt_4o_mini_response(
+            rate_limiter=rate_limiter,
+            system_prompt=load_prompt(role='system', task='topic_semantic_matching'),
+            user_prompt=render_prompt(role='user', task='topic_semantic_matching', task_input=task_input),
+            key=key
+        )
+
+    if checkpoint is not None:
+        checkpoint.append(task_output, fingerprint=fingerprint)
+
+    return task_output
 
 
 async def question_aware_insight_decomposition(
         insight_set: List[str],
-        question_set: List[str]
+        question_set: List[str],
+        checkpoint: Checkpoint=None,
+        rate_limiter: RateLimiter=None
     ) -> Tuple[List[List[str]], float]:
     """Decompose question-aware insight
 
     [Params]
     insight_set  : List[str],
     question_set : List[str]
+    checkpoint   : Checkpoint
+    rate_limiter : RateLimiter
 
     [Returns]
     decomposed_topics_set : List[List[str]]
     cost                  : float
     """
-    semaphore = asyncio.Semaphore(load_batch_size(flag='openai'))
-    
-    task_input_set = [
-        {
-            'insight': insight,
-            'question': question
-        }
-        for insight, question
-        in zip(insight_set, question_set)
-    ]
+    rate_limiter = rate_limiter or load_rate_limiter(model_name=JUDGE_MODEL_NAME)
     
     tasks = [
-        get_async_gpt_4o_mini_response(
-            semaphore=semaphore,
-            system_prompt=load_prompt(role='system', task='question_aware_insight_decomposition'),
-            user_prompt=load_prompt(role='user', task='question_aware_insight_decomposition').format(**task_input),
-            key=idx
+        _decompose_question_aware_insight(
+            rate_limiter=rate_limiter,
+            insight=insight,
+            question=question,
+            key=idx,
+            checkpoint=checkpoint
         )
-        for idx, task_input in enumerate(task_input_set)
+        for idx, (insight, question) in enumerate(zip(insight_set, question_set))
     ]
     
     task_output_set = []
@@ -46,6 +104,18 @@ async def question_aware_insight_decomposition(
         task_output = await _
         task_output_set.append(task_output)
     
+    task_output_set = await sweep_failures(
+        task_output_set=task_output_set,
+        resubmit=lambda task_output: _decompose_question_aware_insight(
+            rate_limiter=load_rate_limiter(model_name=JUDGE_MODEL_NAME, sweep=True),
+            insight=insight_set[task_output['key']],
+            question=question_set[task_output['key']],
+            key=task_output['key'],
+            checkpoint=checkpoint
+        ),
+        stage='question_aware_insight_decomposition'
+    )
+    
     cost = sum([output['input_tokens_cost'] + output['output_tokens_cost'] for output in task_output_set])
     
     sorted_task_output_set = sorted(task_output_set, key=lambda x: x['key'])
@@ -60,45 +130,53 @@ async def question_aware_insight_decomposition(
 
 async def topic_semantic_matching(
         decomposed_pred_topics_set: List[List[str]],
-        decomposed_gt_topics_set: List[List[str]]
+        decomposed_gt_topics_set: List[List[str]],
+        checkpoint: Checkpoint=None,
+        rate_limiter: RateLimiter=None
     ) -> Tuple[List[Dict[str, Union[str, int]]], float]:
     """Match topics semantically 
 
     [Params]
     decomposed_pred_topics_set : List[List[str]]
     decomposed_gt_topics_set   : List[List[str]]
+    checkpoint                 : Checkpoint
+    rate_limiter               : RateLimiter
 
     [Returns]
     topic_semantic_matching_results_with_key : List[Dict[str, Union[str, int]]]
     cost                                     : float
     """
-    semaphore = asyncio.Semaphore(load_batch_size(flag='openai'))
-    
-    task_input_set = [
-        {
-            'pred_topics': '\n'.join(f'{index + 1}. {topic}' for index, topic in enumerate(pred_topics)),
-            'gt_topics': '\n'.join(f'{index + 1}. {topic}' for index, topic in enumerate(gt_topics))
-        }
-        for pred_topics, gt_topics
-        in zip(decomposed_pred_topics_set, decomposed_gt_topics_set)
-    ]
+    rate_limiter = rate_limiter or load_rate_limiter(model_name=JUDGE_MODEL_NAME)
     
     tasks = [
-        get_async_gpt_4o_mini_response(
-            semaphore=semaphore,
-            system_prompt=load_prompt(role='system', task='topic_semantic_matching'),
-            user_prompt=load_prompt(role='user', task='topic_semantic_matching').format(**task_input),
-            key=idx
+        _match_topics(
+            rate_limiter=rate_limiter,
+            pred_topics=pred_topics,
+            gt_topics=gt_topics,
+            key=idx,
+            checkpoint=checkpoint
         )
-        for idx, task_input in enumerate(task_input_set)
+        for idx, (pred_topics, gt_topics) in enumerate(zip(decomposed_pred_topics_set, decomposed_gt_topics_set))
     ]
     
     task_output_set = []
     
-    for _ in tqdm_asyncio.as_completed(tasks, total=len(tasks), desc="Verify claims"):
+    for _ in tqdm_asyncio.as_completed(tasks, total=len(tasks), desc="Match topics semantically"):
         task_output = await _
         task_output_set.append(task_output)
     
+    task_output_set = await sweep_failures(
+        task_output_set=task_output_set,
+        resubmit=lambda task_output: _match_topics(
+            rate_limiter=load_rate_limiter(model_name=JUDGE_MODEL_NAME, sweep=True),
+            pred_topics=decomposed_pred_topics_set[task_output['key']],
+            gt_topics=decomposed_gt_topics_set[task_output['key']],
+            key=task_output['key'],
+            checkpoint=checkpoint
+        ),
+        stage='topic_semantic_matching'
+    )
+    
     cost = sum([output['input_tokens_cost'] + output['output_tokens_cost'] for output in task_output_set])
     
     sorted_task_output_set = sorted(task_output_set, key=lambda x: x['key'])
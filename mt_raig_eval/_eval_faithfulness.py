@@ -1,45 +1,340 @@
 import asyncio
+import hashlib
+import json
+import re
+import unicodedata
 from tqdm.asyncio import tqdm_asyncio
-from typing import Any, Dict, List, Tuple, Union
-from utils import extract_from_numbered_list, load_batch_size, load_prompt, serialize_table
-from ._get_async_g_eval_responses import get_async_g_eval_responses
+from typing import Any, Dict, List, Literal, Tuple, Union
+from utils import Checkpoint, RateLimiter, extract_from_numbered_list, fingerprint_stage, load_dead_letter, load_prompt, load_rate_limiter, load_truncation_report, prune_tables, render_prompt, serialize_table, serialize_tables, sweep_failures, trace_stage
+from ._get_async_g_eval_responses import get_async_batched_g_eval_responses, get_async_g_eval_responses, get_async_logprob_g_eval_responses
 from ._get_async_gpt_4o_mini_response import get_async_gpt_4o_mini_response
+from ._load_config import JUDGE_MODEL_NAME
+
+
+async def _decompose_table_aware_insight(
+    rate_limiter: RateLimiter,
+    insight: str,
+    tables: List[Dict[str, Any]],
+    key: Any,
+    checkpoint: Checkpoint=None
+    ) -> Dict[str, Any]:
+    """Decompose a single table-aware insight"""
+    task_input = {
+        'insight': insight,
+        'serialized_table_schemas': '\n'.join([serialize_table(table=table, is_cell=False) for table in tables])
+    }
+    fingerprint = fingerprint_stage(task='table_aware_insight_decomposition', task_input=task_input, model_name=JUDGE_MODEL_NAME)
+
+    if checkpoint is not None and (checkpoint_output := checkpoint.get(key=key, fingerprint=fingerprint)) is not None:
+        return checkpoint_output
+
+    with trace_stage(stage='table_aware_insight_decomposition'):
+        task_output = await get_async_gpt_4o_mini_response(
+            rate_limiter=rate_limiter,
+            system_prompt=load_prompt(role='system', task='table_aware_insight_decomposition'),
+            user_prompt=render_prompt(role='user', task='table_aware_insight_decomposition', task_input=task_input),
+            key=key
+        )
+
+    if checkpoint is not None:
+        checkpoint.append(task_output, fingerprint=fingerprint)
+
+    return task_output
+
+
+def _normalize_claim(claim: str) -> str:
+    """Claim normalization (unicode form, case, whitespace and trailing punctuation)"""
+    claim = unicodedata.normalize('NFKC', claim).casefold()
+    claim = re.sub(r"\s+", " ", claim)
+
+    return claim.strip().rstrip('.;,!').strip()
+
+
+def fingerprint_claim(claim: str, table_ids: List[str]) -> str:
+    """Fingerprint of a (normalized claim, retrieved table IDs) pair
+
+    Claims with the same fingerprint get the same verification prompt up to normalization,
+    so they are verified once and the scores are shared.
+
+    [Params]
+    claim     : str
+    table_ids : List[str]
+
+    [Return]
+    fingerprint : str
+    """
+    return hashlib.sha256(json.dumps([_normalize_claim(claim), list(table_ids)], ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def _serialize_pruned_tables(
+    tables: List[Dict[str, Any]],
+    query: str,
+    token_budget: int,
+    truncation_policy: Literal['rank', 'rows', 'even']='rank'
+    ) -> Tuple[str, int]:
+    """Serialization of the tables pruned against a query (truncated if the most relevant table alone is over the budget), with the dropped tokens"""
+    return serialize_tables(tables=prune_tables(tables=tables, query=query, token_budget=token_budget), token_budget=token_budget, truncation_policy=truncation_policy)
+
+
+async def _verify_claim(
+    rate_limiter: RateLimiter,
+    claim: str,
+    serialized_tables: str,
+    key: Any,
+    checkpoint: Checkpoint=None,
+    table_ids: List[str]=None,
+    verification_buffer: Dict[str, asyncio.Future]=None,
+    scorer: Literal['sampling', 'logprob']='sampling',
+    tables: List[Dict[str, Any]]=None,
+    pruning_token_budget: int=None,
+    truncation_policy: Literal['rank', 'rows', 'even']='rank'
+    ) -> Dict[str, Any]:
+    """Verify a single claim (sharing the in-flight or finished verification of a duplicate claim)
+
+    With a pruning token budget, the claim is verified against its own pruned `tables` instead of `serialized_tables`,
+    and the output reports the table tokens truncated to fit the budget.
+    """
+    fingerprint = fingerprint_stage(
+        task='claim_verification',
+        task_input={'claim': claim, 'serialized_tables': serialized_tables},
+        model_name=JUDGE_MODEL_NAME,
+        scorer=scorer,
+        pruning_token_budget=pruning_token_budget,
+        truncation_policy=truncation_policy
+    )
+
+    if checkpoint is not None and (checkpoint_output := checkpoint.get(key=key, fingerprint=fingerprint)) is not None:
+        return checkpoint_output
+
+    claim_fingerprint = fingerprint_claim(claim=claim, table_ids=table_ids) if verification_buffer is not None and table_ids is not None else None
+
+    is_shared = claim_fingerprint is not None and claim_fingerprint in verification_buffer
+
+    if is_shared:
+        shared_output = await asyncio.shield(verification_buffer[claim_fingerprint])
+        # Duplicates are fanned out under their own key and cost nothing
+        task_output = {**shared_output, 'input_tokens_cost': 0, 'output_tokens_cost': 0, 'key': key}
+
+    else:
+        num_of_dropped_tokens = None
+        if pruning_token_budget is not None and tables is not None:
+            serialized_tables, num_of_dropped_tokens = _serialize_pruned_tables(tables=tables, query=claim, token_budget=pruning_token_budget, truncation_policy=truncation_policy)
+
+        task_input = {
+            'claim': claim,
+            'serialized_tables': serialized_tables
+        }
+
+        get_async_responses = get_async_logprob_g_eval_responses if scorer == 'logprob' else get_async_g_eval_responses
+
+        with trace_stage(stage='claim_verification'):
+            future = asyncio.ensure_future(get_async_responses(
+                rate_limiter=rate_limiter,
+                user_prompt=render_prompt(role='system', task='claim_verification', task_input=task_input),
+                key=key,
+                min_score=0.0,
+                max_score=1.0
+            ))
+
+        if claim_fingerprint is not None:
+            verification_buffer[claim_fingerprint] = future
+
+        task_output = await future
+        if num_of_dropped_tokens is not None:
+            task_output['num_of_dropped_tokens'] = num_of_dropped_tokens
+
+        if claim_fingerprint is not None and task_output.get('error'):
+            # Failed verifications are not shared with later duplicates, so the sweep re-sends them
+            verification_buffer.pop(claim_fingerprint, None)
+
+    if checkpoint is not None:
+        checkpoint.append(task_output, fingerprint=fingerprint, shared=is_shared)
+
+    return task_output
+
+
+async def _verify_claims(
+    rate_limiter: RateLimiter,
+    claims: List[str],
+    serialized_tables: str,
+    idx: int,
+    checkpoint: Checkpoint=None,
+    tables: List[Dict[str, Any]]=None,
+    pruning_token_budget: int=None,
+    truncation_policy: Literal['rank', 'rows', 'even']='rank'
+    ) -> List[Dict[str, Any]]:
+    """Verify all claims of a single insight in one request
+
+    Only claims missing from the checkpoint are sent. The request cost is split evenly over them, and
+    claims without any parsed score are marked as failed so the sweep re-verifies them one by one.
+    With a pruning token budget, `tables` are pruned against all the claims sent together, and the
+    first of them reports the table tokens truncated to fit the budget.
+    """
+    fingerprints = [
+        fingerprint_stage(
+            task='batched_claim_verification',
+            task_input={'claim': claim, 'serialized_tables': serialized_tables},
+            model_name=JUDGE_MODEL_NAME,
+            pruning_token_budget=pruning_token_budget,
+            truncation_policy=truncation_policy
+        )
+        for claim in claims
+    ]
+    task_output_set = [
+        checkpoint.get(key=(idx, jdx), fingerprint=fingerprint) if checkpoint is not None else None
+        for jdx, fingerprint in enumerate(fingerprints)
+    ]
+    pending_jdx_set = [jdx for jdx, task_output in enumerate(task_output_set) if task_output is None]
+
+    if not pending_jdx_set:
+        return task_output_set
+
+    num_of_dropped_tokens = None
+    if pruning_token_budget is not None and tables is not None:
+        serialized_tables, num_of_dropped_tokens = _serialize_pruned_tables(
+            tables=tables,
+            query='\n'.join(claims[jdx] for jdx in pending_jdx_set),
+            token_budget=pruning_token_budget,
+            truncation_policy=truncation_policy
+        )
+
+    task_input = {
+        'claims': '\n'.join(f'{number + 1}. {claims[jdx]}' for number, jdx in enumerate(pending_jdx_set)),
+        'serialized_tables': serialized_tables
+    }
+
+    with trace_stage(stage='claim_verification'):
+        batched_task_output = await get_async_batched_g_eval_responses(
+            rate_limiter=rate_limiter,
+            user_prompt=render_prompt(role='system', task='batched_claim_verification', task_input=task_input),
+            key=idx,
+            num_of_items=len(pending_jdx_set),
+            min_score=0.0,
+            max_score=1.0
+        )
+
+    for jdx, responses in zip(pending_jdx_set, batched_task_output['responses_set']):
+        task_output = {
+            'user_prompt': batched_task_output['user_prompt'],
+            'responses': responses,
+            'input_tokens_cost': batched_task_output['input_tokens_cost'] / len(pending_jdx_set),
+            'output_tokens_cost': batched_task_output['output_tokens_cost'] / len(pending_jdx_set),
+            'key': (idx, jdx)
+        }
+
+        if num_of_dropped_tokens is not None:
+            task_output['num_of_dropped_tokens'] = num_of_dropped_tokens if jdx == pending_jdx_set[0] else 0
+
+        if batched_task_output.get('error'):
+            task_output['error'] = batched_task_output['error']
+        elif not responses:
+            task_output['error'] = f"No score parsed for claim {jdx + 1} of the batched verification"
+
+        if checkpoint is not None:
+            checkpoint.append(task_output, fingerprint=fingerprints[jdx])
+
+        task_output_set[jdx] = task_output
+
+    return task_output_set
+
+
+async def _verify_insight_claims(
+    rate_limiter: RateLimiter,
+    idx: int,
+    claims: List[str],
+    tables: List[Dict[str, Any]],
+    checkpoint: Checkpoint=None,
+    verification_buffer: Dict[str, asyncio.Future]=None,
+    batched: bool=False,
+    scorer: Literal['sampling', 'logprob']='sampling',
+    pruning_token_budget: int=None,
+    serialization_token_budget: int=None,
+    truncation_policy: Literal['rank', 'rows', 'even']='rank'
+    ) -> List[Dict[str, Any]]:
+    """Verify the claims of a single insight (one request per claim, or all of them in one request in batched mode)
+
+    The table tokens dropped for the insight go to the truncation report: summed over its pruned claims
+    with a pruning token budget, or those of its serialized tables with a serialization token budget.
+    """
+    serialized_tables, num_of_dropped_tokens = serialize_tables(tables=tables, token_budget=serialization_token_budget, truncation_policy=truncation_policy)
+
+    if batched and claims:
+        verification_outputs = await _verify_claims(
+            rate_limiter=rate_limiter,
+            claims=claims,
+            serialized_tables=serialized_tables,
+            idx=idx,
+            checkpoint=checkpoint,
+            tables=tables,
+            pruning_token_budget=pruning_token_budget,
+            truncation_policy=truncation_policy
+        )
+
+    else:
+        verification_outputs = await asyncio.gather(*[
+            _verify_claim(
+                rate_limiter=rate_limiter,
+                claim=claim,
+                serialized_tables=serialized_tables,
+                key=(idx, jdx),
+                checkpoint=checkpoint,
+                table_ids=[table['id'] for table in tables],
+                verification_buffer=verification_buffer,
+                scorer=scorer,
+                tables=tables,
+                pruning_token_budget=pruning_token_budget,
+                truncation_policy=truncation_policy
+            )
+            for jdx, claim in enumerate(claims)
+        ])
+
+    # Pruned claims are truncated within the pruning token budget, claim by claim
+    if pruning_token_budget is not None:
+        load_truncation_report()[('claim_verification', idx)] = sum(output.get('num_of_dropped_tokens', 0) for output in verification_outputs)
+    elif serialization_token_budget is not None:
+        load_truncation_report()[('claim_verification', idx)] = num_of_dropped_tokens
+
+    return list(verification_outputs)
+
+
+def _to_claim_verification_result(task_output: Dict[str, Any]) -> Dict[str, Union[float, int]]:
+    """Claim verification result"""
+    return {
+        'result': sum(task_output['responses']) / len(task_output['responses']) if task_output['responses'] else 0.0,
+        'key': task_output['key']
+    }
 
 
 async def table_aware_insight_decomposition(
     predicted_insight_set: List[str],
-    retrieved_tables_set: List[List[Dict[str, Any]]]
+    retrieved_tables_set: List[List[Dict[str, Any]]],
+    checkpoint: Checkpoint=None,
+    rate_limiter: RateLimiter=None
     ) -> Tuple[List[List[str]], float]:
     """Decompose table-aware insight
 
     [Params]
     predicted_insight_set : List[str]
     retrieved_tables_set  : List[List[Dict[str, Any]]]
+    checkpoint            : Checkpoint
+    rate_limiter          : RateLimiter
 
     [Returns]
     decomposed_claims_set : List[List[str]]
     cost                  : float
     """
-    semaphore = asyncio.Semaphore(load_batch_size(flag='openai'))
-    
-    task_input_set = [
-        {
-            'insight': insight,
-            'serialized_table_schemas': '\n'.join([serialize_table(table=table, is_cell=False) for table in tables])
-        }
-        for insight, tables
-        in zip(predicted_insight_set, retrieved_tables_set)
-    ]
+    rate_limiter = rate_limiter or load_rate_limiter(model_name=JUDGE_MODEL_NAME)
     
     tasks = [
-		get_async_gpt_4o_mini_response(
-			semaphore=semaphore,
-            system_prompt=load_prompt(role='system', task='table_aware_insight_decomposition'),
-            user_prompt=load_prompt(role='user', task='table_aware_insight_decomposition').format(**task_input),
-            key=idx
-		)
-        for idx, task_input in enumerate(task_input_set)
-	]
+        _decompose_table_aware_insight(
+            rate_limiter=rate_limiter,
+            insight=insight,
+            tables=tables,
+            key=idx,
+            checkpoint=checkpoint
+        )
+        for idx, (insight, tables) in enumerate(zip(predicted_insight_set, retrieved_tables_set))
+    ]
     
     task_output_set = []
     
@@ -47,6 +342,18 @@ async def table_aware_insight_decomposition(
         task_output = await _
         task_output_set.append(task_output)
     
+    task_output_set = await sweep_failures(
+        task_output_set=task_output_set,
+        resubmit=lambda task_output: _decompose_table_aware_insight(
+            rate_limiter=load_rate_limiter(model_name=JUDGE_MODEL_NAME, sweep=True),
+            insight=predicted_insight_set[task_output['key']],
+            tables=retrieved_tables_set[task_output['key']],
+            key=task_output['key'],
+            checkpoint=checkpoint
+        ),
+        stage='table_aware_insight_decomposition'
+    )
+    
     cost = sum([output['input_tokens_cost'] + output['output_tokens_cost'] for output in task_output_set])
     
     sorted_task_output_set = sorted(task_output_set, key=lambda x: x['key'])
@@ -61,60 +368,92 @@ async def table_aware_insight_decomposition(
 
 async def claim_verification(
     decomposed_claims_set: List[List[str]],
-    retrieved_tables_set: List[List[Dict[str, Any]]]
+    retrieved_tables_set: List[List[Dict[str, Any]]],
+    checkpoint: Checkpoint=None,
+    rate_limiter: RateLimiter=None,
+    batched: bool=False,
+    scorer: Literal['sampling', 'logprob']='sampling',
+    pruning_token_budget: int=None,
+    serialization_token_budget: int=None,
+    truncation_policy: Literal['rank', 'rows', 'even']='rank'
     ) -> Tuple[List[Dict[str, Union[float, int]]], float]:
     """Verify claims
 
+    Claims are fingerprinted with the IDs of their retrieved tables; only unique pairs are verified
+    and their scores are fanned back out to every (idx, jdx) key. In batched mode, all claims of an
+    insight are verified in a single request instead. The logprob scorer replaces the n sampled
+    completions with the expected score over the top-k score token logprobs of a single completion
+    (one claim per request, so it is not combined with batched mode). With a pruning token budget,
+    each claim (or each batch of claims) only sees the table rows and columns relevant to it. With a
+    serialization token budget, the tables of each insight are truncated to fit it (see `serialize_tables`).
+
     [Params]
-    decomposed_claims_set : List[List[str]]
-    retrieved_tables_set  : List[List[Dict[str, Any]]]
+    decomposed_claims_set      : List[List[str]]
+    retrieved_tables_set       : List[List[Dict[str, Any]]]
+    checkpoint                 : Checkpoint
+    rate_limiter               : RateLimiter
+    batched                    : bool
+    scorer                     : Literal['sampling', 'logprob']
+    pruning_token_budget       : int (None: no pruning)
+    serialization_token_budget : int (None: no truncation)
+    truncation_policy          : Literal['rank', 'rows', 'even']
 
     [Returns]
     claim_verification_results_with_key : List[Dict[str, Union[float, int]]]
     cost                                : float
     """
-    semaphore = asyncio.Semaphore(load_batch_size(flag='openai'))
-    
-    task_inputs_set = [
-        [
-            {
-                'claim': claim,
-                'serialized_tables': '\n'.join(serialize_table(table=table) for table in tables)
-            }
-            for claim in decomposed_claims
-        ]
-        for decomposed_claims, tables
-        in zip(decomposed_claims_set, retrieved_tables_set)
-    ]
-    
-    tasks = [
-        get_async_g_eval_responses(
-            semaphore=semaphore,
-            user_prompt=load_prompt(role='system', task='claim_verification').format(**task_input),
-            key=(idx, jdx),
-            min_score=0.0,
-            max_score=1.0
+    rate_limiter = rate_limiter or load_rate_limiter(model_name=JUDGE_MODEL_NAME)
+    verification_buffer = dict()
+
+    async def verify(rate_limiter: RateLimiter, idx: int, batched: bool) -> Tuple[int, List[Dict[str, Any]]]:
+        return idx, await _verify_insight_claims(
+            rate_limiter=rate_limiter,
+            idx=idx,
+            claims=decomposed_claims_set[idx],
+            tables=retrieved_tables_set[idx],
+            checkpoint=checkpoint,
+            verification_buffer=verification_buffer,
+            batched=batched,
+            scorer=scorer,
+            pruning_token_budget=pruning_token_budget,
+            serialization_token_budget=serialization_token_budget,
+            truncation_policy=truncation_policy
         )
-        for idx, task_inputs in enumerate(task_inputs_set)
-        for jdx, task_input in enumerate(task_inputs)
-    ]
-    
-    task_output_set = []
-    
+
+    tasks = [verify(rate_limiter=rate_limiter, idx=idx, batched=batched) for idx in range(len(decomposed_claims_set))]
+
+    match_outputs_with_idx = dict()
+
     for _ in tqdm_asyncio.as_completed(tasks, total=len(tasks), desc="Verify claims"):
-        task_output = await _
-        task_output_set.append(task_output)
+        idx, verification_outputs = await _
+        match_outputs_with_idx[idx] = verification_outputs
+
+    # Insights with failed claims (in either mode) are re-verified one claim per request, as in the evaluation sweep
+    resubmitted_outputs_set = await asyncio.gather(*[
+        verify(rate_limiter=load_rate_limiter(model_name=JUDGE_MODEL_NAME, sweep=True), idx=idx, batched=False)
+        for idx, verification_outputs in match_outputs_with_idx.items()
+        if any(task_output.get('error') for task_output in verification_outputs)
+    ])
+
+    for idx, verification_outputs in resubmitted_outputs_set:
+        load_dead_letter().extend(
+            {'stage': 'claim_verification', 'key': task_output['key'], 'error': task_output['error']}
+            for task_output in verification_outputs
+            if task_output.get('error')
+        )
+        match_outputs_with_idx[idx] = verification_outputs
+
+    task_output_set = [task_output for verification_outputs in match_outputs_with_idx.values() for task_output in verification_outputs]
     
     cost = sum([output['input_tokens_cost'] + output['output_tokens_cost'] for output in task_output_set])
     
     sorted_task_output_set = sorted(task_output_set, key=lambda x: x['key'])
     
+    # Claims that failed for good are dead-lettered instead of being scored as unfaithful
     claim_verification_results_with_key = [
-        {
-            'result': sum(task_output['responses']) / len(task_output['responses']) if task_output['responses'] else 0.0,
-            'key': task_output['key']
-        }
+        _to_claim_verification_result(task_output=task_output)
         for task_output in sorted_task_output_set
+        if not task_output.get('error')
     ]
     
     return claim_verification_results_with_key, cost
\ No newline at end of file
@@ -0,0 +1,394 @@
+import asyncio
+from tqdm.asyncio import tqdm_asyncio
+from typing import Any, Dict, List, Literal, Tuple
+from utils import Checkpoint, RateLimiter, extract_from_numbered_list, load_dead_letter, load_rate_limiter
+from ._load_config import JUDGE_MODEL_NAME
+from ._eval_completeness import _decompose_question_aware_insight, _match_topics
+from ._eval_faithfulness import _decompose_table_aware_insight, _to_claim_verification_result, _verify_insight_claims
+
+
+async def _evaluate_faithfulness(
+    rate_limiter: RateLimiter,
+    idx: int,
+    insight: str,
+    tables: List[Dict[str, Any]],
+    checkpoints: Dict[str, Checkpoint],
+    verification_buffer: Dict[str, asyncio.Future],
+    batched_verification: bool=False,
+    scorer: Literal['sampling', 'logprob']='sampling',
+    pruning_token_budget: int=None,
+    serialization_token_budget: int=None,
+    truncation_policy: Literal['rank', 'rows', 'even']='rank'
+    ) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Faithfulness chain of a single item (decompose, then verify)"""
+    decomposition_output = await _decompose_table_aware_insight(
+        rate_limiter=rate_limiter,
+        insight=insight,
+        tables=tables,
+        key=idx,
+        checkpoint=checkpoints.get('table_aware_insight_decomposition')
+    )
+    decomposed_claims = extract_from_numbered_list(response=decomposition_output['response'])
+
+    verification_outputs = await _verify_insight_claims(
+        rate_limiter=rate_limiter,
+        idx=idx,
+        claims=decomposed_claims,
+        tables=tables,
+        checkpoint=checkpoints.get('claim_verification'),
+        verification_buffer=verification_buffer,
+        batched=batched_verification,
+        scorer=scorer,
+        pruning_token_budget=pruning_token_budget,
+        serialization_token_budget=serialization_token_budget,
+        truncation_policy=truncation_policy
+    )
+
+    return decomposed_claims, [decomposition_output, *verification_outputs]
+
+
+async def _evaluate_completeness(
+    rate_limiter: RateLimiter,
+    idx: int,
+    predicted_insight: str,
+    ground_truth_insight: str,
+    question: str,
+    checkpoints: Dict[str, Checkpoint]
+    ) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+    """Completeness chain of a single item (two decompositions, then matching)"""
+    pred_decomposition_output, gt_decomposition_output = await asyncio.gather(
+        _decompose_question_aware_insight(
+            rate_limiter=rate_limiter,
+            insight=predicted_insight,
+            question=question,
+            key=idx,
+            checkpoint=checkpoints.get('question_aware_insight_decomposition_pred')
+        ),
+        _decompose_question_aware_insight(
+            rate_limiter=rate_limiter,
+            insight=ground_truth_insight,
+            question=question,
+            key=idx,
+            checkpoint=checkpoints.get('question_aware_insight_decomposition_gt')
+        )
+    )
+    decomposed_pred_topics = extract_from_numbered_list(response=pred_decomposition_output['response'])
+    decomposed_gt_topics = extract_from_numbered_list(response=gt_decomposition_output['response'])
+
+    matching_output = await _match_topics(
+        rate_limiter=rate_limiter,
+        pred_topics=decomposed_pred_topics,
+        gt_topics=decomposed_gt_topics,
+        key=idx,
+        checkpoint=checkpoints.get('topic_semantic_matching')
+    )
+
+    return decomposed_pred_topics, decomposed_gt_topics, [pred_decomposition_output, gt_decomposition_output, matching_output]
+
+
+async def evaluate_insight(
+    idx: int,
+    predicted_insight: str,
+    ground_truth_insight: str,
+    question: str,
+    tables: List[Dict[str, Any]],
+    checkpoints: Dict[str, Checkpoint]=None,
+    rate_limiter: RateLimiter=None,
+    verification_buffer: Dict[str, asyncio.Future]=None,
+    batched_verification: bool=False,
+    scorer: Literal['sampling', 'logprob']='sampling',
+    pruning_token_budget: int=None,
+    serialization_token_budget: int=None,
+    truncation_policy: Literal['rank', 'rows', 'even']='rank',
+    generation_error: str=None
+    ) -> Dict[str, Any]:
+    """Evaluate a single insight (faithfulness and completeness chains side by side)
+
+    Items sharing one `verification_buffer` verify each (claim, retrieved tables) fingerprint only once.
+    With a pruning token budget, claims are verified against the tables pruned to them; with a
+    serialization token budget, against the tables truncated to fit it. An insight whose generation
+    failed for good is not evaluated; its item output only carries the generation error.
+
+    [Params]
+    idx                        : int
+    predicted_insight          : str
+    ground_truth_insight       : str
+    question                   : str
+    tables                     : List[Dict[str, Any]]
+    checkpoints                : Dict[str, Checkpoint]
+    rate_limiter               : RateLimiter
+    verification_buffer        : Dict[str, asyncio.Future]
+    batched_verification       : bool
+    scorer                     : Literal['sampling', 'logprob']
+    pruning_token_budget       : int (None: no pruning)
+    serialization_token_budget : int (None: no truncation)
+    truncation_policy          : Literal['rank', 'rows', 'even']
+    generation_error           : str (None: the insight was generated)
+
+    [Return]
+    item_output : Dict[str, Any]
+    e.g. dict_keys(['key', 'decomposed_claims', 'claim_verification_outputs',
+                    'decomposed_pred_topics', 'decomposed_gt_topics', 'topic_semantic_matching_output', 'cost', 'errors', 'inputs'])
+    """
+    if generation_error is not None:
+        # The empty insight of a failed generation would otherwise be scored as a zero
+        return {
+            'key': idx,
+            'decomposed_claims': [],
+            'claim_verification_outputs': [],
+            'decomposed_pred_topics': [],
+            'decomposed_gt_topics': [],
+            'topic_semantic_matching_output': {'key': idx, 'response': ''},
+            'cost': 0.0,
+            'errors': [{'stage': 'generate_insight', 'key': idx, 'error': generation_error}],
+            'inputs': None
+        }
+
+    rate_limiter = rate_limiter or load_rate_limiter(model_name=JUDGE_MODEL_NAME)
+    checkpoints = checkpoints or dict()
+    verification_buffer = verification_buffer if verification_buffer is not None else dict()
+
+    (decomposed_claims, faithfulness_outputs), (decomposed_pred_topics, decomposed_gt_topics, completeness_outputs) = await asyncio.gather(
+        _evaluate_faithfulness(
+            rate_limiter=rate_limiter,
+            idx=idx,
+            insight=predicted_insight,
+            tables=tables,
+            checkpoints=checkpoints,
+            verification_buffer=verification_buffer,
+            batched_verification=batched_verification,
+            scorer=scorer,
+            pruning_token_budget=pruning_token_budget,
+            serialization_token_budget=serialization_token_budget,
+            truncation_policy=truncation_policy
+        ),
+        _evaluate_completeness(
+            rate_limiter=rate_limiter,
+            idx=idx,
+            predicted_insight=predicted_insight,
+            ground_truth_insight=ground_truth_insight,
+            question=question,
+            checkpoints=checkpoints
+        )
+    )
+
+    stages = [
+        'table_aware_insight_decomposition', *['claim_verification'] * (len(faithfulness_outputs) - 1),
+        'question_aware_insight_decomposition_pred', 'question_aware_insight_decomposition_gt', 'topic_semantic_matching'
+    ]
+
+    errors = [
+        {'stage': stage, 'key': output['key'], 'error': output['error']}
+        for stage, output in zip(stages, faithfulness_outputs + completeness_outputs)
+        if output.get('error')
+    ]
+
+    return {
+        'key': idx,
+        'decomposed_claims': decomposed_claims,
+        'claim_verification_outputs': faithfulness_outputs[1:],
+        'decomposed_pred_topics': decomposed_pred_topics,
+        'decomposed_gt_topics': decomposed_gt_topics,
+        'topic_semantic_matching_output': completeness_outputs[-1],
+        'cost': sum(output['input_tokens_cost'] + output['output_tokens_cost'] for output in faithfulness_outputs + completeness_outputs),
+        'errors': errors,
+        'inputs': {
+            'predicted_insight': predicted_insight,
+            'ground_truth_insight': ground_truth_insight,
+            'question': question,
+            'tables': tables
+        } if errors else None
+    }
+
+
+async def sweep_evaluation_failures(
+    item_output_set: List[Dict[str, Any]],
+    checkpoints: Dict[str, Checkpoint]=None,
+    verification_buffer: Dict[str, asyncio.Future]=None,
+    scorer: Literal['sampling', 'logprob']='sampling',
+    pruning_token_budget: int=None,
+    serialization_token_budget: int=None,
+    truncation_policy: Literal['rank', 'rows', 'even']='rank'
+    ) -> List[Dict[str, Any]]:
+    """Re-evaluate items with failed calls in a smaller, slower batch and dead-letter what still fails
+
+    Completed calls are served from the checkpoints (or the response cache), so only the failed ones are re-sent.
+    Claims are re-verified one per request, so a claim a batched verification could not score gets its own call.
+    Items whose insight generation failed are left as they are.
+
+    [Params]
+    item_output_set            : List[Dict[str, Any]]
+    checkpoints                : Dict[str, Checkpoint]
+    verification_buffer        : Dict[str, asyncio.Future]
+    scorer                     : Literal['sampling', 'logprob']
+    pruning_token_budget       : int (None: no pruning)
+    serialization_token_budget : int (None: no truncation)
+    truncation_policy          : Literal['rank', 'rows', 'even']
+
+    [Return]
+    swept_item_output_set : List[Dict[str, Any]]
+    """
+    failed_item_output_set = [output for output in item_output_set if output['errors'] and output['inputs'] is not None]
+
+    if not failed_item_output_set:
+        return item_output_set
+
+    resubmitted_item_output_set = await asyncio.gather(*[
+        evaluate_insight(
+            idx=output['key'],
+            **output['inputs'],
+            checkpoints=checkpoints,
+            rate_limiter=load_rate_limiter(model_name=JUDGE_MODEL_NAME, sweep=True),
+            verification_buffer=verification_buffer,
+            scorer=scorer,
+            pruning_token_budget=pruning_token_budget,
+            serialization_token_budget=serialization_token_budget,
+            truncation_policy=truncation_policy
+        )
+        for output in failed_item_output_set
+    ])
+
+    for output in resubmitted_item_output_set:
+        load_dead_letter().extend(output['errors'])
+
+    match_item_output_with_key = {output['key']: output for output in resubmitted_item_output_set}
+
+    swept_item_output_set = [match_item_output_with_key.get(output['key'], output) for output in item_output_set]
+
+    return swept_item_output_set
+
+
+def collect_evaluation_results(item_output_set: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], float]:
+    """Collect per-item evaluation outputs into stage-level results
+
+    Items whose faithfulness or completeness chain still has failed calls are listed under
+    'excluded_item_ids' for that dimension; items whose insight generation failed, under both.
+
+    [Param]
+    item_output_set : List[Dict[str, Any]]
+
+    [Returns]
+    evaluation_results : Dict[str, Any]
+    cost               : float
+    """
+    cost = sum([output['cost'] for output in item_output_set])
+
+    # Items with calls that failed for good are left out of scoring instead of counting as zeros
+    faithfulness_stages = {'generate_insight', 'table_aware_insight_decomposition', 'claim_verification'}
+    completeness_stages = {'generate_insight', 'question_aware_insight_decomposition_pred', 'question_aware_insight_decomposition_gt', 'topic_semantic_matching'}
+    excluded_item_ids = {
+        'faithfulness': sorted({output['key'] for output in item_output_set if any(error['stage'] in faithfulness_stages for error in output['errors'])}),
+        'completeness': sorted({output['key'] for output in item_output_set if any(error['stage'] in completeness_stages for error in output['errors'])})
+    }
+
+    sorted_item_output_set = sorted(item_output_set, key=lambda x: x['key'])
+
+    evaluation_results = {
+        'decomposed_claims_set': [output['decomposed_claims'] for output in sorted_item_output_set],
+        'claim_verification_results_with_key': [
+            _to_claim_verification_result(task_output=task_output)
+            for output in sorted_item_output_set
+            for task_output in output['claim_verification_outputs']
+            if not task_output.get('error')
+        ],
+        'decomposed_pred_topics_set': [output['decomposed_pred_topics'] for output in sorted_item_output_set],
+        'decomposed_gt_topics_set': [output['decomposed_gt_topics'] for output in sorted_item_output_set],
+        'topic_semantic_matching_results_with_key': [
+            {
+                'result': output['topic_semantic_matching_output']['response'],
+                'key': output['key']
+            }
+            for output in sorted_item_output_set
+        ],
+        'excluded_item_ids': excluded_item_ids
+    }
+
+    return evaluation_results, cost
+
+
+async def evaluate_insights(
+    predicted_insight_set: List[str],
+    ground_truth_insight_set: List[str],
+    question_set: List[str],
+    retrieved_tables_set: List[List[Dict[str, Any]]],
+    checkpoints: Dict[str, Checkpoint]=None,
+    rate_limiter: RateLimiter=None,
+    batched_verification: bool=False,
+    scorer: Literal['sampling', 'logprob']='sampling',
+    pruning_token_budget: int=None,
+    serialization_token_budget: int=None,
+    truncation_policy: Literal['rank', 'rows', 'even']='rank',
+    generation_errors: Dict[int, str]=None
+    ) -> Tuple[Dict[str, Any], float]:
+    """Evaluate insights (faithfulness and completeness) in a single event loop
+
+    Every item runs both chains concurrently over one shared rate limiter, and moves on to
+    its next stage as soon as its own previous stage finishes. Duplicate claims over the same
+    retrieved tables are verified once across all items. Items whose insight generation failed
+    are not evaluated, and are excluded from both dimensions.
+
+    [Params]
+    predicted_insight_set      : List[str]
+    ground_truth_insight_set   : List[str]
+    question_set               : List[str]
+    retrieved_tables_set       : List[List[Dict[str, Any]]]
+    checkpoints                : Dict[str, Checkpoint]
+    rate_limiter               : RateLimiter
+    batched_verification       : bool
+    scorer                     : Literal['sampling', 'logprob']
+    pruning_token_budget       : int (None: no pruning)
+    serialization_token_budget : int (None: no truncation)
+    truncation_policy          : Literal['rank', 'rows', 'even']
+    generation_errors          : Dict[int, str] (item index -> error of its failed generation)
+
+    [Returns]
+    evaluation_results : Dict[str, Any]
+    e.g. dict_keys(['decomposed_claims_set', 'claim_verification_results_with_key',
+                    'decomposed_pred_topics_set', 'decomposed_gt_topics_set', 'topic_semantic_matching_results_with_key', 'excluded_item_ids'])
+    cost               : float
+    """
+    rate_limiter = rate_limiter or load_rate_limiter(model_name=JUDGE_MODEL_NAME)
+    checkpoints = checkpoints or dict()
+    verification_buffer = dict()
+    generation_errors = generation_errors or dict()
+
+    tasks = [
+        evaluate_insight(
+            rate_limiter=rate_limiter,
+            idx=idx,
+            predicted_insight=predicted_insight,
+            ground_truth_insight=ground_truth_insight,
+            question=question,
+            tables=tables,
+            checkpoints=checkpoints,
+            verification_buffer=verification_buffer,
+            batched_verification=batched_verification,
+            scorer=scorer,
+            pruning_token_budget=pruning_token_budget,
+            serialization_token_budget=serialization_token_budget,
+            truncation_policy=truncation_policy,
+            generation_error=generation_errors.get(idx)
+        )
+        for idx, (predicted_insight, ground_truth_insight, question, tables)
+        in enumerate(zip(predicted_insight_set, ground_truth_insight_set, question_set, retrieved_tables_set))
+    ]
+
+    item_output_set = []
+
+    for _ in tqdm_asyncio.as_completed(tasks, total=len(tasks), desc="Evaluate insights"):
+        item_output = await _
+        item_output_set.append(item_output)
+
+    item_output_set = await sweep_evaluation_failures(
+        item_output_set=item_output_set,
+        checkpoints=checkpoints,
+        verification_buffer=verification_buffer,
+        scorer=scorer,
+        pruning_token_budget=pruning_token_budget,
+        serialization_token_budget=serialization_token_budget,
+        truncation_policy=truncation_policy
+    )
+
+    evaluation_results, cost = collect_evaluation_results(item_output_set=item_output_set)
+
+    return evaluation_results, cost
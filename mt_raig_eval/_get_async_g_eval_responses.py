@@ -1,10 +1,10 @@
-import asyncio
+import math
 import traceback
-import yaml
 import re
-from langchain_openai import ChatOpenAI
 from langchain.schema import AIMessage, HumanMessage, SystemMessage
 from typing import Any, Dict, List
+from utils import RateLimiter, ResponseCache, estimate_tokens, load_backend, load_response_cache, load_tracer
+from ._load_config import JUDGE_MODEL_NAME, PRICING
 
 
 def _parse_responses(responses: List[Any], min_score: float, max_score: float) -> List[float]:
@@ -28,7 +28,7 @@ def _parse_responses(responses: List[Any], min_score: float, max_score: float) -
 
 
 async def get_async_g_eval_responses(
-        semaphore: asyncio.Semaphore,
+        rate_limiter: RateLimiter,
         user_prompt: str,
         key: Any,
         min_score: float,
@@ -37,43 +37,280 @@ async def get_async_g_eval_responses(
     """Get asynchronous OpenAI G-Eval responses (GPT-4o mini)
 
     [Params]
-    semaphore   : asyncio.Semaphore
-    user_prompt : str
-    model_name  : str
-    key         : Any
-    min_score   : float
-    max_score   : float
+    rate_limiter : RateLimiter
+    user_prompt  : str
+    key          : Any
+    min_score    : float
+    max_score    : float
 
     [Return]
     instance : Dict[str, Any]
-    e.g. dict_keys(['user_prompt', 'responses', 'input_tokens_cost', 'output_tokens_cost', 'key'])
+    e.g. dict_keys(['user_prompt', 'responses', 'input_tokens_cost', 'output_tokens_cost', 'key'(, 'error')])
     """
-    global llm
+    global llm_params
     global input_token_price
     global output_token_price
 
-    async with semaphore:
-        try:
-            user_message = HumanMessage(user_prompt)
+    response_cache = load_response_cache()
+    cache_key = ResponseCache.make_key(llm_params['model'], llm_params, '', user_prompt)
+    span = load_tracer().start(client='g_eval', model=llm_params['model'], key=key)
 
-            responses = await llm.agenerate([[user_message]])
+    if response_cache is not None and (cached := response_cache.get(cache_key)) is not None:
+        load_tracer().finish(span=span, cached=True)
 
-            input_tokens = sum(res.message.usage_metadata['input_tokens'] for res in responses.generations[0]) / len(responses.generations[0])
-            output_tokens = sum(res.message.usage_metadata['output_tokens'] for res in responses.generations[0])
+        return {
+            'user_prompt': user_prompt,
+            'responses': _parse_responses(cached['responses'], min_score, max_score),
+            'input_tokens_cost': 0,
+            'output_tokens_cost': 0,
+            'key': key
+        }
 
-            input_tokens_cost = input_tokens * input_token_price
-            output_tokens_cost = output_tokens * output_token_price
+    try:
+        user_message = HumanMessage(user_prompt)
 
-            scores = _parse_responses([res.text for res in responses.generations[0]], min_score, max_score)
+        estimated_tokens = estimate_tokens(user_prompt) + llm_params['n'] * llm_params['max_tokens']
 
-        except Exception as e:
-            return {
-                'user_prompt': user_prompt,
-                'responses': [f"[{key}] {traceback.format_exc()}"],
-                'input_tokens_cost': 0,
-                'output_tokens_cost': 0,
-                'key': key
-            }
+        llm = load_backend().load_chat_model(llm_params=llm_params)
+
+        responses = await rate_limiter.call(lambda: llm.agenerate([[user_message]]), tokens=estimated_tokens, span=span)
+
+        input_tokens = sum(res.message.usage_metadata['input_tokens'] for res in responses.generations[0]) / len(responses.generations[0])
+        output_tokens = sum(res.message.usage_metadata['output_tokens'] for res in responses.generations[0])
+
+        rate_limiter.settle(estimated_tokens=estimated_tokens, actual_tokens=input_tokens + output_tokens)
+
+        input_tokens_cost = input_tokens * input_token_price
+        output_tokens_cost = output_tokens * output_token_price
+
+        scores = _parse_responses([res.text for res in responses.generations[0]], min_score, max_score)
+
+        load_tracer().finish(span=span, input_tokens=input_tokens, output_tokens=output_tokens, cost=input_tokens_cost + output_tokens_cost)
+
+    except Exception:
+        load_tracer().finish(span=span, error=True)
+
+        return {
+            'user_prompt': user_prompt,
+            'responses': [],
+            'input_tokens_cost': 0,
+            'output_tokens_cost': 0,
+            'key': key,
+            'error': traceback.format_exc()
+        }
+
+    if response_cache is not None:
+        response_cache.set(cache_key, {'responses': [res.text for res in responses.generations[0]]})
+
+    return {
+        'user_prompt': user_prompt,
+        'responses': scores,
+        'input_tokens_cost': input_tokens_cost,
+        'output_tokens_cost': output_tokens_cost,
+        'key': key
+    }
+
+
+def _parse_batched_responses(responses: List[Any], num_of_items: int, min_score: float, max_score: float) -> List[List[float]]:
+    """Parsing and Filtering of numbered score lists (one list of sampled scores per item)"""
+    scores_set = [[] for _ in range(num_of_items)]
+
+    for res in responses:
+        for number, score in re.findall(r"(?:^|\s)(\d+)\.\s*(\d+(?:\.\d+)?)\b", res):
+            jdx = int(number) - 1
+            if 0 <= jdx < num_of_items and min_score <= float(score) <= max_score:
+                scores_set[jdx].append(float(score))
+
+    return scores_set
+
+
+async def get_async_batched_g_eval_responses(
+        rate_limiter: RateLimiter,
+        user_prompt: str,
+        key: Any,
+        num_of_items: int,
+        min_score: float,
+        max_score: float
+    ) -> Dict[str, Any]:
+    """Get asynchronous OpenAI G-Eval responses for a numbered list of items in a single request (GPT-4o mini)
+
+    Every sample scores all items, so each item gets its own list of sampled scores.
+
+    [Params]
+    rate_limiter : RateLimiter
+    user_prompt  : str
+    key          : Any
+    num_of_items : int
+    min_score    : float
+    max_score    : float
+
+    [Return]
+    instance : Dict[str, Any]
+    e.g. dict_keys(['user_prompt', 'responses_set', 'input_tokens_cost', 'output_tokens_cost', 'key'(, 'error')])
+    """
+    global llm_params
+    global input_token_price
+    global output_token_price
+
+    # Room for a "{number}. {score}" line per item
+    max_tokens = llm_params['max_tokens'] + 4 * num_of_items
+
+    response_cache = load_response_cache()
+    cache_key = ResponseCache.make_key(llm_params['model'], {**llm_params, 'max_tokens': max_tokens}, '', user_prompt)
+    span = load_tracer().start(client='batched_g_eval', model=llm_params['model'], key=key)
+
+    if response_cache is not None and (cached := response_cache.get(cache_key)) is not None:
+        load_tracer().finish(span=span, cached=True)
+
+        return {
+            'user_prompt': user_prompt,
+            'responses_set': _parse_batched_responses(cached['responses'], num_of_items, min_score, max_score),
+            'input_tokens_cost': 0,
+            'output_tokens_cost': 0,
+            'key': key
+        }
+
+    try:
+        user_message = HumanMessage(user_prompt)
+
+        estimated_tokens = estimate_tokens(user_prompt) + llm_params['n'] * max_tokens
+
+        llm = load_backend().load_chat_model(llm_params=llm_params)
+
+        responses = await rate_limiter.call(lambda: llm.agenerate([[user_message]], max_tokens=max_tokens), tokens=estimated_tokens, span=span)
+
+        input_tokens = sum(res.message.usage_metadata['input_tokens'] for res in responses.generations[0]) / len(responses.generations[0])
+        output_tokens = sum(res.message.usage_metadata['output_tokens'] for res in responses.generations[0])
+
+        rate_limiter.settle(estimated_tokens=estimated_tokens, actual_tokens=input_tokens + output_tokens)
+
+        input_tokens_cost = input_tokens * input_token_price
+        output_tokens_cost = output_tokens * output_token_price
+
+        scores_set = _parse_batched_responses([res.text for res in responses.generations[0]], num_of_items, min_score, max_score)
+
+        load_tracer().finish(span=span, input_tokens=input_tokens, output_tokens=output_tokens, cost=input_tokens_cost + output_tokens_cost)
+
+    except Exception:
+        load_tracer().finish(span=span, error=True)
+
+        return {
+            'user_prompt': user_prompt,
+            'responses_set': [[] for _ in range(num_of_items)],
+            'input_tokens_cost': 0,
+            'output_tokens_cost': 0,
+            'key': key,
+            'error': traceback.format_exc()
+        }
+
+    if response_cache is not None:
+        response_cache.set(cache_key, {'responses': [res.text for res in responses.generations[0]]})
+
+    return {
+        'user_prompt': user_prompt,
+        'responses_set': scores_set,
+        'input_tokens_cost': input_tokens_cost,
+        'output_tokens_cost': output_tokens_cost,
+        'key': key
+    }
+
+
+def _expected_score(top_logprobs: List[Any], min_score: float, max_score: float) -> List[float]:
+    """Expected score over the valid score tokens of the first output token (empty if none is valid)"""
+    probabilities = dict()
+
+    for token, logprob in top_logprobs:
+        if re.fullmatch(r"\d+(\.\d+)?", token.strip()) and min_score <= float(token.strip()) <= max_score:
+            score = float(token.strip())
+            probabilities[score] = probabilities.get(score, 0.0) + math.exp(logprob)
+
+    if not probabilities:
+        return []
+
+    return [sum(score * probability for score, probability in probabilities.items()) / sum(probabilities.values())]
+
+
+async def get_async_logprob_g_eval_responses(
+        rate_limiter: RateLimiter,
+        user_prompt: str,
+        key: Any,
+        min_score: float,
+        max_score: float
+    ) -> Dict[str, Any]:
+    """Get asynchronous OpenAI logprob G-Eval response (GPT-4o mini)
+
+    A single one-token completion with its top-k token logprobs replaces the n sampled completions;
+    'responses' holds the expected score over the valid score tokens, so its mean is the score.
+
+    [Params]
+    rate_limiter : RateLimiter
+    user_prompt  : str
+    key          : Any
+    min_score    : float
+    max_score    : float
+
+    [Return]
+    instance : Dict[str, Any]
+    e.g. dict_keys(['user_prompt', 'responses', 'input_tokens_cost', 'output_tokens_cost', 'key'(, 'error')])
+    """
+    global logprob_llm_params
+    global input_token_price
+    global output_token_price
+
+    response_cache = load_response_cache()
+    cache_key = ResponseCache.make_key(logprob_llm_params['model'], logprob_llm_params, '', user_prompt)
+    span = load_tracer().start(client='logprob_g_eval', model=logprob_llm_params['model'], key=key)
+
+    if response_cache is not None and (cached := response_cache.get(cache_key)) is not None:
+        load_tracer().finish(span=span, cached=True)
+
+        return {
+            'user_prompt': user_prompt,
+            'responses': _expected_score(cached['top_logprobs'], min_score, max_score),
+            'input_tokens_cost': 0,
+            'output_tokens_cost': 0,
+            'key': key
+        }
+
+    try:
+        user_message = HumanMessage(user_prompt)
+
+        estimated_tokens = estimate_tokens(user_prompt) + logprob_llm_params['max_tokens']
+
+        logprob_llm = load_backend().load_chat_model(llm_params=logprob_llm_params)
+
+        responses = await rate_limiter.call(lambda: logprob_llm.agenerate([[user_message]]), tokens=estimated_tokens, span=span)
+
+        generation = responses.generations[0][0]
+        input_tokens = generation.message.usage_metadata['input_tokens']
+        output_tokens = generation.message.usage_metadata['output_tokens']
+
+        rate_limiter.settle(estimated_tokens=estimated_tokens, actual_tokens=input_tokens + output_tokens)
+
+        input_tokens_cost = input_tokens * input_token_price
+        output_tokens_cost = output_tokens * output_token_price
+
+        content = generation.generation_info['logprobs']['content']
+        top_logprobs = [[_['token'], _['logprob']] for _ in content[0]['top_logprobs']] if content else []
+
+        scores = _expected_score(top_logprobs, min_score, max_score)
+
+        load_tracer().finish(span=span, input_tokens=input_tokens, output_tokens=output_tokens, cost=input_tokens_cost + output_tokens_cost)
+
+    except Exception:
+        load_tracer().finish(span=span, error=True)
+
+        return {
+            'user_prompt': user_prompt,
+            'responses': [],
+            'input_tokens_cost': 0,
+            'output_tokens_cost': 0,
+            'key': key,
+            'error': traceback.format_exc()
+        }
+
+    if response_cache is not None:
+        response_cache.set(cache_key, {'top_logprobs': top_logprobs})
 
     return {
         'user_prompt': user_prompt,
@@ -84,19 +321,25 @@ async def get_async_g_eval_responses(
     }
 
 
-if __name__ == 'mt_raig_eval._get_async_g_eval_response':
-    API_KEY =  yaml.load(open('config/openai_api_key.yaml'), Loader=yaml.FullLoader)['api_key']
+if __name__ == 'mt_raig_eval._get_async_g_eval_responses':
+    llm_params = {
+        'model': JUDGE_MODEL_NAME,
+        'temperature': 2.0,
+        'presence_penalty': 0,
+        'frequency_penalty': 0,
+        'n': 20,
+        'top_p': 1,
+        'max_tokens': 5
+    }
 
-    llm = ChatOpenAI(
-        model='gpt-4o-mini-2024-07-18',
-        temperature=2.0,
-        api_key=API_KEY,
-        presence_penalty=0,
-        frequency_penalty=0,
-        n=20,
-        top_p=1,
-        max_tokens=5
-    )
+    logprob_llm_params = {
+        'model': JUDGE_MODEL_NAME,
+        'temperature': 0.0,
+        'n': 1,
+        'max_tokens': 1,
+        'logprobs': True,
+        'top_logprobs': 20
+    }
 
-    input_token_price = 0.15/1e6
-    output_token_price = 0.60/1e6
\ No newline at end of file
+    input_token_price = PRICING[JUDGE_MODEL_NAME]['input_token_price']
+    output_token_price = PRICING[JUDGE_MODEL_NAME]['output_token_price']
\ No newline at end of file
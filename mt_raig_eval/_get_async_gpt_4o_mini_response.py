@@ -1,13 +1,12 @@
-import asyncio
 import traceback
-import yaml
-from langchain_openai import ChatOpenAI
 from langchain.schema import AIMessage, HumanMessage, SystemMessage
 from typing import Any, Dict
+from utils import RateLimiter, ResponseCache, estimate_tokens, load_backend, load_response_cache, load_tracer
+from ._load_config import JUDGE_MODEL_NAME, PRICING
 
 
 async def get_async_gpt_4o_mini_response(
-        semaphore: asyncio.Semaphore,
+        rate_limiter: RateLimiter,
         system_prompt: str,
         user_prompt: str,
         key: Any
@@ -15,41 +14,70 @@ async def get_async_gpt_4o_mini_response(
     """Get asynchronous GPT-4o mini response
 
     [Params]
-    semaphore     : asyncio.Semaphore
+    rate_limiter  : RateLimiter
     system_prompt : str
     user_prompt   : str
     key           : Any
 
     [Return]
     instance : Dict[str, Any]
-    e.g. dict_keys(['system_prompt', 'user_prompt', 'response', 'input_tokens_cost', 'output_tokens_cost', 'key'])
+    e.g. dict_keys(['system_prompt', 'user_prompt', 'response', 'input_tokens_cost', 'output_tokens_cost', 'key'(, 'error')])
     """
-    global llm
+    global llm_params
     global input_token_price
     global output_token_price
 
-    async with semaphore:
-        try:
-            system_message = SystemMessage(system_prompt)
-            human_message = HumanMessage(user_prompt)
-
-            response = await llm.ainvoke([system_message, human_message])
-
-            input_tokens = response.usage_metadata['input_tokens']
-            output_tokens = response.usage_metadata['output_tokens']
-
-            input_tokens_cost = input_tokens * input_token_price
-            output_tokens_cost = output_tokens * output_token_price
-        
-        except Exception:
-            return {
-                'system_prompt': system_prompt,
-                'user_prompt': user_prompt,
-                'response': f"[{key}] {traceback.format_exc()}",
-                'input_tokens_cost': 0,
-                'output_tokens_cost': 0,
-                'key': key
-            }
+    response_cache = load_response_cache()
+    cache_key = ResponseCache.make_key(llm_params['model'], llm_params, system_prompt, user_prompt)
+    span = load_tracer().start(client='gpt_4o_mini', model=llm_params['model'], key=key)
+
+    if response_cache is not None and (cached := response_cache.get(cache_key)) is not None:
+        load_tracer().finish(span=span, cached=True)
+
+        return {
+            'system_prompt': system_prompt,
+            'user_prompt': user_prompt,
+            'response': cached['response'],
+            'input_tokens_cost': 0,
+            'output_tokens_cost': 0,
+            'key': key
+        }
+
+    try:
+        system_message = SystemMessage(system_prompt)
+        human_message = HumanMessage(user_prompt)
+
+        estimated_tokens = estimate_tokens(system_prompt + user_prompt)
+
+        llm = load_backend().load_chat_model(llm_params=llm_params)
+
+        response = await rate_limiter.call(lambda: llm.ainvoke([system_message, human_message]), tokens=estimated_tokens, span=span)
+
+        input_tokens = response.usage_metadata['input_tokens']
+        output_tokens = response.usage_metadata['output_tokens']
+
+        rate_limiter.settle(estimated_tokens=estimated_tokens, actual_tokens=input_tokens + output_tokens)
+
+        input_tokens_cost = input_tokens * input_token_price
+        output_tokens_cost = output_tokens * output_token_price
+
+        load_tracer().finish(span=span, input_tokens=input_tokens, output_tokens=output_tokens, cost=input_tokens_cost + output_tokens_cost)
+    
+    except Exception:
+        load_tracer().finish(span=span, error=True)
+
+        return {
+            'system_prompt': system_prompt,
+            'user_prompt': user_prompt,
+            'response': '',
+            'input_tokens_cost': 0,
+            'output_tokens_cost': 0,
+            'key': key,
+            'error': traceback.format_exc()
+        }
+
+    if response_cache is not None:
+        response_cache.set(cache_key, {'response': response.content.replace('\n', ' ').strip()})
 
     return {
         'system_prompt': system_prompt,
@@ -62,13 +90,10 @@ async def get_async_gpt_4o_mini_response(
 
 
 if __name__ == 'mt_raig_eval._get_async_gpt_4o_mini_response':
-    API_KEY =  yaml.load(open('config/openai_api_key.yaml'), Loader=yaml.FullLoader)['api_key']
-
-    llm = ChatOpenAI(
-        model='gpt-4o-mini-2024-07-18',
-        temperature=0.0,
-        api_key=API_KEY
-    )
+    llm_params = {
+        'model': JUDGE_MODEL_NAME,
+        'temperature': 0.0
+    }
 
-    input_token_price = 0.15/1e6
-    output_token_price = 0.60/1e6
\ No newline at end of file
+    input_token_price = PRICING[JUDGE_MODEL_NAME]['input_token_price']
+    output_token_price = PRICING[JUDGE_MODEL_NAME]['output_token_price']
\ No newline at end of file
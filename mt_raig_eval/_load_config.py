@@ -0,0 +1,6 @@
+if __name__ == 'mt_raig_eval._load_config':
+    JUDGE_MODEL_NAME = 'gpt-4o-mini-2024-07-18'
+
+    PRICING = {
+        'gpt-4o-mini-2024-07-18': {'input_token_price': 0.15/1e6, 'output_token_price': 0.60/1e6}
+    }
\ No newline at end of file
@@ -0,0 +1,49 @@
+import argparse
+import json
+from utils import load_mt_raig_bench
+from utils_retrieval import compute_recall, retrieve_tables
+
+
+def main(path_dir: str, retriever: str='bm25', top_k: int=10, rebuild: bool=False, embedder: str='dpr', index_dtype: str='float32'):
+    mt_raig_bench = load_mt_raig_bench(path_dir=path_dir)
+    gold_table_ids_set = [data['gold_table_id_set'] for data in mt_raig_bench]
+
+    dpr_recall = compute_recall(
+        retrieved_table_ids_set=[[table['id'] for table in tables[:top_k]] for tables in mt_raig_bench.retrieved_tables_set],
+        gold_table_ids_set=gold_table_ids_set
+    )
+    retrieved_table_ids_set, recall = retrieve_tables(
+        mt_raig_bench=mt_raig_bench,
+        retriever=retriever,
+        top_k=top_k,
+        rebuild=rebuild,
+        embedder=embedder,
+        dtype=index_dtype
+    )
+
+    with open(f'{path_dir}/{retriever}_top_{top_k}_retrieved_table_ids_set.json', 'w') as file:
+        json.dump(retrieved_table_ids_set, file, ensure_ascii=False)
+
+    print(f"dpr recall@{top_k}: {dpr_recall * 100:.2f}")
+    print(f"{retriever} recall@{top_k}: {recall * 100:.2f}")
+    print(f"{len(retrieved_table_ids_set)} retrieval results written to {path_dir}/{retriever}_top_{top_k}_retrieved_table_ids_set.json")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--path-dir', type=str, default='mt_raig_bench')
+    parser.add_argument('--retriever', type=str, choices=['bm25', 'dense'], default='bm25')
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--rebuild', action='store_true')
+    parser.add_argument('--embedder', type=str, choices=['dpr', 'hashing'], default='dpr')
+    parser.add_argument('--index-dtype', type=str, choices=['float32', 'float16'], default='float32')
+    args, _ = parser.parse_known_args()
+
+    main(
+        path_dir=args.path_dir,
+        retriever=args.retriever,
+        top_k=args.top_k,
+        rebuild=args.rebuild,
+        embedder=args.embedder,
+        index_dtype=args.index_dtype
+    )
\ No newline at end of file
@@ -1,5 +1,15 @@
+from ._backend import Backend, OpenAIBackend, load_api_key, load_backend
+from ._checkpoint import Checkpoint, fingerprint_stage, load_checkpoint
 from ._extract_from_numbered_list import extract_from_numbered_list
+from ._fake_backend import FakeBackend
 from ._load_batch_size import load_batch_size
-from ._load_mt_raig_bench import load_mt_raig_bench
-from ._load_prompt import load_prompt
-from ._serialize_table import serialize_table
\ No newline at end of file
+from ._load_mt_raig_bench import MTRAIGBENCH, load_mt_raig_bench
+from ._load_prompt import load_prompt, render_prompt, render_prompt_prefix
+from ._prompt_registry import PromptRegistry, load_prompt_registry
+from ._prune_tables import prune_tables
+from ._rate_limiter import RateLimiter, estimate_tokens, load_rate_limiter
+from ._retry_policy import RetryPolicy, load_dead_letter, load_retry_policy, sweep_failures
+from ._response_cache import ResponseCache, load_response_cache
+from ._serialize_table import load_truncation_report, precompute_serialized_tables, serialize_table, serialize_tables
+from ._table_corpus import TableCorpus, convert_table_corpus, is_indexed_table_corpus
+from ._tracer import Tracer, load_tracer, trace_stage
\ No newline at end of file
@@ -0,0 +1,92 @@
+import json
+import yaml
+from abc import ABC, abstractmethod
+from typing import Any, Dict
+
+
+def load_api_key(path: str='config/openai_api_key.yaml') -> str:
+    """Load the OpenAI API key (read on first use, not at import time)
+
+    [Param]
+    path : str
+
+    [Return]
+    api_key : str
+    """
+    if path not in API_KEY_BUFFER:
+        API_KEY_BUFFER[path] = yaml.load(open(path), Loader=yaml.FullLoader)['api_key']
+
+    return API_KEY_BUFFER[path]
+
+
+class Backend(ABC):
+    def __init__(self):
+        """Initialization"""
+        self._chat_models = dict()
+
+    @abstractmethod
+    def _create_chat_model(self, llm_params: Dict[str, Any]) -> Any:
+        """Chat model creation (LangChain chat model interface: ainvoke / agenerate)"""
+
+    def load_chat_model(self, llm_params: Dict[str, Any]) -> Any:
+        """Load a chat model for the given parameters (created once per parameter set)
+
+        [Param]
+        llm_params : Dict[str, Any]
+
+        [Return]
+        chat_model : Any
+        """
+        chat_model_key = json.dumps(llm_params, sort_keys=True, default=str)
+
+        if chat_model_key not in self._chat_models:
+            self._chat_models[chat_model_key] = self._create_chat_model(llm_params=llm_params)
+
+        return self._chat_models[chat_model_key]
+
+
+class OpenAIBackend(Backend):
+    def __init__(self, api_key_path: str='config/openai_api_key.yaml'):
+        """Initialization"""
+        super().__init__()
+        self.api_key_path = api_key_path
+
+    def _create_chat_model(self, llm_params: Dict[str, Any]) -> Any:
+        """ChatOpenAI creation (retries are left to the rate limiter)"""
+        from langchain_openai import ChatOpenAI
+
+        return ChatOpenAI(
+            **llm_params,
+            api_key=load_api_key(path=self.api_key_path),
+            max_retries=0
+        )
+
+    def __str__(self) -> str:
+        """Representation"""
+        return 'OpenAIBackend()'
+
+
+def load_backend(backend: Backend=None) -> Backend:
+    """Load (and optionally replace) the shared LLM backend
+
+    The OpenAI backend is used unless another one (e.g. FakeBackend) is loaded first.
+
+    [Param]
+    backend : Backend
+
+    [Return]
+    backend : Backend
+    """
+    global BACKEND
+    if backend is not None:
+        BACKEND = backend
+    elif BACKEND is None:
+        BACKEND = OpenAIBackend()
+
+    return BACKEND
+
+
+if __name__ == 'utils._backend':
+    API_KEY_BUFFER = dict()
+
+    BACKEND = None
\ No newline at end of file
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterator, Optional
+from ._prompt_registry import load_prompt_registry
+
+
+def _to_key(key: Any) -> Any:
+    """JSON key decoding (lists back to hashable tuples)"""
+    return tuple(_to_key(_) for _ in key) if isinstance(key, list) else key
+
+
+def fingerprint_stage(task: str, task_input: Dict[str, Any], model_name: str, **params: Any) -> str:
+    """Fingerprint of the exact inputs of a stage call
+
+    That is the task inputs (e.g. the insight or claim and the serialized tables), the prompt templates of
+    the task, the model and any other parameter that changes the output (e.g. the scorer).
+
+    [Params]
+    task       : str
+    task_input : Dict[str, Any]
+    model_name : str
+    params     : Any
+
+    [Return]
+    fingerprint : str
+    """
+    prompt_registry = load_prompt_registry()
+    templates = {role: prompt_registry.template(role=role, task=task) for role in ('system', 'user', 'assistant') if (role, task) in prompt_registry}
+
+    return hashlib.sha256(json.dumps([task, task_input, templates, model_name, params], ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class Checkpoint:
+    def __init__(self, path: str, resume: bool=False, incremental: bool=False):
+        """Initialization
+
+        An incremental checkpoint only serves outputs recorded with a matching fingerprint, so outputs
+        from before fingerprinting are recomputed once.
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.path = path
+        self.resume = resume
+        self.incremental = incremental
+        self._outputs = dict()
+        self._num_of_lines = 0
+        self.reused_keys = set()
+        self.shared_keys = set()
+        self.computed_keys = set()
+
+        if resume and os.path.exists(path):
+            with open(path, 'r') as file:
+                for line in file:
+                    self._num_of_lines += 1
+                    try:
+                        output = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn last line from an interrupted run is simply redone
+                        continue
+                    output['key'] = _to_key(output['key'])
+                    self._outputs[output['key']] = output
+
+        self._file = open(path, 'a' if resume else 'w')
+
+        if resume and self._file.tell() > 0:
+            with open(path, 'rb') as file:
+                file.seek(-1, os.SEEK_END)
+                is_torn = file.read(1) != b'\n'
+
+            if is_torn:
+                # Terminate the torn last line before appending
+                self._file.write('\n')
+
+    def get(self, key: Any, fingerprint: str=None) -> Optional[Dict[str, Any]]:
+        """Completed output of a key, if it was computed from the same inputs (None otherwise)
+
+        Outputs recorded without a fingerprint match any fingerprint, except in an incremental checkpoint.
+
+        [Params]
+        key         : Any
+        fingerprint : str
+
+        [Return]
+        output : Optional[Dict[str, Any]]
+        """
+        output = self._outputs.get(key)
+
+        if output is None:
+            return None
+
+        if fingerprint is not None and output.get('fingerprint', None if self.incremental else fingerprint) != fingerprint:
+            return None
+
+        self.reused_keys.add(key)
+
+        return output
+
+    def append(self, output: Dict[str, Any], fingerprint: str=None, shared: bool=False):
+        """Keyed output appending (with the fingerprint of its inputs, if given)
+
+        Failed outputs (with an 'error') are not recorded, so a resumed run retries them.
+        Prompts are dropped since the stages only consume responses and costs. Shared outputs
+        (fanned out from the call of a duplicate) are told apart from the ones of their own call.
+        """
+        (self.shared_keys if shared else self.computed_keys).add(output['key'])
+
+        if output.get('error'):
+            return
+
+        output = {k: v for k, v in output.items() if k not in ('system_prompt', 'user_prompt', 'prompt')}
+        if fingerprint is not None:
+            output['fingerprint'] = fingerprint
+
+        self._file.write(json.dumps(output, ensure_ascii=False) + '\n')
+        self._file.flush()
+        self._num_of_lines += 1
+        self._outputs[output['key']] = output
+
+    def close(self):
+        """Closing
+
+        A resumed checkpoint holding superseded or torn lines is compacted to the last output of every key,
+        so files reused run after run do not grow without bound.
+        """
+        self._file.close()
+
+        if self.resume and self._num_of_lines > len(self._outputs):
+            with open(f'{self.path}.tmp', 'w') as file:
+                file.writelines(json.dumps(output, ensure_ascii=False) + '\n' for output in self._outputs.values())
+            os.replace(f'{self.path}.tmp', self.path)
+
+    def __contains__(self, key: Any) -> bool:
+        """Completion check"""
+        return key in self._outputs
+
+    def __getitem__(self, key: Any) -> Dict[str, Any]:
+        """Completed output"""
+        return self._outputs[key]
+
+    def __iter__(self) -> Iterator[Any]:
+        """Completed keys"""
+        return iter(self._outputs)
+
+    def __len__(self) -> int:
+        """Number of completed keys"""
+        return len(self._outputs)
+
+
+def load_checkpoint(path_dir: str, stage: str, resume: bool=False, incremental: bool=False) -> Checkpoint:
+    """Load stage checkpoint
+
+    [Params]
+    path_dir    : str
+    stage       : str
+    resume      : bool
+    incremental : bool
+
+    [Return]
+    checkpoint : Checkpoint
+    """
+    checkpoint = Checkpoint(path=f'{path_dir}/{stage}.jsonl', resume=resume, incremental=incremental)
+
+    return checkpoint
\ No newline at end of file
@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import math
+import random
+import re
+from types import SimpleNamespace
+from typing import Any, Dict, List
+from ._backend import Backend
+from ._extract_from_numbered_list import extract_from_numbered_list
+from ._rate_limiter import estimate_tokens
+
+
+class FakeAPIError(Exception):
+    status_code = 500
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, message: str, retry_after: float):
+        """Initialization (the suggested delay is exposed like an OpenAI retry-after-ms header)"""
+        super().__init__(message)
+        self.response = SimpleNamespace(headers={'retry-after-ms': str(int(retry_after * 1000))})
+
+
+class FakeChatModel:
+    def __init__(self, llm_params: Dict[str, Any], backend: 'FakeBackend'):
+        """Initialization"""
+        self.llm_params = llm_params
+        self.backend = backend
+
+    async def ainvoke(self, messages: List[Any]) -> Any:
+        """Single completion (LangChain chat model interface)"""
+        prompt = '\n'.join(message.content for message in messages)
+        await self.backend._call(prompt=prompt)
+
+        content = self.backend._respond(prompt=prompt, sample_index=0)
+
+        return SimpleNamespace(
+            content=content,
+            usage_metadata={'input_tokens': estimate_tokens(prompt), 'output_tokens': estimate_tokens(content)}
+        )
+
+    async def agenerate(self, messages_set: List[List[Any]], **kwargs) -> Any:
+        """n completions per prompt (LangChain chat model interface)"""
+        generations = []
+
+        for messages in messages_set:
+            prompt = '\n'.join(message.content for message in messages)
+            await self.backend._call(prompt=prompt)
+
+            generation = []
+            for sample_index in range(self.llm_params.get('n', 1)):
+                text = self.backend._respond(prompt=prompt, sample_index=sample_index)
+                generation.append(SimpleNamespace(
+                    text=text,
+                    message=SimpleNamespace(usage_metadata={'input_tokens': estimate_tokens(prompt), 'output_tokens': estimate_tokens(text)}),
+                    generation_info={'logprobs': self.backend._logprobs(prompt=prompt, top_logprobs=self.llm_params['top_logprobs'])}
+                    if self.llm_params.get('logprobs') else None
+                ))
+            generations.append(generation)
+
+        return SimpleNamespace(generations=generations)
+
+
+class FakeBackend(Backend):
+    def __init__(
+        self,
+        latency: float=0.05,
+        error_rate: float=0.0,
+        rate_limit_rate: float=0.0,
+        retry_after: float=1.0,
+        num_of_claims: int=3,
+        faithful_rate: float=0.7,
+        seed: int=0
+        ):
+        """Initialization
+
+        Calls take `latency` seconds on average (uniformly within ±50%), fail with a 500 error at
+        `error_rate` and with a 429 error at `rate_limit_rate`. Outputs only depend on the prompt and
+        the seed, so reruns and cache hits are reproducible; failures depend on the attempt as well.
+        """
+        super().__init__()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.num_of_claims = num_of_claims
+        self.faithful_rate = faithful_rate
+        self.seed = seed
+
+        self._attempts = dict()
+
+        self.num_of_calls = 0
+        self.num_of_errors = 0
+        self.num_of_rate_limited = 0
+        self.latency_seconds = 0.0
+
+    def _create_chat_model(self, llm_params: Dict[str, Any]) -> FakeChatModel:
+        """Fake chat model creation"""
+        return FakeChatModel(llm_params=llm_params, backend=self)
+
+    def _random(self, *salt: Any) -> random.Random:
+        """Seeded random generator of a prompt (and attempt or sample)"""
+        return random.Random(hashlib.sha256(':'.join(str(_) for _ in (self.seed, *salt)).encode('utf-8')).hexdigest())
+
+    async def _call(self, prompt: str):
+        """Simulated latency and failures of a single request"""
+        prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        attempt = self._attempts.get(prompt_hash, 0)
+        self._attempts[prompt_hash] = attempt + 1
+
+        rng = self._random(prompt_hash, 'attempt', attempt)
+        self.num_of_calls += 1
+
+        latency = self.latency * rng.uniform(0.5, 1.5)
+        self.latency_seconds += latency
+        await asyncio.sleep(latency)
+
+        failure = rng.random()
+        if failure < self.rate_limit_rate:
+            self.num_of_rate_limited += 1
+            raise FakeRateLimitError("Rate limit reached (fake)", retry_after=self.retry_after)
+        if failure < self.rate_limit_rate + self.error_rate:
+            self.num_of_errors += 1
+            raise FakeAPIError("Internal server error (fake)")
+
+    def _respond(self, prompt: str, sample_index: int) -> str:
+        """Deterministic output following the format each task expects"""
+        rng = self._random(prompt, 'sample', sample_index)
+
+        if 'Topic set A' in prompt:
+            topics_a = extract_from_numbered_list(response=prompt.split('Topic set A:', 1)[1].split('Topic set B:', 1)[0])
+            topics_b = extract_from_numbered_list(response=prompt.split('Topic set B:', 1)[1].split('**Output**', 1)[0])
+            matched_a = [str(number + 1) for number in range(len(topics_a)) if rng.random() < self.faithful_rate]
+            matched_b = [str(number + 1) for number in range(len(topics_b)) if rng.random() < self.faithful_rate]
+            return f"Matched topic subset of A: [{', '.join(matched_a)}]\nMatched topic subset of B: [{', '.join(matched_b)}]"
+
+        if 'numbered list of claims' in prompt:
+            num_of_items = len(extract_from_numbered_list(response=prompt.rsplit('\nclaims\n', 1)[-1].split('Evaluation Form', 1)[0]))
+            return '\n'.join(f"{number + 1}. {int(rng.random() < self.faithful_rate)}" for number in range(num_of_items))
+
+        if 'Faithfulness' in prompt:
+            return str(int(rng.random() < self.faithful_rate))
+
+        if 'decompos' in prompt:
+            return '\n'.join(f"{number + 1}. Synthetic claim {rng.randrange(10 ** 6)} of the insight" for number in range(self.num_of_claims))
+
+        return f"Synthetic insight {rng.randrange(10 ** 6)} answering the question from the given tables."
+
+    def _logprobs(self, prompt: str, top_logprobs: int) -> Dict[str, Any]:
+        """Deterministic top-k logprobs of a one-token score"""
+        probability = min(max(self._random(prompt, 'logprobs').betavariate(2 * self.faithful_rate + 0.5, 2 * (1 - self.faithful_rate) + 0.5), 1e-6), 1 - 1e-6)
+        candidates = [{'token': '1', 'logprob': math.log(probability)}, {'token': '0', 'logprob': math.log(1 - probability)}]
+
+        return {'content': [{'token': '1' if probability >= 0.5 else '0', 'logprob': math.log(max(probability, 1 - probability)), 'top_logprobs': candidates[:top_logprobs]}]}
+
+    def stats(self) -> Dict[str, float]:
+        """Call statistics (latency_seconds is the simulated I/O time summed over calls)"""
+        return {
+            'num_of_calls': self.num_of_calls,
+            'num_of_errors': self.num_of_errors,
+            'num_of_rate_limited': self.num_of_rate_limited,
+            'latency_seconds': self.latency_seconds
+        }
+
+    def __str__(self) -> str:
+        """Representation"""
+        return f"FakeBackend(calls={self.num_of_calls}, errors={self.num_of_errors}, rate_limited={self.num_of_rate_limited})"
\ No newline at end of file
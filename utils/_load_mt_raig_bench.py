@@ -1,5 +1,8 @@
+import copy
 import json
 from typing import Any, Dict, List, Literal, Union
+from ._serialize_table import precompute_serialized_tables
+from ._table_corpus import TableCorpus, is_indexed_table_corpus
 
 
 class MTRAIGBENCH:
@@ -7,12 +10,18 @@ class MTRAIGBENCH:
         """Initialization"""
         self.path_dir = path_dir
         self._benchmark = json.load(open(f'{path_dir}/benchmark.json', 'r'))
-        self._table_corpus = json.load(open(f'{path_dir}/table_corpus.json', 'r'))
-        self._match_table_with_id = {table['id']: table for table in self._table_corpus}
+        # The indexed corpus (see convert_table_corpus.py) is decoded lazily, one table at a time
+        if is_indexed_table_corpus(path_dir=path_dir):
+            self._table_corpus = TableCorpus(path_dir=path_dir)
+            self._match_table_with_id = self._table_corpus
+        else:
+            self._table_corpus = json.load(open(f'{path_dir}/table_corpus.json', 'r'))
+            self._match_table_with_id = {table['id']: table for table in self._table_corpus}
         self._retrieved_tables_set = self._load_retrieved_tables(path_dir=path_dir)
+        self._item_ids = list(range(len(self._benchmark)))
     
     @property
-    def table_corpus(self) -> List[Dict[str, Any]]:
+    def table_corpus(self) -> Union[List[Dict[str, Any]], TableCorpus]:
         """Table corpus"""
         return self._table_corpus
     
@@ -21,10 +30,53 @@ class MTRAIGBENCH:
         """Top-10 retrieved tables set"""
         return self._retrieved_tables_set
 
+    @property
+    def item_ids(self) -> List[int]:
+        """Positions of the items in the full benchmark"""
+        return self._item_ids
+
     def table(self, table_id: str) -> Dict[str, Any]:
         """Table matching by table ID"""
         return self._match_table_with_id[table_id]
     
+    def precompute_serialized_tables(self) -> int:
+        """Bulk table serialization of the retrieved tables (evaluation then only does lookups)"""
+        return precompute_serialized_tables(tables_set=self._retrieved_tables_set)
+
+    def replace_retrieved_tables(self, retrieved_table_ids_set: List[List[str]]):
+        """Retrieval results replacement (e.g. by an in-process retriever instead of the DPR results)
+
+        [Param]
+        retrieved_table_ids_set : List[List[str]]
+        """
+        if len(retrieved_table_ids_set) != len(self._benchmark):
+            raise ValueError(f"{len(retrieved_table_ids_set)} retrieval results for {len(self._benchmark)} items")
+
+        self._retrieved_tables_set = [[self._match_table_with_id[table_id] for table_id in table_ids] for table_ids in retrieved_table_ids_set]
+
+    def shard(self, shard_index: int, num_of_shards: int) -> 'MTRAIGBENCH':
+        """Contiguous slice `shard_index` of `num_of_shards` (the table corpus is shared)
+
+        [Params]
+        shard_index   : int
+        num_of_shards : int
+
+        [Return]
+        mt_raig_bench_shard : MTRAIGBENCH
+        """
+        if not 0 <= shard_index < num_of_shards:
+            raise ValueError(f"Shard index {shard_index} is out of range for {num_of_shards} shard(s)")
+
+        start = len(self._benchmark) * shard_index // num_of_shards
+        end = len(self._benchmark) * (shard_index + 1) // num_of_shards
+
+        mt_raig_bench_shard = copy.copy(self)
+        mt_raig_bench_shard._benchmark = self._benchmark[start:end]
+        mt_raig_bench_shard._retrieved_tables_set = self._retrieved_tables_set[start:end]
+        mt_raig_bench_shard._item_ids = self._item_ids[start:end]
+
+        return mt_raig_bench_shard
+
     def _load_retrieved_tables(self, path_dir: str):
         """Retrieval results loading"""
         retrieved_table_ids_set = json.load(open(f'{path_dir}/dpr_top_10_retrieved_table_ids_set.json', 'r'))
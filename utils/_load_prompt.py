@@ -1,4 +1,5 @@
-from typing import Literal
+from typing import Any, Dict, Literal
+from ._prompt_registry import load_prompt_registry
 
 
 def load_prompt(
@@ -14,6 +15,46 @@ def load_prompt(
     [Return]
     prompt : str
     """
-    prompt = open(f'prompts/{role}/{task}.txt', 'r').read()
+    prompt = load_prompt_registry().template(role=role, task=task)
 
-    return prompt
\ No newline at end of file
+    return prompt
+
+
+def render_prompt(
+    role: Literal['assistant', 'system', 'user'],
+    task: str,
+    task_input: Dict[str, Any]
+    ) -> str:
+    """Render prompt with task inputs
+
+    [Params]
+    role       : Literal['assistant', 'system', 'user']
+    task       : str
+    task_input : Dict[str, Any]
+
+    [Return]
+    prompt : str
+    """
+    prompt = load_prompt_registry().render(role=role, task=task, task_input=task_input)
+
+    return prompt
+
+
+def render_prompt_prefix(
+    role: Literal['assistant', 'system', 'user'],
+    task: str,
+    task_input: Dict[str, Any]
+    ) -> str:
+    """Render the stable prompt prefix shared by requests over the same inputs (e.g. tables)
+
+    [Params]
+    role       : Literal['assistant', 'system', 'user']
+    task       : str
+    task_input : Dict[str, Any]
+
+    [Return]
+    prompt_prefix : str
+    """
+    prompt_prefix = load_prompt_registry().render_prefix(role=role, task=task, task_input=task_input)
+
+    return prompt_prefix
\ No newline at end of file
@@ -0,0 +1,197 @@
+import os
+from string import Formatter
+from typing import Any, Dict, List, Literal, Tuple
+
+
+def _compile_template(template: str) -> List[Tuple[str, str, str, str]]:
+    """Template compiling into (literal text, field name, conversion, format spec) segments"""
+    segments = []
+
+    for literal_text, field_name, format_spec, conversion in Formatter().parse(template):
+        if field_name is not None and not field_name.isidentifier():
+            raise ValueError(f"Unsupported placeholder {{{field_name}}} (only named placeholders are allowed)")
+        if format_spec and '{' in format_spec:
+            raise ValueError(f"Unsupported nested placeholder in {{{field_name}:{format_spec}}}")
+
+        segments.append((literal_text, field_name, conversion, format_spec))
+
+    return segments
+
+
+class PromptRegistry:
+    def __init__(self, path_dir: str):
+        """Initialization (every template is read, compiled and validated once)"""
+        self.path_dir = path_dir
+        self._templates = dict()
+        self._segments = dict()
+        self._placeholders = dict()
+
+        for role in ['assistant', 'system', 'user']:
+            if not os.path.isdir(f'{path_dir}/{role}'):
+                continue
+
+            for file_name in sorted(os.listdir(f'{path_dir}/{role}')):
+                if not file_name.endswith('.txt'):
+                    continue
+
+                task = file_name[:-len('.txt')]
+                template = open(f'{path_dir}/{role}/{file_name}', 'r').read()
+
+                try:
+                    segments = _compile_template(template=template)
+                except ValueError as e:
+                    raise ValueError(f"{path_dir}/{role}/{file_name}: {e}") from None
+
+                self._templates[(role, task)] = template
+                self._segments[(role, task)] = segments
+                self._placeholders[(role, task)] = {field_name for _, field_name, _, _ in segments if field_name is not None}
+
+        self.validate()
+
+    def validate(self, task_inputs: Dict[Tuple[str, str], List[str]]=None, prefix_inputs: Dict[Tuple[str, str], List[str]]=None):
+        """Placeholder check of the templates against the inputs their tasks provide
+
+        Shared inputs (`prefix_inputs`, e.g. the serialized tables) must come before every varying input,
+        so requests over the same tables share a stable prompt prefix for prefix / prompt caching.
+
+        [Params]
+        task_inputs   : Dict[Tuple[str, str], List[str]]
+        prefix_inputs : Dict[Tuple[str, str], List[str]]
+        """
+        for (role, task), input_names in (prefix_inputs or PREFIX_INPUTS).items():
+            if (role, task) not in self._templates:
+                continue
+
+            field_names = [field_name for _, field_name, _, _ in self._segments[(role, task)] if field_name is not None]
+            num_of_prefix_fields = next((idx for idx, field_name in enumerate(field_names) if field_name not in input_names), len(field_names))
+
+            if any(field_name in input_names for field_name in field_names[num_of_prefix_fields:]):
+                raise ValueError(
+                    f"{self.path_dir}/{role}/{task}.txt: shared inputs {sorted(input_names)} must come before the varying ones"
+                )
+
+        for (role, task), input_names in (task_inputs or TASK_INPUTS).items():
+            if (role, task) not in self._templates:
+                continue
+
+            missing = self._placeholders[(role, task)] - set(input_names)
+            unused = set(input_names) - self._placeholders[(role, task)]
+
+            if missing or unused:
+                raise ValueError(
+                    f"{self.path_dir}/{role}/{task}.txt: placeholders do not match the task inputs "
+                    f"(missing inputs: {sorted(missing)}, unused inputs: {sorted(unused)})"
+                )
+
+    def template(self, role: Literal['assistant', 'system', 'user'], task: str) -> str:
+        """Raw template"""
+        return self._templates[(role, task)]
+
+    def placeholders(self, role: Literal['assistant', 'system', 'user'], task: str) -> List[str]:
+        """Placeholder names of a template"""
+        return sorted(self._placeholders[(role, task)])
+
+    def _render(self, role: str, task: str, task_input: Dict[str, Any], prefix_only: bool=False) -> str:
+        """Compiled template rendering (up to the first varying input if `prefix_only`)"""
+        prefix_input_names = PREFIX_INPUTS.get((role, task), []) if prefix_only else None
+        rendered = []
+
+        for literal_text, field_name, conversion, format_spec in self._segments[(role, task)]:
+            rendered.append(literal_text)
+
+            if field_name is None:
+                continue
+            if prefix_only and field_name not in prefix_input_names:
+                break
+
+            value = task_input[field_name]
+            if conversion:
+                value = FORMATTER.convert_field(value, conversion)
+            rendered.append(format(value, format_spec) if format_spec else str(value))
+
+        return ''.join(rendered)
+
+    def render(self, role: Literal['assistant', 'system', 'user'], task: str, task_input: Dict[str, Any]) -> str:
+        """Rendering through the compiled template (same output as str.format)
+
+        [Params]
+        role       : Literal['assistant', 'system', 'user']
+        task       : str
+        task_input : Dict[str, Any]
+
+        [Return]
+        prompt : str
+        """
+        return self._render(role=role, task=task, task_input=task_input)
+
+    def render_prefix(self, role: Literal['assistant', 'system', 'user'], task: str, task_input: Dict[str, Any]) -> str:
+        """Rendering of the stable prefix (everything before the first varying input)
+
+        [Params]
+        role       : Literal['assistant', 'system', 'user']
+        task       : str
+        task_input : Dict[str, Any]
+
+        [Return]
+        prompt_prefix : str
+        """
+        return self._render(role=role, task=task, task_input=task_input, prefix_only=True)
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        """Registration check of a (role, task) pair"""
+        return key in self._templates
+
+    def __len__(self) -> int:
+        """Number of templates"""
+        return len(self._templates)
+
+
+def load_prompt_registry(path_dir: str=None) -> PromptRegistry:
+    """Load the shared prompt registry
+
+    Templates are loaded from `path_dir` or, by default, from the prompts/ directory next to the package
+    (independent of the current working directory).
+
+    [Param]
+    path_dir : str
+
+    [Return]
+    prompt_registry : PromptRegistry
+    """
+    global prompt_registry
+    if prompt_registry is None or (path_dir is not None and path_dir != prompt_registry.path_dir):
+        prompt_registry = PromptRegistry(path_dir=path_dir or PROMPT_DIR)
+
+    return prompt_registry
+
+
+if __name__ == 'utils._prompt_registry':
+    prompt_registry = None
+
+    PROMPT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'prompts')
+
+    FORMATTER = Formatter()
+
+    # Inputs each task fills its template with
+    TASK_INPUTS = {
+        ('user', 'openai_generate_insight'): ['serialized_tables', 'question'],
+        ('user', 'vllm_generate_insight'): ['serialized_tables', 'question'],
+        ('user', 'table_aware_insight_decomposition'): ['insight', 'serialized_table_schemas'],
+        ('system', 'claim_verification'): ['claim', 'serialized_tables'],
+        ('system', 'batched_claim_verification'): ['claims', 'serialized_tables'],
+        ('user', 'question_aware_insight_decomposition'): ['insight', 'question'],
+        ('user', 'topic_semantic_matching'): ['pred_topics', 'gt_topics'],
+        ('system', 'openai_generate_insight'): [],
+        ('system', 'table_aware_insight_decomposition'): [],
+        ('system', 'question_aware_insight_decomposition'): [],
+        ('system', 'topic_semantic_matching'): []
+    }
+
+    # Inputs shared by many requests, laid out first as a stable prompt prefix
+    PREFIX_INPUTS = {
+        ('user', 'openai_generate_insight'): ['serialized_tables'],
+        ('user', 'vllm_generate_insight'): ['serialized_tables'],
+        ('user', 'table_aware_insight_decomposition'): ['serialized_table_schemas'],
+        ('system', 'claim_verification'): ['serialized_tables'],
+        ('system', 'batched_claim_verification'): ['serialized_tables']
+    }
\ No newline at end of file
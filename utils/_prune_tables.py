@@ -0,0 +1,127 @@
+import re
+from typing import Any, Dict, List, Set, Tuple
+from ._rate_limiter import estimate_tokens
+
+
+def _tokenize(text: str) -> Set[str]:
+    """Lexical tokens (lowercased words and numbers, without stopwords)"""
+    return {token for token in re.findall(r"[a-z0-9]+(?:\.[0-9]+)?", text.lower().replace(',', '')) if token not in STOPWORDS}
+
+
+def _extract_numbers(text: str) -> Set[str]:
+    """Normalized numbers of a text (thousands separators and trailing decimal zeros removed)"""
+    numbers = set()
+
+    for number in re.findall(r"\d+(?:\.\d+)?", text.replace(',', '')):
+        number = number.rstrip('0').rstrip('.') if '.' in number else number.lstrip('0')
+        numbers.add(number or '0')
+
+    return numbers
+
+
+def _prune_table(table: Dict[str, Any], query_tokens: Set[str], query_numbers: Set[str]) -> Tuple[Dict[str, Any], List[float], Set[int], float]:
+    """Relevant rows and columns of a single table (with the row scores, the rows referencing a query number and the table score)"""
+    rows = table['cell']
+    row_scores = []
+    number_rows = set()
+    column_scores = [len(_tokenize(column) & query_tokens) for column in table['header']]
+
+    for row_idx, row in enumerate(rows):
+        cell_tokens_set = [_tokenize(cell) for cell in row]
+        row_score = len(set().union(*cell_tokens_set) & query_tokens) if cell_tokens_set else 0
+
+        if query_numbers and _extract_numbers(' '.join(row)) & query_numbers:
+            number_rows.add(row_idx)
+            row_score += 2
+
+        for column_idx, cell_tokens in enumerate(cell_tokens_set[:len(column_scores)]):
+            column_scores[column_idx] += bool(cell_tokens & query_tokens)
+
+        row_scores.append(row_score)
+
+    kept_row_idx_set = [row_idx for row_idx, row_score in enumerate(row_scores) if row_score > 0] or list(range(min(len(rows), NUM_OF_CONTEXT_ROWS)))
+    # The first column usually names the row entity, so it is always kept
+    kept_column_idx_set = [column_idx for column_idx, column_score in enumerate(column_scores) if column_idx == 0 or column_score > 0]
+    if len(kept_column_idx_set) <= 1:
+        kept_column_idx_set = list(range(len(table['header'])))
+
+    pruned_table = {
+        'title': table['title'],
+        'header': [table['header'][column_idx] for column_idx in kept_column_idx_set],
+        'cell': [[row[column_idx] for column_idx in kept_column_idx_set if column_idx < len(row)] for row in (rows[row_idx] for row_idx in kept_row_idx_set)]
+    }
+    table_score = len(_tokenize(f"{table['title']} {' '.join(table['header'])}") & query_tokens) + sum(row_scores)
+
+    return pruned_table, [row_scores[row_idx] for row_idx in kept_row_idx_set], {jdx for jdx, row_idx in enumerate(kept_row_idx_set) if row_idx in number_rows}, table_score
+
+
+def _fit_rows(pruned_table: Dict[str, Any], row_scores: List[float], number_rows: Set[int], token_budget: int) -> Tuple[Dict[str, Any], int]:
+    """Lowest-scoring rows dropped until the table fits in the token budget (rows referencing a query number go last; one row is always kept)"""
+    head_tokens = estimate_tokens(f"[title] {pruned_table['title']} [header] {' | '.join(pruned_table['header'])}")
+    row_tokens = [estimate_tokens(' | '.join(row)) + 3 for row in pruned_table['cell']]
+
+    kept_row_idx_set = set(range(len(pruned_table['cell'])))
+    num_of_tokens = head_tokens + sum(row_tokens)
+
+    for row_idx in sorted(kept_row_idx_set, key=lambda row_idx: (row_idx in number_rows, row_scores[row_idx], -row_idx)):
+        if num_of_tokens <= token_budget or len(kept_row_idx_set) == 1:
+            break
+        kept_row_idx_set.remove(row_idx)
+        num_of_tokens -= row_tokens[row_idx]
+
+    fitted_table = {**pruned_table, 'cell': [row for row_idx, row in enumerate(pruned_table['cell']) if row_idx in kept_row_idx_set]}
+
+    return fitted_table, num_of_tokens
+
+
+def prune_tables(tables: List[Dict[str, Any]], query: str, token_budget: int=None) -> List[Dict[str, Any]]:
+    """Query-aware table pruning
+
+    Keeps the rows and columns of each table that share words or numbers with the query (a claim or a
+    question); rows referencing a number of the query are always kept. Tables without any overlap are
+    dropped when another table overlaps. With a token budget, tables are added by decreasing relevance
+    and their lowest-scoring rows are dropped to fit; the most relevant table is always kept.
+    Pruned tables have no ID, so their serializations bypass the serialization cache.
+
+    [Params]
+    tables       : List[Dict[str, Any]]
+    query        : str
+    token_budget : int (None: no budget)
+
+    [Return]
+    pruned_tables : List[Dict[str, Any]] (in retrieval order)
+    """
+    query_tokens = _tokenize(query)
+    query_numbers = _extract_numbers(query)
+
+    pruned_table_set = [_prune_table(table=table, query_tokens=query_tokens, query_numbers=query_numbers) for table in tables]
+
+    relevant_table_idx_set = [table_idx for table_idx, (_, _, _, table_score) in enumerate(pruned_table_set) if table_score > 0] or list(range(min(1, len(tables))))
+    ranked_table_idx_set = sorted(relevant_table_idx_set, key=lambda table_idx: -pruned_table_set[table_idx][3])
+
+    kept_tables = dict()
+    remaining_tokens = token_budget
+
+    for table_idx in ranked_table_idx_set:
+        pruned_table, row_scores, number_rows, _ = pruned_table_set[table_idx]
+
+        if token_budget is None:
+            kept_tables[table_idx] = pruned_table
+            continue
+
+        fitted_table, num_of_tokens = _fit_rows(pruned_table=pruned_table, row_scores=row_scores, number_rows=number_rows, token_budget=remaining_tokens)
+
+        if num_of_tokens <= remaining_tokens or not kept_tables:
+            kept_tables[table_idx] = fitted_table
+            remaining_tokens -= num_of_tokens
+
+    return [kept_tables[table_idx] for table_idx in sorted(kept_tables)]
+
+
+if __name__ == 'utils._prune_tables':
+    NUM_OF_CONTEXT_ROWS = 3
+
+    STOPWORDS = {
+        'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'have', 'in', 'is', 'it', 'its',
+        'of', 'on', 'or', 'than', 'that', 'the', 'their', 'this', 'to', 'was', 'were', 'which', 'with'
+    }
\ No newline at end of file
@@ -0,0 +1,256 @@
+import asyncio
+import os
+import random
+import re
+import yaml
+from time import monotonic
+from typing import Any, Awaitable, Callable, Dict, Optional
+from ._load_batch_size import load_batch_size
+from ._retry_policy import RetryPolicy, load_retry_policy
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a prompt
+
+    Uses tiktoken when it is installed, otherwise the ~4 characters per token rule of thumb.
+
+    [Param]
+    text : str
+
+    [Return]
+    num_of_tokens : int
+    """
+    if TOKENIZER is not None:
+        return len(TOKENIZER.encode(text, disallowed_special=()))
+
+    return len(text) // 4 + 1
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """Rate-limit header duration parsing (e.g. '20', '1.5s', '250ms', '6m0s')"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+
+    matched = re.findall(r"(\d+(?:\.\d+)?)(ms|s|m|h)", value or '')
+    if not matched:
+        return None
+
+    unit_seconds = {'ms': 1e-3, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+    return sum(float(amount) * unit_seconds[unit] for amount, unit in matched)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Rate-limit (HTTP 429) error check"""
+    return getattr(error, 'status_code', None) == 429 or type(error).__name__ == 'RateLimitError'
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Server-suggested delay (in seconds) of a rate-limit error, if any"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or dict()
+
+    if headers.get('retry-after-ms') is not None:
+        return _parse_duration(headers['retry-after-ms'] + 'ms')
+
+    for header in ['retry-after', 'x-ratelimit-reset-requests', 'x-ratelimit-reset-tokens']:
+        if headers.get(header) is not None and (delay := _parse_duration(headers[header])) is not None:
+            return delay
+
+    return None
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        rpm: Optional[int]=None,
+        tpm: Optional[int]=None,
+        max_concurrency: int=300,
+        max_retries: int=6,
+        base_delay: float=1.0,
+        max_delay: float=60.0,
+        retry_policy: RetryPolicy=None
+        ):
+        """Initialization
+
+        rpm / tpm of None disable the corresponding bucket. max_retries, base_delay and max_delay
+        apply to rate-limit errors; other transient errors follow `retry_policy` (no retry if None).
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_policy = retry_policy
+
+        self._requests = float(rpm) if rpm else 0.0
+        self._tokens = float(tpm) if tpm else 0.0
+        self._refilled_at = monotonic()
+        self._paused_until = 0.0
+        self._loop = None
+
+        self.num_of_rate_limited = 0
+        self.num_of_in_flight = 0
+        self.peak_in_flight = 0
+        self.busy_seconds = 0.0
+
+    def _bind(self):
+        """asyncio primitives of the running event loop (each asyncio.run gets fresh ones)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def _refill(self):
+        """Token bucket refilling"""
+        now = monotonic()
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+
+        if self.rpm:
+            self._requests = min(float(self.rpm), self._requests + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            self._tokens = min(float(self.tpm), self._tokens + elapsed * self.tpm / 60.0)
+
+    async def acquire(self, tokens: int):
+        """Wait until one request of `tokens` tokens fits in the RPM/TPM budgets"""
+        self._bind()
+        # Requests larger than the whole TPM budget would never fit; let them drain the bucket instead
+        tokens = min(tokens, self.tpm) if self.tpm else tokens
+
+        async with self._lock:
+            while True:
+                self._refill()
+                delay = max(0.0, self._paused_until - monotonic())
+
+                if self.rpm and self._requests < 1:
+                    delay = max(delay, (1 - self._requests) * 60.0 / self.rpm)
+                if self.tpm and self._tokens < tokens:
+                    delay = max(delay, (tokens - self._tokens) * 60.0 / self.tpm)
+
+                if delay <= 0:
+                    break
+
+                await asyncio.sleep(delay)
+
+            self._requests -= 1
+            self._tokens -= tokens
+
+    def settle(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token bucket once the actual usage of a request is known"""
+        if self.tpm:
+            self._tokens -= actual_tokens - estimated_tokens
+
+    def backoff(self, delay: float):
+        """Pause every request of this limiter for `delay` seconds"""
+        self._paused_until = max(self._paused_until, monotonic() + delay)
+
+    async def call(self, coroutine_function: Callable[[], Awaitable[Any]], tokens: int, span: Dict[str, Any]=None) -> Any:
+        """Rate-limited call with jittered exponential backoff on failures
+
+        Rate-limit errors pause the whole limiter (following the rate-limit headers when present);
+        other transient errors are retried according to the retry policy. A tracing span, if given,
+        gets the time spent waiting (budgets, concurrency and backoff), the latency of the last
+        attempt and the number of retries.
+
+        [Params]
+        coroutine_function : Callable[[], Awaitable[Any]]
+        tokens             : int
+        span               : Dict[str, Any]
+
+        [Return]
+        result : Any
+        """
+        self._bind()
+        rate_limit_attempt = 0
+        transient_attempt = 0
+        queued_at = monotonic()
+
+        while True:
+            await self.acquire(tokens=tokens)
+
+            async with self._semaphore:
+                # Occupancy bookkeeping (busy_seconds / wall time is the mean number of requests in flight)
+                self.num_of_in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.num_of_in_flight)
+                started_at = monotonic()
+
+                if span is not None:
+                    span['queue_wait_seconds'] += started_at - queued_at
+
+                try:
+                    return await coroutine_function()
+
+                except Exception as e:
+                    if is_rate_limit_error(e) and rate_limit_attempt < self.max_retries:
+                        self.num_of_rate_limited += 1
+                        delay = (retry_after(e) or min(self.max_delay, self.base_delay * 2 ** rate_limit_attempt)) * random.uniform(1.0, 1.5)
+                        self.backoff(delay=delay)
+                        rate_limit_attempt += 1
+
+                    elif not is_rate_limit_error(e) and self.retry_policy is not None and self.retry_policy.should_retry(error=e, attempt=transient_attempt):
+                        self.retry_policy.num_of_retries += 1
+                        delay = self.retry_policy.delay(attempt=transient_attempt)
+                        transient_attempt += 1
+
+                    else:
+                        raise
+
+                    if span is not None:
+                        span['num_of_retries'] += 1
+
+                finally:
+                    self.num_of_in_flight -= 1
+                    queued_at = monotonic()
+                    self.busy_seconds += queued_at - started_at
+
+                    if span is not None:
+                        span['latency_seconds'] = queued_at - started_at
+
+            await asyncio.sleep(delay)
+
+
+def load_rate_limiter(model_name: str, sweep: bool=False) -> RateLimiter:
+    """Load the shared rate limiter of a model
+
+    Budgets come from config/rate_limits.yaml; models missing there are only limited in concurrency.
+    The sweep limiter re-submits failed items in a smaller, slower batch (a tenth of the budgets).
+
+    [Params]
+    model_name : str
+    sweep      : bool
+
+    [Return]
+    rate_limiter : RateLimiter
+    """
+    if (model_name, sweep) not in RATE_LIMITER_BUFFER:
+        rate_limits = RATE_LIMITS.get(model_name, dict())
+        scale = 10 if sweep else 1
+
+        rate_limiter = RateLimiter(
+            rpm=rate_limits['rpm'] // scale if rate_limits.get('rpm') else None,
+            tpm=rate_limits['tpm'] // scale if rate_limits.get('tpm') else None,
+            max_concurrency=max(1, rate_limits.get('max_concurrency', load_batch_size(flag='openai')) // (3 * scale if sweep else 1)),
+            retry_policy=load_retry_policy(sweep=sweep)
+        )
+        RATE_LIMITER_BUFFER[(model_name, sweep)] = rate_limiter
+
+    else:
+        rate_limiter = RATE_LIMITER_BUFFER[(model_name, sweep)]
+
+    return rate_limiter
+
+
+if __name__ == 'utils._rate_limiter':
+    RATE_LIMITER_BUFFER = dict()
+
+    RATE_LIMITS = yaml.load(open('config/rate_limits.yaml'), Loader=yaml.FullLoader) if os.path.exists('config/rate_limits.yaml') else dict()
+
+    try:
+        import tiktoken
+        TOKENIZER = tiktoken.get_encoding('o200k_base')
+    except ImportError:
+        TOKENIZER = None
\ No newline at end of file
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from time import time
+from typing import Any, Dict, Optional
+
+
+class ResponseCache:
+    def __init__(self, path: str, max_entries: int=1000000):
+        """Initialization"""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        # asyncio tasks share the event loop thread, but vLLM batches and executors may not
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=60.0, isolation_level=None, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, last_access REAL NOT NULL)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+        self._size = self._connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    @staticmethod
+    def make_key(model_name: str, params: Dict[str, Any], system_prompt: str, user_prompt: str) -> str:
+        """Content address of a single LLM call"""
+        payload = json.dumps(
+            [model_name, params, system_prompt, user_prompt],
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value lookup (None on miss)"""
+        with self._lock:
+            row = self._connection.execute('SELECT value FROM responses WHERE key = ?', (key,)).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._connection.execute('UPDATE responses SET last_access = ? WHERE key = ?', (time(), key))
+
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        """Cached value insertion with least-recently-used eviction"""
+        with self._lock:
+            is_new = self._connection.execute('SELECT 1 FROM responses WHERE key = ?', (key,)).fetchone() is None
+            self._connection.execute(
+                'INSERT OR REPLACE INTO responses (key, value, last_access) VALUES (?, ?, ?)',
+                (key, json.dumps(value, ensure_ascii=False), time())
+            )
+            self._size += int(is_new)
+
+            if self._size > self.max_entries:
+                # Evict a little more than needed so eviction does not run on every insertion
+                num_of_evicted = self._size - self.max_entries + max(1, self.max_entries // 100)
+                self._connection.execute(
+                    'DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)',
+                    (num_of_evicted,)
+                )
+                self._size = self._connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters"""
+        return {'hits': self.hits, 'misses': self.misses, 'size': self._size}
+
+    def __len__(self) -> int:
+        """Cache size"""
+        return self._size
+
+    def __str__(self) -> str:
+        """Representation"""
+        return f"ResponseCache(hits={self.hits}, misses={self.misses}, size={self._size})"
+
+
+def load_response_cache(path: str=None, max_entries: int=1000000) -> Optional[ResponseCache]:
+    """Load response cache
+
+    The cache is disabled (None) until it is loaded once with a path.
+
+    [Params]
+    path        : str
+    max_entries : int
+
+    [Return]
+    response_cache : Optional[ResponseCache]
+    """
+    global response_cache
+    if response_cache is None and path is not None:
+        response_cache = ResponseCache(path=path, max_entries=max_entries)
+
+    return response_cache
+
+
+if __name__ == 'utils._response_cache':
+    response_cache = None
\ No newline at end of file
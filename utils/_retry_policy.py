@@ -0,0 +1,104 @@
+import asyncio
+import random
+from typing import Any, Awaitable, Callable, Dict, List
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """Transient error check (connection errors, timeouts, rate limits and server errors; anything else, including bugs, is final)"""
+    status_code = getattr(error, 'status_code', None)
+    if isinstance(status_code, int):
+        return status_code == 429 or status_code >= 500
+
+    return isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)) or any(
+        error_type.__name__ in TRANSIENT_ERROR_NAMES for error_type in type(error).__mro__
+    )
+
+
+class RetryPolicy:
+    def __init__(self, max_retries: int=3, base_delay: float=1.0, max_delay: float=30.0):
+        """Initialization
+
+        The policy only decides; `RateLimiter.call` runs the one retry loop.
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self.num_of_retries = 0
+
+    def should_retry(self, error: Exception, attempt: int) -> bool:
+        """Retry decision after the `attempt`-th (0-based) failed attempt"""
+        return is_retryable_error(error) and attempt < self.max_retries
+
+    def delay(self, attempt: int) -> float:
+        """Backoff delay (exponential with full jitter) after the `attempt`-th failed attempt"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+def load_retry_policy(sweep: bool=False) -> RetryPolicy:
+    """Load the shared retry policy
+
+    The sweep policy is the more patient one used when failed items are re-submitted at the end.
+
+    [Param]
+    sweep : bool
+
+    [Return]
+    retry_policy : RetryPolicy
+    """
+    return SWEEP_RETRY_POLICY if sweep else RETRY_POLICY
+
+
+async def sweep_failures(
+    task_output_set: List[Dict[str, Any]],
+    resubmit: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+    stage: str
+    ) -> List[Dict[str, Any]]:
+    """Re-submit failed outputs once more and dead-letter the ones that still fail
+
+    [Params]
+    task_output_set : List[Dict[str, Any]]
+    resubmit        : Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+    stage           : str
+
+    [Return]
+    swept_task_output_set : List[Dict[str, Any]]
+    """
+    failed_task_output_set = [task_output for task_output in task_output_set if task_output.get('error')]
+
+    if not failed_task_output_set:
+        return task_output_set
+
+    resubmitted_task_output_set = await asyncio.gather(*[resubmit(task_output) for task_output in failed_task_output_set])
+
+    for task_output in resubmitted_task_output_set:
+        if task_output.get('error'):
+            DEAD_LETTER.append({'stage': stage, 'key': task_output['key'], 'error': task_output['error']})
+
+    match_task_output_with_key = {task_output['key']: task_output for task_output in resubmitted_task_output_set}
+
+    swept_task_output_set = [
+        match_task_output_with_key[task_output['key']] if task_output.get('error') else task_output
+        for task_output in task_output_set
+    ]
+
+    return swept_task_output_set
+
+
+def load_dead_letter() -> List[Dict[str, Any]]:
+    """Load the dead-letter list (keys that failed for good, with their stage and error)
+
+    [Return]
+    dead_letter : List[Dict[str, Any]]
+    """
+    return DEAD_LETTER
+
+
+if __name__ == 'utils._retry_policy':
+    # Connection and timeout errors of the OpenAI client and of httpx, matched by name so neither has to be imported
+    TRANSIENT_ERROR_NAMES = {'APIConnectionError', 'APITimeoutError', 'TimeoutException', 'NetworkError', 'RemoteProtocolError'}
+
+    RETRY_POLICY = RetryPolicy(max_retries=3, base_delay=1.0, max_delay=30.0)
+    SWEEP_RETRY_POLICY = RetryPolicy(max_retries=5, base_delay=5.0, max_delay=120.0)
+
+    DEAD_LETTER = []
\ No newline at end of file
@@ -1,4 +1,31 @@
-from typing import Any, Dict
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Literal, Tuple
+from ._rate_limiter import estimate_tokens
+
+
+def _render_table(
+    table: Dict[str, Any],
+    table_index: int,
+    is_title: bool,
+    is_header: bool,
+    is_cell: bool
+    ) -> str:
+    """Table rendering"""
+    serialized_table_content = []
+    serialized_table_content.append(f"Table {table_index}" if table_index > 0 else "Table")
+    serialized_table_content.append(f"[title] {table['title']}" if is_title else "")
+    serialized_table_content.append(f"[header] {' | '.join(table['header'])}" if is_header else "")
+    serialized_table_content.append(
+        ' '.join(
+            [f"[row {row_idx + 1}] {' | '.join(row)}" for row_idx, row in enumerate(table['cell'])]
+        )
+        if is_cell else ""
+    )
+
+    serialized_table = ' '.join([content for content in serialized_table_content if content != ""])
+    
+    return serialized_table
 
 
 def serialize_table(
@@ -10,6 +37,9 @@ def serialize_table(
     ) -> str:
     """Serialize table
 
+    Renderings are memoized per (table id, is_title, is_header, is_cell, table_index) in a bounded LRU;
+    tables without an ID are rendered every time.
+
     [Params]
     table     : Dict[str, Any]
     table_index : int
@@ -20,17 +50,190 @@ def serialize_table(
     [Return]
     serialized_table : str
     """
-    serialized_table_content = []
-    serialized_table_content.append(f"Table {table_index}" if table_index > 0 else "Table")
-    serialized_table_content.append(f"[title] {table['title']}" if is_title else "")
-    serialized_table_content.append(f"[header] {' | '.join(table['header'])}" if is_header else "")
-    serialized_table_content.append(
-        ' '.join(
-            [f"[row {row_idx + 1}] {' | '.join(row)}" for row_idx, row in enumerate(table['cell'])]
-        )
-        if is_cell else ""
+    if table.get('id') is None:
+        return _render_table(table=table, table_index=table_index, is_title=is_title, is_header=is_header, is_cell=is_cell)
+
+    cache_key = (table['id'], is_title, is_header, is_cell, table_index)
+
+    with SERIALIZATION_LOCK:
+        if cache_key in SERIALIZATION_CACHE:
+            SERIALIZATION_CACHE.move_to_end(cache_key)
+            return SERIALIZATION_CACHE[cache_key]
+
+    serialized_table = _render_table(table=table, table_index=table_index, is_title=is_title, is_header=is_header, is_cell=is_cell)
+
+    with SERIALIZATION_LOCK:
+        SERIALIZATION_CACHE[cache_key] = serialized_table
+        while len(SERIALIZATION_CACHE) > SERIALIZATION_CACHE_MAX_ENTRIES:
+            SERIALIZATION_CACHE.popitem(last=False)
+
+    return serialized_table
+
+
+def _allocate_token_budget(
+    num_of_tokens_set: List[int],
+    token_budget: int,
+    truncation_policy: Literal['rank', 'rows', 'even'],
+    num_of_rows_set: List[int]
+    ) -> List[int]:
+    """Per-table token budgets (by retrieval rank, or split by row count or evenly with the unused share of small tables passed on)"""
+    if truncation_policy == 'rank':
+        token_budgets = []
+        for num_of_tokens in num_of_tokens_set:
+            token_budgets.append(min(num_of_tokens, token_budget - sum(token_budgets)))
+        return token_budgets
+
+    weights = num_of_rows_set if truncation_policy == 'rows' else [1] * len(num_of_tokens_set)
+    weights = [max(1, weight) for weight in weights]
+
+    token_budgets = [0] * len(num_of_tokens_set)
+    pending_idx_set = list(range(len(num_of_tokens_set)))
+    remaining_tokens = token_budget
+
+    while pending_idx_set:
+        total_weight = sum(weights[idx] for idx in pending_idx_set)
+        shares = {idx: remaining_tokens * weights[idx] / total_weight for idx in pending_idx_set}
+        fitting_idx_set = [idx for idx in pending_idx_set if num_of_tokens_set[idx] <= shares[idx]]
+
+        if not fitting_idx_set:
+            for idx in pending_idx_set:
+                token_budgets[idx] = int(shares[idx])
+            break
+
+        for idx in fitting_idx_set:
+            token_budgets[idx] = num_of_tokens_set[idx]
+            remaining_tokens -= num_of_tokens_set[idx]
+            pending_idx_set.remove(idx)
+
+    return token_budgets
+
+
+def _truncate_table(
+    table: Dict[str, Any],
+    table_index: int,
+    token_budget: int,
+    tokenizer: Callable[[str], int]
+    ) -> Tuple[str, int]:
+    """Rendering of the leading rows of a table that fit in the token budget, followed by a truncation marker ('' if not even the header fits)"""
+    num_of_rows = len(table['cell'])
+    serialized_head = _render_table(table=table, table_index=table_index, is_title=True, is_header=True, is_cell=False)
+    num_of_tokens = tokenizer(serialized_head) + tokenizer(f"[truncated {num_of_rows} of {num_of_rows} rows]")
+
+    if num_of_tokens > token_budget:
+        return '', 0
+
+    serialized_rows = []
+    for row_idx, row in enumerate(table['cell']):
+        serialized_row = f"[row {row_idx + 1}] {' | '.join(row)}"
+        num_of_row_tokens = tokenizer(serialized_row)
+        if num_of_tokens + num_of_row_tokens > token_budget:
+            break
+        serialized_rows.append(serialized_row)
+        num_of_tokens += num_of_row_tokens
+
+    marker = f"[truncated {num_of_rows - len(serialized_rows)} of {num_of_rows} rows]"
+
+    return ' '.join([serialized_head, *serialized_rows, marker]), num_of_tokens
+
+
+def serialize_tables(
+    tables: List[Dict[str, Any]],
+    token_budget: int=None,
+    truncation_policy: Literal['rank', 'rows', 'even']='rank',
+    tokenizer: Callable[[str], int]=None,
+    is_indexed: bool=False
+    ) -> Tuple[str, int]:
+    """Serialize the tables of a prompt within a token budget
+
+    The budget is allocated across the tables by retrieval rank (earlier tables first), by row count,
+    or evenly. A table over its share keeps its leading rows and ends with a `[truncated k of n rows]`
+    marker; tables whose share does not fit their header are left out behind a `[truncated k of n tables]`
+    marker. Token counts are summed over the rendered pieces, so the serialization stays within the
+    budget up to the separators and the table marker.
+
+    [Params]
+    tables            : List[Dict[str, Any]]
+    token_budget      : int (None: no budget)
+    truncation_policy : Literal['rank', 'rows', 'even']
+    tokenizer         : Callable[[str], int] (default: estimate_tokens)
+    is_indexed        : bool (positional 'Table i' renderings)
+
+    [Returns]
+    serialized_tables     : str
+    num_of_dropped_tokens : int
+    """
+    table_indices = [idx + 1 if is_indexed else 0 for idx in range(len(tables))]
+    serialized_table_set = [serialize_table(table=table, table_index=table_index) for table, table_index in zip(tables, table_indices)]
+
+    if token_budget is None:
+        return '\n'.join(serialized_table_set), 0
+
+    tokenizer = tokenizer or estimate_tokens
+    num_of_tokens_set = [tokenizer(serialized_table) for serialized_table in serialized_table_set]
+
+    if sum(num_of_tokens_set) <= token_budget:
+        return '\n'.join(serialized_table_set), 0
+
+    token_budgets = _allocate_token_budget(
+        num_of_tokens_set=num_of_tokens_set,
+        token_budget=token_budget,
+        truncation_policy=truncation_policy,
+        num_of_rows_set=[len(table['cell']) for table in tables]
     )
 
-    serialized_table = ' '.join([content for content in serialized_table_content if content != ""])
-    
-    return serialized_table
\ No newline at end of file
+    kept_serialized_table_set = []
+    num_of_kept_tokens = 0
+
+    for table, table_index, serialized_table, num_of_tokens, table_token_budget in zip(tables, table_indices, serialized_table_set, num_of_tokens_set, token_budgets):
+        if num_of_tokens > table_token_budget:
+            serialized_table, num_of_tokens = _truncate_table(table=table, table_index=table_index, token_budget=table_token_budget, tokenizer=tokenizer)
+
+        if serialized_table:
+            kept_serialized_table_set.append(serialized_table)
+            num_of_kept_tokens += num_of_tokens
+
+    if len(kept_serialized_table_set) < len(tables):
+        kept_serialized_table_set.append(f"[truncated {len(tables) - len(kept_serialized_table_set)} of {len(tables)} tables]")
+
+    return '\n'.join(kept_serialized_table_set), max(0, sum(num_of_tokens_set) - num_of_kept_tokens)
+
+
+def load_truncation_report() -> Dict[Tuple[str, int], int]:
+    """Load the truncation report (number of table tokens dropped per (stage, item) serialized within a budget)
+
+    [Return]
+    truncation_report : Dict[Tuple[str, int], int]
+    """
+    return TRUNCATION_REPORT
+
+
+def precompute_serialized_tables(tables_set: List[List[Dict[str, Any]]]) -> int:
+    """Precompute the renderings used downstream for sets of retrieved tables
+
+    That is the positional renderings (generation prompts), the full renderings (claim verification)
+    and the schema-only renderings (table-aware insight decomposition). The LRU bound grows to hold them all.
+
+    [Param]
+    tables_set : List[List[Dict[str, Any]]]
+
+    [Return]
+    num_of_renderings : int
+    """
+    global SERIALIZATION_CACHE_MAX_ENTRIES
+    SERIALIZATION_CACHE_MAX_ENTRIES = max(SERIALIZATION_CACHE_MAX_ENTRIES, 3 * sum(len(tables) for tables in tables_set))
+
+    for tables in tables_set:
+        for idx, table in enumerate(tables):
+            serialize_table(table=table, table_index=idx + 1)
+            serialize_table(table=table)
+            serialize_table(table=table, is_cell=False)
+
+    return len(SERIALIZATION_CACHE)
+
+
+if __name__ == 'utils._serialize_table':
+    SERIALIZATION_CACHE = OrderedDict()
+    SERIALIZATION_CACHE_MAX_ENTRIES = 200000
+    SERIALIZATION_LOCK = threading.Lock()
+
+    TRUNCATION_REPORT = dict()
\ No newline at end of file
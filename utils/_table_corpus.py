@@ -0,0 +1,153 @@
+import bisect
+import json
+import mmap
+import os
+import struct
+from typing import Any, Dict, Iterator, List
+
+
+class _SortedTableIds:
+    def __init__(self, index: mmap.mmap, num_of_tables: int, ids_offset: int):
+        """Initialization (read-only view of the sorted table IDs of an index)"""
+        self._index = index
+        self._num_of_tables = num_of_tables
+        self._ids_offset = ids_offset
+
+    def __getitem__(self, position: int) -> bytes:
+        """Table ID (UTF-8) at a sorted position"""
+        id_offset, id_length, _, _ = ENTRY.unpack_from(self._index, HEADER.size + position * ENTRY.size)
+        return self._index[self._ids_offset + id_offset:self._ids_offset + id_offset + id_length]
+
+    def __len__(self) -> int:
+        """Number of table IDs"""
+        return self._num_of_tables
+
+
+class TableCorpus:
+    def __init__(self, path_dir: str):
+        """Initialization
+
+        Both files are memory-mapped; a table is only decoded on its first access by ID.
+        """
+        self.path_dir = path_dir
+
+        self._index_file = open(f'{path_dir}/{INDEX_FILE_NAME}', 'rb')
+        self._data_file = open(f'{path_dir}/{DATA_FILE_NAME}', 'rb')
+        self._index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._data = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(f'{path_dir}/{DATA_FILE_NAME}') else b''
+
+        magic, version, num_of_tables = HEADER.unpack_from(self._index, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path_dir}/{INDEX_FILE_NAME} is not a version {VERSION} table corpus index")
+
+        self._num_of_tables = num_of_tables
+        self._table_ids = _SortedTableIds(index=self._index, num_of_tables=num_of_tables, ids_offset=HEADER.size + num_of_tables * ENTRY.size)
+        self._tables = dict()
+
+    def _find(self, table_id: str) -> int:
+        """Sorted position of a table ID (binary search, -1 if absent)"""
+        encoded_table_id = table_id.encode('utf-8')
+        position = bisect.bisect_left(self._table_ids, encoded_table_id)
+
+        return position if position < self._num_of_tables and self._table_ids[position] == encoded_table_id else -1
+
+    def _decode(self, position: int) -> Dict[str, Any]:
+        """Table decoding at a sorted position"""
+        _, _, data_offset, data_length = ENTRY.unpack_from(self._index, HEADER.size + position * ENTRY.size)
+        return json.loads(self._data[data_offset:data_offset + data_length].decode('utf-8'))
+
+    def __getitem__(self, table_id: str) -> Dict[str, Any]:
+        """Table matching by table ID (decoded tables are kept, so the same table is returned each time)"""
+        if table_id not in self._tables:
+            position = self._find(table_id=table_id)
+            if position < 0:
+                raise KeyError(table_id)
+            self._tables[table_id] = self._decode(position=position)
+
+        return self._tables[table_id]
+
+    def __contains__(self, table_id: str) -> bool:
+        """Table ID check"""
+        return table_id in self._tables or self._find(table_id=table_id) >= 0
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Tables in table ID order"""
+        for position in range(self._num_of_tables):
+            yield self[self._table_ids[position].decode('utf-8')]
+
+    def __len__(self) -> int:
+        """Corpus size"""
+        return self._num_of_tables
+
+    def close(self):
+        """Closing"""
+        self._index.close()
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._index_file.close()
+        self._data_file.close()
+
+
+def is_indexed_table_corpus(path_dir: str) -> bool:
+    """Indexed table corpus check"""
+    return os.path.exists(f'{path_dir}/{INDEX_FILE_NAME}') and os.path.exists(f'{path_dir}/{DATA_FILE_NAME}')
+
+
+def convert_table_corpus(table_corpus: List[Dict[str, Any]], path_dir: str) -> int:
+    """Convert a table corpus into the compact indexed format
+
+    {path_dir}/table_corpus.bin holds the tables as concatenated UTF-8 JSON records, and
+    {path_dir}/table_corpus.idx holds a header, fixed-size entries sorted by table ID
+    (ID offset, ID length, record offset, record length) and the table IDs themselves.
+
+    [Params]
+    table_corpus : List[Dict[str, Any]]
+    path_dir     : str
+
+    [Return]
+    num_of_tables : int
+    """
+    entries = []
+    table_ids = bytearray()
+    data_offset = 0
+
+    with open(f'{path_dir}/{DATA_FILE_NAME}.tmp', 'wb') as data_file:
+        for table in table_corpus:
+            record = json.dumps(table, ensure_ascii=False).encode('utf-8')
+            data_file.write(record)
+            entries.append((table['id'].encode('utf-8'), data_offset, len(record)))
+            data_offset += len(record)
+
+    entries.sort(key=lambda entry: entry[0])
+
+    for (table_id, _, _), (next_table_id, _, _) in zip(entries, entries[1:]):
+        if table_id == next_table_id:
+            raise ValueError(f"Duplicate table ID {table_id.decode('utf-8')!r}")
+
+    with open(f'{path_dir}/{INDEX_FILE_NAME}.tmp', 'wb') as index_file:
+        index_file.write(HEADER.pack(MAGIC, VERSION, len(entries)))
+        for table_id, data_offset, data_length in entries:
+            index_file.write(ENTRY.pack(len(table_ids), len(table_id), data_offset, data_length))
+            table_ids += table_id
+        index_file.write(table_ids)
+
+    # Swapped in only once both files are complete, the index last so a stale pair is never picked up
+    if os.path.exists(f'{path_dir}/{INDEX_FILE_NAME}'):
+        os.remove(f'{path_dir}/{INDEX_FILE_NAME}')
+    os.replace(f'{path_dir}/{DATA_FILE_NAME}.tmp', f'{path_dir}/{DATA_FILE_NAME}')
+    os.replace(f'{path_dir}/{INDEX_FILE_NAME}.tmp', f'{path_dir}/{INDEX_FILE_NAME}')
+
+    return len(entries)
+
+
+if __name__ == 'utils._table_corpus':
+    INDEX_FILE_NAME = 'table_corpus.idx'
+    DATA_FILE_NAME = 'table_corpus.bin'
+
+    MAGIC = b'MTRAIGTC'
+    VERSION = 1
+
+    # magic, version, number of tables
+    HEADER = struct.Struct('<8sIQ')
+    # table ID offset, table ID length, record offset, record length
+    ENTRY = struct.Struct('<QIQQ')
\ No newline at end of file
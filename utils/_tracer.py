@@ -0,0 +1,161 @@
+import contextvars
+import json
+import threading
+from contextlib import contextmanager
+from time import monotonic
+from typing import Any, Dict, Iterator, List
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """Linearly interpolated percentile of sorted values"""
+    if not sorted_values:
+        return 0.0
+
+    position = (len(sorted_values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+@contextmanager
+def trace_stage(stage: str) -> Iterator[str]:
+    """Stage of the backend calls made within the block (tasks created inside inherit it)"""
+    token = CURRENT_STAGE.set(stage)
+    try:
+        yield stage
+    finally:
+        CURRENT_STAGE.reset(token)
+
+
+class Tracer:
+    def __init__(self, path: str=None):
+        """Initialization
+
+        Spans are always summarized in memory; with a path, each one is also appended to a JSONL trace file.
+        """
+        self.path = None
+        self.spans = []
+        self._file = None
+        self._lock = threading.Lock()
+
+        if path is not None:
+            self.open(path=path)
+
+    def open(self, path: str):
+        """Trace file opening (appending)"""
+        self.close()
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def start(self, client: str, model: str, key: Any) -> Dict[str, Any]:
+        """Span of one backend call (the rate limiter fills in its queue wait, latency and retries)"""
+        return {
+            'stage': CURRENT_STAGE.get(),
+            'client': client,
+            'model': model,
+            'key': key,
+            'queue_wait_seconds': 0.0,
+            'latency_seconds': 0.0,
+            'num_of_retries': 0,
+            'started_at': monotonic()
+        }
+
+    def finish(
+        self,
+        span: Dict[str, Any],
+        input_tokens: float=0,
+        output_tokens: float=0,
+        cost: float=0.0,
+        cached: bool=False,
+        error: bool=False
+        ):
+        """Span completion and recording"""
+        span.update({
+            'total_seconds': monotonic() - span.pop('started_at'),
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'cost': cost,
+            'cached': cached,
+            'error': error
+        })
+        self.record(span=span)
+
+    def record(self, span: Dict[str, Any]):
+        """Span recording"""
+        with self._lock:
+            self.spans.append(span)
+            if self._file is not None:
+                self._file.write(json.dumps(span, ensure_ascii=False) + '\n')
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per-stage summary (counts, token and cost totals, queue wait and latency percentiles)
+
+        [Return]
+        summary : Dict[str, Dict[str, Any]]
+        """
+        spans_per_stage = dict()
+        for span in self.spans:
+            spans_per_stage.setdefault(span['stage'], []).append(span)
+
+        summary = dict()
+
+        for stage, spans in spans_per_stage.items():
+            called_spans = [span for span in spans if not span['cached']]
+
+            summary[stage] = {
+                'num_of_calls': len(called_spans),
+                'num_of_cached': len(spans) - len(called_spans),
+                'num_of_errors': sum(span['error'] for span in spans),
+                'num_of_retries': sum(span['num_of_retries'] for span in spans),
+                'input_tokens': sum(span['input_tokens'] for span in spans),
+                'output_tokens': sum(span['output_tokens'] for span in spans),
+                'cost': sum(span['cost'] for span in spans)
+            }
+
+            for metric in ['queue_wait_seconds', 'latency_seconds']:
+                sorted_values = sorted(span[metric] for span in called_spans)
+                for q in [50, 90, 99]:
+                    summary[stage][f'{metric}_p{q}'] = _percentile(sorted_values=sorted_values, q=q)
+                summary[stage][f'{metric}_max'] = sorted_values[-1] if sorted_values else 0.0
+
+        return summary
+
+    def close(self):
+        """Trace file closing"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __str__(self) -> str:
+        """Representation (one line per stage)"""
+        return '\n'.join(
+            f"{stage}: calls={stats['num_of_calls']} cached={stats['num_of_cached']} errors={stats['num_of_errors']} retries={stats['num_of_retries']} "
+            f"queue_wait_p50/p99={stats['queue_wait_seconds_p50']:.3f}/{stats['queue_wait_seconds_p99']:.3f}s "
+            f"latency_p50/p99={stats['latency_seconds_p50']:.3f}/{stats['latency_seconds_p99']:.3f}s "
+            f"tokens={stats['input_tokens']:.0f}/{stats['output_tokens']:.0f} cost=${stats['cost']:.4f}"
+            for stage, stats in self.summary().items()
+        )
+
+
+def load_tracer(path: str=None) -> Tracer:
+    """Load the shared tracer
+
+    The tracer always keeps its spans in memory; loading it once with a path also writes them to a JSONL trace file.
+
+    [Param]
+    path : str
+
+    [Return]
+    tracer : Tracer
+    """
+    if path is not None and TRACER.path != path:
+        TRACER.open(path=path)
+
+    return TRACER
+
+
+if __name__ == 'utils._tracer':
+    CURRENT_STAGE = contextvars.ContextVar('stage', default='unknown')
+
+    TRACER = Tracer()
\ No newline at end of file
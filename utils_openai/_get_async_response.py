@@ -1,13 +1,13 @@
-import asyncio
 import traceback
 from langchain.schema import AIMessage, HumanMessage, SystemMessage
 from typing import Any, Dict
+from utils import RateLimiter, ResponseCache, estimate_tokens, load_response_cache, load_tracer
 from ._load_config import PRICING
-from ._load_llm import load_llm
+from ._load_llm import load_llm, load_llm_params
 
 
 async def get_async_response(
-    semaphore: asyncio.Semaphore,
+    rate_limiter: RateLimiter,
     system_prompt: str,
     user_prompt: str,
     model_name: str,
@@ -16,7 +16,7 @@ async def get_async_response(
     """Get asynchronous OpenAI response
 
     [Params]
-    semaphore     : asyncio.Semaphore
+    rate_limiter  : RateLimiter
     system_prompt : str
     user_prompt   : str
     model_name    : str
@@ -24,35 +24,62 @@ async def get_async_response(
 
     [Return]
     instance : Dict[str, Any]
-    e.g. dict_keys(['system_prompt', 'user_prompt', 'response', 'input_tokens_cost', 'output_tokens_cost', 'key'])
+    e.g. dict_keys(['system_prompt', 'user_prompt', 'response', 'input_tokens_cost', 'output_tokens_cost', 'key'(, 'error')])
     """
     llm = load_llm(model_name=model_name)
 
     input_token_price = PRICING[model_name]['input_token_price']
     output_token_price = PRICING[model_name]['output_token_price']
 
-    async with semaphore:
-        try:
-            system_message = SystemMessage(system_prompt)
-            human_message = HumanMessage(user_prompt)
-
-            response = await llm.ainvoke([system_message, human_message])
-
-            input_tokens = response.usage_metadata['input_tokens']
-            output_tokens = response.usage_metadata['output_tokens']
-
-            input_tokens_cost = input_tokens * input_token_price
-            output_tokens_cost = output_tokens * output_token_price
-        
-        except Exception:
-            return {
-                'system_prompt': system_prompt,
-                'user_prompt': user_prompt,
-                'response': f"[{key}] {traceback.format_exc()}",
-                'input_tokens_cost': 0,
-                'output_tokens_cost': 0,
-                'key': key
-            }
+    response_cache = load_response_cache()
+    cache_key = ResponseCache.make_key(model_name, load_llm_params(model_name=model_name), system_prompt, user_prompt)
+    span = load_tracer().start(client='generator', model=model_name, key=key)
+
+    if response_cache is not None and (cached := response_cache.get(cache_key)) is not None:
+        load_tracer().finish(span=span, cached=True)
+
+        return {
+            'system_prompt': system_prompt,
+            'user_prompt': user_prompt,
+            'response': cached['response'],
+            'input_tokens_cost': 0,
+            'output_tokens_cost': 0,
+            'key': key
+        }
+
+    try:
+        system_message = SystemMessage(system_prompt)
+        human_message = HumanMessage(user_prompt)
+
+        estimated_tokens = estimate_tokens(system_prompt + user_prompt)
+
+        response = await rate_limiter.call(lambda: llm.ainvoke([system_message, human_message]), tokens=estimated_tokens, span=span)
+
+        input_tokens = response.usage_metadata['input_tokens']
+        output_tokens = response.usage_metadata['output_tokens']
+
+        rate_limiter.settle(estimated_tokens=estimated_tokens, actual_tokens=input_tokens + output_tokens)
+
+        input_tokens_cost = input_tokens * input_token_price
+        output_tokens_cost = output_tokens * output_token_price
+
+        load_tracer().finish(span=span, input_tokens=input_tokens, output_tokens=output_tokens, cost=input_tokens_cost + output_tokens_cost)
+    
+    except Exception:
+        load_tracer().finish(span=span, error=True)
+
+        return {
+            'system_prompt': system_prompt,
+            'user_prompt': user_prompt,
+            'response': '',
+            'input_tokens_cost': 0,
+            'output_tokens_cost': 0,
+            'key': key,
+            'error': traceback.format_exc()
+        }
+
+    if response_cache is not None:
+        response_cache.set(cache_key, {'response': response.content.replace('\n', ' ').strip()})
 
     return {
         'system_prompt': system_prompt,
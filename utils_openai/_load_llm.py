@@ -1,37 +1,35 @@
-from langchain_openai import ChatOpenAI
-from ._load_config import API_KEY
+from typing import Any, Dict
+from utils import load_backend
 
 
-def load_llm(model_name: str) -> ChatOpenAI:
-    """Load OpenAI LLM
+def load_llm_params(model_name: str) -> Dict[str, Any]:
+    """Load OpenAI LLM sampling parameters
 
     [Param]
     model_name : str
 
     [Return]
-    llm : ChatOpenAI
+    llm_params : Dict[str, Any]
     """
-    if model_name not in OPENAI_LLM_BUFFER:
-        if model_name.startswith('o'):
-            llm = ChatOpenAI(
-                model=model_name,
-                reasoning_effort='high',
-                api_key=API_KEY
-            )
-            OPENAI_LLM_BUFFER[model_name] = llm
-        elif model_name.startswith('gpt'):
-            llm = ChatOpenAI(
-                model=model_name,
-                temperature=0.0,
-                api_key=API_KEY
-            )
-            OPENAI_LLM_BUFFER[model_name] = llm
-    
+    if model_name.startswith('o'):
+        llm_params = {'model': model_name, 'reasoning_effort': 'high'}
+    elif model_name.startswith('gpt'):
+        llm_params = {'model': model_name, 'temperature': 0.0}
     else:
-        llm = OPENAI_LLM_BUFFER[model_name]
-    
-    return llm
+        llm_params = {'model': model_name}
 
+    return llm_params
 
-if __name__ == 'utils_openai._load_llm':
-    OPENAI_LLM_BUFFER = dict()
\ No newline at end of file
+
+def load_llm(model_name: str) -> Any:
+    """Load OpenAI LLM (a chat model of the shared backend)
+
+    [Param]
+    model_name : str
+
+    [Return]
+    llm : Any
+    """
+    llm = load_backend().load_chat_model(llm_params=load_llm_params(model_name=model_name))
+
+    return llm
\ No newline at end of file
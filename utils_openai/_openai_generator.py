@@ -1,7 +1,7 @@
 import asyncio
 from tqdm.asyncio import tqdm_asyncio
-from typing import Any, Dict, List, Tuple
-from utils import load_prompt, serialize_table
+from typing import Any, AsyncIterator, Dict, Iterable, List, Literal, Tuple
+from utils import Checkpoint, RateLimiter, load_prompt, estimate_tokens, load_rate_limiter, prune_tables, render_prompt, serialize_tables, sweep_failures, trace_stage
 from ._get_async_response import get_async_response
 
 
@@ -11,26 +11,65 @@ class OpenAIGenerator:
         self.model_name = model_name
         self.batch_size = batch_size
     
-    def preprocess_data(self, tables_set: List[List[Dict[str, Any]]], dataset: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Preprocessing"""
+    def preprocess_data(
+        self,
+        tables_set: List[List[Dict[str, Any]]],
+        dataset: List[Dict[str, Any]],
+        pruning_token_budget: int=None,
+        serialization_token_budget: int=None,
+        truncation_policy: Literal['rank', 'rows', 'even']='rank'
+        ) -> List[Dict[str, Any]]:
+        """Preprocessing
+
+        With a pruning token budget, tables are pruned to the question first. With a serialization token
+        budget, the serialized tables are truncated to fit it, and each input reports its dropped tokens.
+        Serialization tokens are counted with o200k_base (the GPT-4o / o3-mini encoding) when tiktoken is installed.
+        """
         preprocessed_input_set = []
         for tables, data in zip(tables_set, dataset):
-            serialized_tables = '\n'.join([serialize_table(table=table, table_index=idx + 1) for idx, table in enumerate(tables)])
-            preprocessed_input_set.append({'serialized_tables': serialized_tables, 'question': data['question']})
+            if pruning_token_budget is not None:
+                tables = prune_tables(tables=tables, query=data['question'], token_budget=pruning_token_budget)
+            serialized_tables, num_of_dropped_tokens = serialize_tables(
+                tables=tables,
+                token_budget=serialization_token_budget,
+                truncation_policy=truncation_policy,
+                tokenizer=estimate_tokens,
+                is_indexed=True
+            )
+            preprocessed_input_set.append({'serialized_tables': serialized_tables, 'question': data['question'], 'num_of_dropped_tokens': num_of_dropped_tokens})
         return preprocessed_input_set
     
-    async def _async_generate(self, task: str, input_set: List[Dict[str, Any]], key_set: List[Any]) -> Tuple[List[Dict[str, Any]], str]:
-        """Asynchronous generation"""
-        semaphore = asyncio.Semaphore(self.batch_size)
+    async def _async_generate_one(self, rate_limiter: RateLimiter, task: str, task_input: Dict[str, Any], key: Any, checkpoint: Checkpoint=None) -> Dict[str, Any]:
+        """Asynchronous generation of a single input"""
+        if checkpoint is not None and key in checkpoint:
+            return checkpoint[key]
 
-        tasks = [
-            get_async_response(
-                semaphore=semaphore,
+        with trace_stage(stage='generate_insight'):
+            task_output = await get_async_response(
+                rate_limiter=rate_limiter,
                 system_prompt=load_prompt(role='system', task=task),
-                user_prompt=load_prompt(role='user', task=task).format(**task_input),
+                user_prompt=render_prompt(role='user', task=task, task_input=task_input),
                 model_name=self.model_name,
                 key=key
             )
+
+        if checkpoint is not None:
+            checkpoint.append(task_output)
+
+        return task_output
+    
+    async def _async_generate(self, task: str, input_set: List[Dict[str, Any]], key_set: List[Any], checkpoint: Checkpoint=None) -> Tuple[List[Dict[str, Any]], str]:
+        """Asynchronous generation"""
+        rate_limiter = load_rate_limiter(model_name=self.model_name)
+
+        tasks = [
+            self._async_generate_one(
+                rate_limiter=rate_limiter,
+                task=task,
+                task_input=task_input,
+                key=key,
+                checkpoint=checkpoint
+            )
             for task_input, key in zip(input_set, key_set)
         ]
 
@@ -39,17 +78,81 @@ class OpenAIGenerator:
         for _ in tqdm_asyncio.as_completed(tasks, total=len(tasks), desc=f"{self.model_name:<30}"):
             task_output = await _
             task_output_set.append(task_output)
+
+        match_input_with_key = dict(zip(key_set, input_set))
+
+        task_output_set = await sweep_failures(
+            task_output_set=task_output_set,
+            resubmit=lambda task_output: self._async_generate_one(
+                rate_limiter=load_rate_limiter(model_name=self.model_name, sweep=True),
+                task=task,
+                task_input=match_input_with_key[task_output['key']],
+                key=task_output['key'],
+                checkpoint=checkpoint
+            ),
+            stage='generate_insight'
+        )
         
         cost = sum([output['input_tokens_cost'] + output['output_tokens_cost'] for output in task_output_set])
 
         return sorted(task_output_set, key=lambda x: x['key']), cost
     
-    def generate(self, task: str, input_set: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], str]:
+    def generate(self, task: str, input_set: List[Dict[str, Any]], checkpoint: Checkpoint=None) -> Tuple[List[Dict[str, Any]], str]:
         """Generation"""
         task_output_set, cost = asyncio.run(self._async_generate(
             task=task,
             input_set=input_set,
-            key_set=list(range(len(input_set)))
+            key_set=list(range(len(input_set))),
+            checkpoint=checkpoint
         ))
 
-        return task_output_set, cost
\ No newline at end of file
+        return task_output_set, cost
+    
+    async def stream_generate(self, task: str, keyed_input_set: Iterable[Tuple[Any, Dict[str, Any]]], checkpoint: Checkpoint=None) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming generation
+
+        Inputs are pulled lazily and at most `batch_size` of them are in flight; outputs are
+        yielded in completion order, so a slow consumer also holds back generation. A failed
+        input is re-submitted once through the sweep rate limiter before it is yielded.
+        """
+        rate_limiter = load_rate_limiter(model_name=self.model_name)
+        match_input_with_key = dict()
+        pending = set()
+
+        async def sweep(task_output: Dict[str, Any]) -> Dict[str, Any]:
+            swept_task_output_set = await sweep_failures(
+                task_output_set=[task_output],
+                resubmit=lambda task_output: self._async_generate_one(
+                    rate_limiter=load_rate_limiter(model_name=self.model_name, sweep=True),
+                    task=task,
+                    task_input=match_input_with_key[task_output['key']],
+                    key=task_output['key'],
+                    checkpoint=checkpoint
+                ),
+                stage='generate_insight'
+            )
+            return swept_task_output_set[0]
+
+        for key, task_input in keyed_input_set:
+            if len(pending) >= self.batch_size:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for _ in done:
+                    task_output = await sweep(task_output=_.result())
+                    del match_input_with_key[task_output['key']]
+                    yield task_output
+
+            match_input_with_key[key] = task_input
+            pending.add(asyncio.ensure_future(self._async_generate_one(
+                rate_limiter=rate_limiter,
+                task=task,
+                task_input=task_input,
+                key=key,
+                checkpoint=checkpoint
+            )))
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for _ in done:
+                task_output = await sweep(task_output=_.result())
+                del match_input_with_key[task_output['key']]
+                yield task_output
\ No newline at end of file
@@ -0,0 +1,5 @@
+from ._bm25_index import BM25Index, load_bm25_index
+from ._compute_recall import compute_recall
+from ._dense_index import DenseIndex, load_dense_index
+from ._embedder import DPREmbedder, HashingEmbedder, load_embedder
+from ._retrieve_tables import retrieve_tables
\ No newline at end of file
@@ -0,0 +1,212 @@
+import os
+import re
+import numpy as np
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Union
+from utils import TableCorpus
+from ._fingerprint_tables import fingerprint_tables
+from ._top_k import top_k_indices
+
+
+def _tokenize(text: str) -> List[str]:
+    """Lexical tokens (lowercased words and numbers)"""
+    return re.findall(r"\w+", text.lower())
+
+
+def _table_text(table: Dict[str, Any]) -> str:
+    """Indexed text of a table (title, header and cells)"""
+    return ' '.join([table['title'], *table['header'], *(cell for row in table['cell'] for cell in row)])
+
+
+class BM25Index:
+    def __init__(
+        self,
+        table_ids: List[str],
+        terms: List[str],
+        offsets: np.ndarray,
+        doc_indices: np.ndarray,
+        term_frequencies: np.ndarray,
+        doc_lengths: np.ndarray,
+        k1: float=1.5,
+        b: float=0.75,
+        fingerprint: str=None
+        ):
+        """Initialization
+
+        Postings are stored in CSR form: the tables containing the t-th term are
+        doc_indices[offsets[t]:offsets[t + 1]], with their term frequencies alongside. The BM25 weight of
+        every posting is computed once here, so a query only adds up the weights of its terms' postings.
+        `fingerprint` identifies the indexed corpus, so a stale index can be told apart.
+        """
+        self.table_ids = table_ids
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_indices = doc_indices
+        self.term_frequencies = term_frequencies
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.fingerprint = fingerprint
+
+        self._match_term_with_id = {term: term_id for term_id, term in enumerate(terms)}
+
+        num_of_docs = len(table_ids)
+        doc_frequencies = np.diff(offsets)
+        idf = np.log1p((num_of_docs - doc_frequencies + 0.5) / (doc_frequencies + 0.5))
+        length_norms = k1 * (1 - b + b * doc_lengths / max(float(doc_lengths.mean()), 1.0)) if num_of_docs else doc_lengths
+
+        self._weights = (
+            np.repeat(idf, doc_frequencies)
+            * term_frequencies * (k1 + 1) / (term_frequencies + length_norms[doc_indices])
+        ).astype(np.float32)
+
+    @classmethod
+    def build(cls, tables: Iterable[Dict[str, Any]], k1: float=1.5, b: float=0.75, fingerprint: str=None) -> 'BM25Index':
+        """Index building over title, header and cells
+
+        [Params]
+        tables      : Iterable[Dict[str, Any]]
+        k1          : float
+        b           : float
+        fingerprint : str (of the table corpus)
+
+        [Return]
+        bm25_index : BM25Index
+        """
+        table_ids = []
+        doc_lengths = []
+        postings = dict()
+
+        for doc_idx, table in enumerate(tables):
+            tokens = _tokenize(_table_text(table=table))
+            table_ids.append(table['id'])
+            doc_lengths.append(len(tokens))
+
+            for term, term_frequency in Counter(tokens).items():
+                postings.setdefault(term, []).append((doc_idx, term_frequency))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+
+        return cls(
+            table_ids=table_ids,
+            terms=terms,
+            offsets=offsets,
+            doc_indices=np.array([doc_idx for term in terms for doc_idx, _ in postings[term]], dtype=np.int32),
+            term_frequencies=np.array([term_frequency for term in terms for _, term_frequency in postings[term]], dtype=np.float32),
+            doc_lengths=np.array(doc_lengths, dtype=np.float32),
+            k1=k1,
+            b=b,
+            fingerprint=fingerprint
+        )
+
+    def save(self, path: str):
+        """Saving as a single .npz file (written next to it first, then swapped in)"""
+        with open(f'{path}.tmp', 'wb') as file:
+            np.savez(
+                file,
+                table_ids=np.array(self.table_ids, dtype=str),
+                terms=np.array(self.terms, dtype=str),
+                offsets=self.offsets,
+                doc_indices=self.doc_indices,
+                term_frequencies=self.term_frequencies,
+                doc_lengths=self.doc_lengths,
+                params=np.array([self.k1, self.b], dtype=np.float64),
+                fingerprint=np.array(self.fingerprint or '', dtype=str)
+            )
+        os.replace(f'{path}.tmp', path)
+
+    @classmethod
+    def load(cls, path: str) -> 'BM25Index':
+        """Loading of a saved index"""
+        with np.load(path) as arrays:
+            k1, b = arrays['params'].tolist()
+            return cls(
+                table_ids=arrays['table_ids'].tolist(),
+                terms=arrays['terms'].tolist(),
+                offsets=arrays['offsets'],
+                doc_indices=arrays['doc_indices'],
+                term_frequencies=arrays['term_frequencies'],
+                doc_lengths=arrays['doc_lengths'],
+                k1=k1,
+                b=b,
+                fingerprint=str(arrays['fingerprint']) if 'fingerprint' in arrays.files else None
+            )
+
+    def search(self, queries: List[str], top_k: int=10, batch_size: int=256) -> List[List[str]]:
+        """Batched top-k retrieval
+
+        Queries are scored `batch_size` at a time into one dense score matrix, and the top-k of every
+        row is selected with argpartition (ties broken by corpus order).
+
+        [Params]
+        queries    : List[str]
+        top_k      : int
+        batch_size : int
+
+        [Return]
+        retrieved_table_ids_set : List[List[str]]
+        """
+        top_k = min(top_k, len(self.table_ids))
+        retrieved_table_ids_set = []
+
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start:start + batch_size]
+            scores = np.zeros((len(batch), len(self.table_ids)), dtype=np.float32)
+
+            for row_idx, query in enumerate(batch):
+                for term in set(_tokenize(query)):
+                    term_id = self._match_term_with_id.get(term)
+                    if term_id is None:
+                        continue
+                    posting_slice = slice(self.offsets[term_id], self.offsets[term_id + 1])
+                    scores[row_idx, self.doc_indices[posting_slice]] += self._weights[posting_slice]
+
+            retrieved_table_ids_set.extend(
+                [self.table_ids[doc_idx] for doc_idx in doc_indices]
+                for doc_indices in top_k_indices(scores=scores, top_k=top_k)
+            )
+
+        return retrieved_table_ids_set
+
+    def __len__(self) -> int:
+        """Number of indexed tables"""
+        return len(self.table_ids)
+
+
+def load_bm25_index(path_dir: str, table_corpus: Union[List[Dict[str, Any]], TableCorpus], rebuild: bool=False) -> BM25Index:
+    """Load the BM25 index of a table corpus
+
+    The index is built on first use and saved to {path_dir}/bm25_index.npz; later runs load it back.
+    It is rebuilt when the fingerprint of the corpus (table IDs and contents) no longer matches or
+    `rebuild` is set.
+
+    [Params]
+    path_dir     : str
+    table_corpus : Union[List[Dict[str, Any]], TableCorpus]
+    rebuild      : bool
+
+    [Return]
+    bm25_index : BM25Index
+    """
+    path = f'{path_dir}/{INDEX_FILE_NAME}'
+    fingerprint = fingerprint_tables(tables=table_corpus)
+
+    bm25_index = BM25_INDEX_BUFFER.get(path)
+    if bm25_index is None and not rebuild and os.path.exists(path):
+        bm25_index = BM25Index.load(path=path)
+
+    if bm25_index is None or rebuild or bm25_index.fingerprint != fingerprint:
+        bm25_index = BM25Index.build(tables=table_corpus, fingerprint=fingerprint)
+        bm25_index.save(path=path)
+
+    BM25_INDEX_BUFFER[path] = bm25_index
+
+    return bm25_index
+
+
+if __name__ == 'utils_retrieval._bm25_index':
+    BM25_INDEX_BUFFER = dict()
+
+    INDEX_FILE_NAME = 'bm25_index.npz'
\ No newline at end of file
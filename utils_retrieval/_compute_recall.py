@@ -0,0 +1,20 @@
+from typing import List
+
+
+def compute_recall(retrieved_table_ids_set: List[List[str]], gold_table_ids_set: List[List[str]]) -> float:
+    """Retrieval recall (per-item share of the gold tables that were retrieved, averaged over items with gold tables)
+
+    [Params]
+    retrieved_table_ids_set : List[List[str]]
+    gold_table_ids_set      : List[List[str]]
+
+    [Return]
+    recall : float
+    """
+    recall_set = [
+        len(set(gold_table_ids) & set(retrieved_table_ids)) / len(set(gold_table_ids))
+        for retrieved_table_ids, gold_table_ids in zip(retrieved_table_ids_set, gold_table_ids_set)
+        if gold_table_ids
+    ]
+
+    return sum(recall_set) / len(recall_set) if recall_set else 0.0
\ No newline at end of file
@@ -0,0 +1,178 @@
+import json
+import os
+import numpy as np
+from typing import Any, Dict, List, Literal, Union
+from utils import TableCorpus, serialize_table
+from ._embedder import DPREmbedder, HashingEmbedder
+from ._fingerprint_tables import fingerprint_table
+from ._top_k import top_k_indices
+
+
+class DenseIndex:
+    def __init__(self, path_dir: str):
+        """Initialization
+
+        Table vectors live in {path_dir}/dense_index.npy as a memory-mapped (tables x dim) matrix, and
+        {path_dir}/dense_index.json holds the embedder name, the table IDs of the rows and their content
+        fingerprints (so unchanged tables are not re-embedded).
+        """
+        self.path_dir = path_dir
+        self.embedder_name = None
+        self.table_ids = []
+        self.fingerprints = []
+        self.vectors = None
+
+        if os.path.exists(f'{path_dir}/{META_FILE_NAME}') and os.path.exists(f'{path_dir}/{VECTORS_FILE_NAME}'):
+            meta = json.load(open(f'{path_dir}/{META_FILE_NAME}', 'r'))
+            self.embedder_name = meta['embedder']
+            self.table_ids = meta['table_ids']
+            self.fingerprints = meta['fingerprints']
+            self.vectors = np.load(f'{path_dir}/{VECTORS_FILE_NAME}', mmap_mode='r')
+
+    def update(
+        self,
+        table_corpus: Union[List[Dict[str, Any]], TableCorpus],
+        embedder: Union[DPREmbedder, HashingEmbedder],
+        dtype: Literal['float32', 'float16']='float32',
+        batch_size: int=1024
+        ) -> int:
+        """Incremental (re-)embedding of a table corpus
+
+        Rows of tables whose content fingerprint is unchanged are copied over; only new or changed tables
+        are embedded, `batch_size` at a time. A different embedder or dtype re-embeds everything.
+        The new matrix is written next to the old one and swapped in once complete.
+
+        [Params]
+        table_corpus : Union[List[Dict[str, Any]], TableCorpus]
+        embedder     : Union[DPREmbedder, HashingEmbedder]
+        dtype        : Literal['float32', 'float16']
+        batch_size   : int
+
+        [Return]
+        num_of_embedded_tables : int
+        """
+        is_reusable = self.vectors is not None and self.embedder_name == embedder.name and self.vectors.dtype == np.dtype(dtype)
+        match_row_with_fingerprint = {
+            (table_id, fingerprint): row_idx
+            for row_idx, (table_id, fingerprint) in enumerate(zip(self.table_ids, self.fingerprints))
+        } if is_reusable else dict()
+
+        tables = list(table_corpus)
+        table_ids = [table['id'] for table in tables]
+        fingerprints = [fingerprint_table(table=table) for table in tables]
+        pending_row_idx_set = [
+            row_idx for row_idx, key in enumerate(zip(table_ids, fingerprints))
+            if key not in match_row_with_fingerprint
+        ]
+
+        if not pending_row_idx_set and len(tables) == len(self.table_ids):
+            return 0
+
+        vectors = np.lib.format.open_memmap(f'{self.path_dir}/{VECTORS_FILE_NAME}.tmp', mode='w+', dtype=dtype, shape=(len(tables), embedder.dim))
+
+        reused_row_idx_set = [row_idx for row_idx, key in enumerate(zip(table_ids, fingerprints)) if key in match_row_with_fingerprint]
+        if reused_row_idx_set:
+            vectors[reused_row_idx_set] = self.vectors[[match_row_with_fingerprint[(table_ids[row_idx], fingerprints[row_idx])] for row_idx in reused_row_idx_set]]
+
+        for start in range(0, len(pending_row_idx_set), batch_size):
+            row_idx_set = pending_row_idx_set[start:start + batch_size]
+            # Renderings are memoized by table ID, so the ID is left out to render the current content
+            vectors[row_idx_set] = embedder.embed_tables(texts=[
+                serialize_table(table={key: value for key, value in tables[row_idx].items() if key != 'id'})
+                for row_idx in row_idx_set
+            ])
+
+        vectors.flush()
+        del vectors
+
+        with open(f'{self.path_dir}/{META_FILE_NAME}.tmp', 'w') as file:
+            json.dump({'embedder': embedder.name, 'table_ids': table_ids, 'fingerprints': fingerprints}, file)
+
+        # The metadata is removed first and swapped in last, so a stale pair is never picked up
+        if os.path.exists(f'{self.path_dir}/{META_FILE_NAME}'):
+            os.remove(f'{self.path_dir}/{META_FILE_NAME}')
+        self.vectors = None
+        os.replace(f'{self.path_dir}/{VECTORS_FILE_NAME}.tmp', f'{self.path_dir}/{VECTORS_FILE_NAME}')
+        os.replace(f'{self.path_dir}/{META_FILE_NAME}.tmp', f'{self.path_dir}/{META_FILE_NAME}')
+
+        self.embedder_name = embedder.name
+        self.table_ids = table_ids
+        self.fingerprints = fingerprints
+        self.vectors = np.load(f'{self.path_dir}/{VECTORS_FILE_NAME}', mmap_mode='r')
+
+        return len(pending_row_idx_set)
+
+    def search(
+        self,
+        query_vectors: np.ndarray,
+        top_k: int=10,
+        block_size: int=65536,
+        query_block_size: int=1024
+        ) -> List[List[str]]:
+        """Batched top-k retrieval by inner product
+
+        Queries are scored `query_block_size` at a time, with one matrix multiply per block of `block_size`
+        table rows (so a float16 index is upcast a block at a time). The score matrix of a query block
+        takes query_block_size x tables x 4 bytes, and the index is read once per query block. The top-k
+        of every row is selected with argpartition (ties broken by corpus order).
+
+        [Params]
+        query_vectors    : np.ndarray (queries x dim)
+        top_k            : int
+        block_size       : int
+        query_block_size : int
+
+        [Return]
+        retrieved_table_ids_set : List[List[str]]
+        """
+        num_of_tables = len(self.table_ids)
+        top_k = min(top_k, num_of_tables)
+
+        query_vectors = np.asarray(query_vectors, dtype=np.float32)
+        retrieved_table_ids_set = []
+
+        for query_start in range(0, len(query_vectors), query_block_size):
+            query_block = query_vectors[query_start:query_start + query_block_size]
+            scores = np.empty((len(query_block), num_of_tables), dtype=np.float32)
+
+            for start in range(0, num_of_tables, block_size):
+                np.matmul(query_block, np.asarray(self.vectors[start:start + block_size], dtype=np.float32).T, out=scores[:, start:start + block_size])
+
+            retrieved_table_ids_set.extend(
+                [self.table_ids[doc_idx] for doc_idx in doc_indices]
+                for doc_indices in top_k_indices(scores=scores, top_k=top_k)
+            )
+
+        return retrieved_table_ids_set
+
+    def __len__(self) -> int:
+        """Number of indexed tables"""
+        return len(self.table_ids)
+
+
+def load_dense_index(
+    path_dir: str,
+    table_corpus: Union[List[Dict[str, Any]], TableCorpus],
+    embedder: Union[DPREmbedder, HashingEmbedder],
+    dtype: Literal['float32', 'float16']='float32'
+    ) -> DenseIndex:
+    """Load the dense index of a table corpus, embedding the tables that are new or changed since the last run
+
+    [Params]
+    path_dir     : str
+    table_corpus : Union[List[Dict[str, Any]], TableCorpus]
+    embedder     : Union[DPREmbedder, HashingEmbedder]
+    dtype        : Literal['float32', 'float16']
+
+    [Return]
+    dense_index : DenseIndex
+    """
+    dense_index = DenseIndex(path_dir=path_dir)
+    dense_index.update(table_corpus=table_corpus, embedder=embedder, dtype=dtype)
+
+    return dense_index
+
+
+if __name__ == 'utils_retrieval._dense_index':
+    VECTORS_FILE_NAME = 'dense_index.npy'
+    META_FILE_NAME = 'dense_index.json'
\ No newline at end of file
@@ -0,0 +1,118 @@
+import re
+import zlib
+import numpy as np
+from typing import List, Literal, Union
+
+
+class HashingEmbedder:
+    def __init__(self, dim: int=768):
+        """Initialization
+
+        A dependency-free CPU stand-in for a trained encoder: words are feature-hashed into `dim` signed
+        buckets with log-scaled counts, then L2-normalized, so inner products are cosine similarities.
+        """
+        self.name = f'hashing-{dim}'
+        self.dim = dim
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Feature hashing of a batch of texts"""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+
+        for row_idx, text in enumerate(texts):
+            tokens, counts = np.unique(re.findall(r"\w+", text.lower()), return_counts=True)
+            hashes = np.array([zlib.crc32(token.encode('utf-8')) for token in tokens], dtype=np.int64)
+            np.add.at(vectors[row_idx], hashes % self.dim, np.where(hashes & (1 << 31), -1.0, 1.0) * np.log1p(counts))
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+
+        return np.divide(vectors, norms, out=vectors, where=norms > 0)
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """Query embedding"""
+        return self._embed(texts=texts)
+
+    def embed_tables(self, texts: List[str]) -> np.ndarray:
+        """Table embedding"""
+        return self._embed(texts=texts)
+
+
+class DPREmbedder:
+    def __init__(
+        self,
+        question_model_name: str='facebook/dpr-question_encoder-single-nq-base',
+        context_model_name: str='facebook/dpr-ctx_encoder-single-nq-base',
+        batch_size: int=64
+        ):
+        """Initialization (the DPR encoders are only loaded on first use; they run on GPU when available)"""
+        self.name = f'dpr-{context_model_name}'
+        self.dim = 768
+        self.question_model_name = question_model_name
+        self.context_model_name = context_model_name
+        self.batch_size = batch_size
+
+        self._encoders = dict()
+
+    def _load_encoder(self, kind: Literal['question', 'context']):
+        """Encoder and tokenizer loading"""
+        if kind not in self._encoders:
+            import torch
+            from transformers import (
+                DPRContextEncoder, DPRContextEncoderTokenizerFast, DPRQuestionEncoder, DPRQuestionEncoderTokenizerFast
+            )
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+
+            if kind == 'question':
+                tokenizer = DPRQuestionEncoderTokenizerFast.from_pretrained(self.question_model_name)
+                encoder = DPRQuestionEncoder.from_pretrained(self.question_model_name)
+            else:
+                tokenizer = DPRContextEncoderTokenizerFast.from_pretrained(self.context_model_name)
+                encoder = DPRContextEncoder.from_pretrained(self.context_model_name)
+
+            self._encoders[kind] = (tokenizer, encoder.to(device).eval(), device)
+
+        return self._encoders[kind]
+
+    def _embed(self, texts: List[str], kind: Literal['question', 'context']) -> np.ndarray:
+        """Batched encoding (pooled outputs, truncated to 512 tokens)"""
+        import torch
+        tokenizer, encoder, device = self._load_encoder(kind=kind)
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+
+        with torch.inference_mode():
+            for start in range(0, len(texts), self.batch_size):
+                inputs = tokenizer(texts[start:start + self.batch_size], padding=True, truncation=True, max_length=512, return_tensors='pt').to(device)
+                vectors[start:start + self.batch_size] = encoder(**inputs).pooler_output.float().cpu().numpy()
+
+        return vectors
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """Question embedding"""
+        return self._embed(texts=texts, kind='question')
+
+    def embed_tables(self, texts: List[str]) -> np.ndarray:
+        """Table embedding"""
+        return self._embed(texts=texts, kind='context')
+
+
+def load_embedder(embedder: Literal['dpr', 'hashing']='dpr') -> Union[DPREmbedder, HashingEmbedder]:
+    """Load a table/question embedder
+
+    [Param]
+    embedder : Literal['dpr', 'hashing']
+
+    [Return]
+    embedder : Union[DPREmbedder, HashingEmbedder]
+    """
+    if embedder not in EMBEDDER_BUFFER:
+        if embedder == 'hashing':
+            EMBEDDER_BUFFER[embedder] = HashingEmbedder()
+        elif embedder == 'dpr':
+            EMBEDDER_BUFFER[embedder] = DPREmbedder()
+        else:
+            raise ValueError(f"Unknown embedder {embedder!r}")
+
+    return EMBEDDER_BUFFER[embedder]
+
+
+if __name__ == 'utils_retrieval._embedder':
+    EMBEDDER_BUFFER = dict()
\ No newline at end of file
@@ -0,0 +1,17 @@
+import hashlib
+import json
+from typing import Any, Dict, Iterable
+
+
+def fingerprint_table(table: Dict[str, Any]) -> str:
+    """Fingerprint of the table content"""
+    return hashlib.sha256(json.dumps(table, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def fingerprint_tables(tables: Iterable[Dict[str, Any]]) -> str:
+    """Fingerprint of a table corpus (the content and order of its tables)"""
+    digest = hashlib.sha256()
+    for table in tables:
+        digest.update(fingerprint_table(table=table).encode('utf-8'))
+
+    return digest.hexdigest()
\ No newline at end of file
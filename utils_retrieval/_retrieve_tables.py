@@ -0,0 +1,54 @@
+from typing import List, Literal, Tuple
+from utils import MTRAIGBENCH
+from ._bm25_index import load_bm25_index
+from ._compute_recall import compute_recall
+from ._dense_index import load_dense_index
+from ._embedder import load_embedder
+
+
+def retrieve_tables(
+    mt_raig_bench: MTRAIGBENCH,
+    retriever: Literal['bm25', 'dense']='bm25',
+    top_k: int=10,
+    rebuild: bool=False,
+    embedder: Literal['dpr', 'hashing']='dpr',
+    dtype: Literal['float32', 'float16']='float32'
+    ) -> Tuple[List[List[str]], float]:
+    """Retrieve the tables of every benchmark question in process
+
+    The retrieved tables replace the DPR results of the benchmark, so generation and evaluation
+    consume them as is. The index lives next to the benchmark and is built on first use; the dense
+    index only embeds the tables that are new or changed since the last run.
+
+    [Params]
+    mt_raig_bench : MTRAIGBENCH
+    retriever     : Literal['bm25', 'dense']
+    top_k         : int
+    rebuild       : bool (BM25 only)
+    embedder      : Literal['dpr', 'hashing'] (dense only)
+    dtype         : Literal['float32', 'float16'] (dense only)
+
+    [Returns]
+    retrieved_table_ids_set : List[List[str]]
+    recall                  : float (against the gold tables)
+    """
+    question_set = [data['question'] for data in mt_raig_bench]
+
+    if retriever == 'bm25':
+        index = load_bm25_index(path_dir=mt_raig_bench.path_dir, table_corpus=mt_raig_bench.table_corpus, rebuild=rebuild)
+        retrieved_table_ids_set = index.search(queries=question_set, top_k=top_k)
+    elif retriever == 'dense':
+        dense_embedder = load_embedder(embedder=embedder)
+        index = load_dense_index(path_dir=mt_raig_bench.path_dir, table_corpus=mt_raig_bench.table_corpus, embedder=dense_embedder, dtype=dtype)
+        retrieved_table_ids_set = index.search(query_vectors=dense_embedder.embed_queries(texts=question_set), top_k=top_k)
+    else:
+        raise ValueError(f"Unknown retriever {retriever!r}")
+
+    mt_raig_bench.replace_retrieved_tables(retrieved_table_ids_set=retrieved_table_ids_set)
+
+    recall = compute_recall(
+        retrieved_table_ids_set=retrieved_table_ids_set,
+        gold_table_ids_set=[data['gold_table_id_set'] for data in mt_raig_bench]
+    )
+
+    return retrieved_table_ids_set, recall
\ No newline at end of file
@@ -0,0 +1,28 @@
+import numpy as np
+from typing import List
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> List[np.ndarray]:
+    """Row-wise top-k column indices by decreasing score
+
+    One argpartition finds the k-th score of every row; columns tied with it are all kept as
+    candidates, so ties (at the cutoff too) are broken by column order.
+
+    [Params]
+    scores : np.ndarray (queries x documents)
+    top_k  : int (at most the number of documents)
+
+    [Return]
+    top_k_indices_set : List[np.ndarray]
+    """
+    if not top_k:
+        return [np.empty(0, dtype=np.int64) for _ in range(len(scores))]
+
+    kth_scores = np.take_along_axis(scores, np.argpartition(-scores, top_k - 1, axis=1)[:, top_k - 1:top_k], axis=1)
+
+    top_k_indices_set = []
+    for row_scores, kth_score in zip(scores, kth_scores):
+        candidate_indices = np.flatnonzero(row_scores >= kth_score[0])
+        top_k_indices_set.append(candidate_indices[np.lexsort((candidate_indices, -row_scores[candidate_indices]))][:top_k])
+
+    return top_k_indices_set
\ No newline at end of file
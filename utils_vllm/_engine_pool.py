@@ -0,0 +1,245 @@
+import multiprocessing
+import os
+import traceback
+from collections import deque
+from multiprocessing.connection import wait
+from typing import Any, Dict, List, Literal, Optional, Tuple
+from utils import load_response_cache
+from ._get_batch_response import get_batch_response
+from ._load_llm import load_llm
+
+
+def _run_worker(
+    model_name: str,
+    engine: Literal['vllm', 'stub'],
+    device: Optional[str],
+    continuous_batching: bool,
+    enable_prefix_caching: bool,
+    cache_path: str,
+    cache_max_entries: int,
+    task_queue: Any,
+    result_connection: Any
+    ):
+    """Worker process: loads its own engine, then generates the chunks it is handed until the sentinel"""
+    if device is not None:
+        # One GPU per engine; must be set before the engine initializes CUDA
+        os.environ['CUDA_VISIBLE_DEVICES'] = device
+
+    try:
+        load_response_cache(path=cache_path, max_entries=cache_max_entries)
+        load_llm(model_name=model_name, enable_prefix_caching=enable_prefix_caching, engine=engine)
+    except Exception:
+        result_connection.send(('failed', traceback.format_exc()))
+        return
+
+    while (chunk := task_queue.get()) is not None:
+        batch_index, keys, prompts = chunk
+        task_outputs = get_batch_response(
+            prompts=prompts,
+            model_name=model_name,
+            batch_index=batch_index,
+            continuous_batching=continuous_batching,
+            enable_prefix_caching=enable_prefix_caching
+        )
+        result_connection.send(('done', (batch_index, keys, task_outputs)))
+
+
+class EnginePool:
+    def __init__(
+        self,
+        model_name: str,
+        num_of_workers: int,
+        engine: Literal['vllm', 'stub']='vllm',
+        continuous_batching: bool=False,
+        enable_prefix_caching: bool=False
+        ):
+        """Initialization
+
+        Each worker process owns one engine (on its own GPU for vLLM). Chunks wait in a backlog
+        and go to whichever worker is idle, so a slow chunk never holds back the others. Every
+        worker has its own task queue and result pipe: a worker that dies only loses the chunk
+        it was generating, which is re-queued once and failed if it kills a worker again.
+        """
+        self.model_name = model_name
+        self.num_of_workers = num_of_workers
+        self.engine = engine
+        self.continuous_batching = continuous_batching
+        self.enable_prefix_caching = enable_prefix_caching
+
+        self._processes = []
+        self._pending = dict()
+        self._finished = deque()
+
+    def start(self):
+        """Worker processes starting (spawned, since CUDA cannot be re-initialized in a forked child)"""
+        if self._processes:
+            return
+
+        if self.engine == 'vllm':
+            # Workers take the devices visible to this process in order
+            visible_devices = os.environ.get('CUDA_VISIBLE_DEVICES')
+            devices = [device.strip() for device in visible_devices.split(',') if device.strip()] if visible_devices is not None else [str(worker_index) for worker_index in range(self.num_of_workers)]
+            if len(devices) < self.num_of_workers:
+                raise ValueError(f"{self.num_of_workers} engine workers need one GPU each, but only {len(devices)} are visible (CUDA_VISIBLE_DEVICES={visible_devices})")
+        else:
+            devices = [None] * self.num_of_workers
+
+        context = multiprocessing.get_context('spawn')
+        self._task_queues = []
+        self._result_connections = []
+        self._backlog = deque()
+        self._assigned = dict()
+        self._requeued = set()
+        self._dead = set()
+
+        response_cache = load_response_cache()
+
+        for worker_index in range(self.num_of_workers):
+            task_queue = context.Queue()
+            result_connection, worker_connection = context.Pipe(duplex=False)
+
+            process = context.Process(
+                target=_run_worker,
+                kwargs={
+                    'model_name': self.model_name,
+                    'engine': self.engine,
+                    'device': devices[worker_index],
+                    'continuous_batching': self.continuous_batching,
+                    'enable_prefix_caching': self.enable_prefix_caching,
+                    'cache_path': response_cache.path if response_cache is not None else None,
+                    'cache_max_entries': response_cache.max_entries if response_cache is not None else 0,
+                    'task_queue': task_queue,
+                    'result_connection': worker_connection
+                },
+                daemon=True
+            )
+            process.start()
+            # Only the worker keeps the sending end, so its death shows up as the end of the pipe
+            worker_connection.close()
+
+            self._processes.append(process)
+            self._task_queues.append(task_queue)
+            self._result_connections.append(result_connection)
+
+    def submit(self, batch_index: int, keys: List[Any], prompts: List[str]):
+        """Chunk submission"""
+        self.start()
+        self._pending[batch_index] = (keys, prompts)
+        self._backlog.append(batch_index)
+        self._dispatch()
+
+    @property
+    def num_of_pending(self) -> int:
+        """Number of submitted chunks not gathered yet"""
+        return len(self._pending) + len(self._finished)
+
+    def _dispatch(self):
+        """Backlog chunks handing to the idle live workers"""
+        for worker_index in range(len(self._processes)):
+            if not self._backlog:
+                return
+
+            if worker_index in self._dead or worker_index in self._assigned:
+                continue
+
+            batch_index = self._backlog.popleft()
+            keys, prompts = self._pending[batch_index]
+            self._assigned[worker_index] = batch_index
+            self._task_queues[worker_index].put((batch_index, keys, prompts))
+
+    def _fail(self, batch_index: int, reason: str):
+        """Chunk failing (its outputs come back as errors)"""
+        keys, prompts = self._pending.pop(batch_index)
+        self._finished.append((keys, [
+            {'prompt': pmt, 'response': '', 'time_taken': -1, 'error': f"[{batch_index}] {reason}"}
+            for pmt in prompts
+        ]))
+
+    def _receive(self, worker_index: int) -> bool:
+        """Message receiving from a worker (False once its pipe is closed)"""
+        try:
+            status, payload = self._result_connections[worker_index].recv()
+        except (EOFError, OSError):
+            # The worker exited, possibly in the middle of a message; it is reaped as dead
+            self._processes[worker_index].terminate()
+            self._processes[worker_index].join()
+            return False
+
+        if status == 'failed':
+            raise RuntimeError(f"Engine worker {worker_index} failed to start:\n{payload}")
+
+        batch_index, keys, task_outputs = payload
+        self._assigned.pop(worker_index, None)
+
+        # A re-queued chunk may finish twice; only its first outputs are kept
+        if self._pending.pop(batch_index, None) is not None:
+            self._finished.append((keys, task_outputs))
+
+        self._dispatch()
+        return True
+
+    def _reap(self):
+        """Dead workers handling: their chunks are re-queued once, then failed"""
+        for worker_index, process in enumerate(self._processes):
+            if worker_index in self._dead or process.is_alive():
+                continue
+
+            # Results sent right before dying are still in the pipe
+            while self._result_connections[worker_index].poll() and self._receive(worker_index=worker_index):
+                pass
+
+            self._dead.add(worker_index)
+
+            if (batch_index := self._assigned.pop(worker_index, None)) is not None and batch_index in self._pending:
+                if batch_index in self._requeued:
+                    self._fail(batch_index=batch_index, reason=f"Engine worker {worker_index} died (exit code {process.exitcode}) while generating this chunk, which had already been re-queued once")
+                else:
+                    self._requeued.add(batch_index)
+                    self._backlog.appendleft(batch_index)
+
+        if len(self._dead) == len(self._processes):
+            while self._backlog:
+                self._fail(batch_index=self._backlog.popleft(), reason="Every engine worker exited before this chunk was generated")
+
+        self._dispatch()
+
+    def next_result(self) -> Tuple[List[Any], List[Dict[str, Any]]]:
+        """Next finished chunk (in completion order) as its keys and outputs
+
+        Raises a RuntimeError with the traceback if a worker fails to load its engine.
+
+        [Return]
+        keys         : List[Any]
+        task_outputs : List[Dict[str, Any]]
+        """
+        while not self._finished:
+            live_worker_indices = [worker_index for worker_index in range(len(self._processes)) if worker_index not in self._dead]
+            match_worker_index_with_connection = {self._result_connections[worker_index]: worker_index for worker_index in live_worker_indices}
+
+            # Process sentinels wake the wait as soon as a worker dies
+            for ready in wait(list(match_worker_index_with_connection) + [self._processes[worker_index].sentinel for worker_index in live_worker_indices], timeout=1.0):
+                if ready in match_worker_index_with_connection:
+                    self._receive(worker_index=match_worker_index_with_connection[ready])
+
+            self._reap()
+
+        return self._finished.popleft()
+
+    def close(self):
+        """Worker processes stopping"""
+        if not self._processes:
+            return
+
+        for worker_index, process in enumerate(self._processes):
+            if process.is_alive():
+                self._task_queues[worker_index].put(None)
+
+        for process in self._processes:
+            process.join(timeout=60)
+            if process.is_alive():
+                process.terminate()
+
+        for result_connection in self._result_connections:
+            result_connection.close()
+
+        self._processes = []
\ No newline at end of file
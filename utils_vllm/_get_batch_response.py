@@ -1,51 +1,97 @@
 import traceback
 from time import time
 from typing import Any, Dict, List
-from ._load_llm import load_llm
+from utils import ResponseCache, load_response_cache
+from ._load_llm import load_llm, load_llm_params, load_sampling_params
+
+
+def _request_time_taken(output: Any, default: float) -> float:
+    """Per-request latency (arrival to finish) from the vLLM request metrics, if recorded"""
+    metrics = getattr(output, 'metrics', None)
+
+    if getattr(metrics, 'arrival_time', None) and getattr(metrics, 'finished_time', None):
+        return metrics.finished_time - metrics.arrival_time
+
+    return default
 
 
 def get_batch_response(
     prompts: List[str],
     model_name: str,
-    batch_index: int
+    batch_index: int,
+    continuous_batching: bool=False,
+    enable_prefix_caching: bool=False
     ) -> List[Dict[str, Any]]:
     """Get vLLM batch response
 
+    With continuous batching, all prompts are submitted to the engine at once and scheduled
+    continuously; `time_taken` is then the latency of each request instead of the batch average.
+
     [Params]
-    prompts     : List[str]
-    model_name  : str
-    batch_index : int
+    prompts               : List[str]
+    model_name            : str
+    batch_index           : int
+    continuous_batching   : bool
+    enable_prefix_caching : bool
 
     [Return]
     instance_list : List[Dict[str, Any]]
-    e.g. dict_keys(['prompt', 'response', 'time_taken'])
+    e.g. dict_keys(['prompt', 'response', 'time_taken'(, 'error')])
     """
-    llm = load_llm(model_name=model_name)
-    
-    try:
-        start_time = time()
-        results = llm.generate(prompts=prompts)
-        end_time = time()
-        
-        results = [
-            res.split('</think>', 1)[-1] for res in results
-        ]
-    
-    except Exception:
-        return [
-            {
-                'prompt': pmt,
-                'response': f"[{batch_index}] {traceback.format_exc()}",
-                'time_taken': -1
-            }
-            for pmt in prompts
-        ]
-
-    return [
-        {
-            'prompt': pmt,
-            'response': res[0].text.replace('\n', ' ').strip(),
-            'time_taken': (end_time - start_time) / len(prompts)
-        }
-        for pmt, res in zip(prompts, results.generations)
-    ]
\ No newline at end of file
+    response_cache = load_response_cache()
+    cache_keys = [ResponseCache.make_key(model_name, load_llm_params(model_name=model_name), '', pmt) for pmt in prompts]
+
+    cached_responses = [
+        response_cache.get(cache_key) if response_cache is not None else None
+        for cache_key in cache_keys
+    ]
+    uncached_indices = [idx for idx, cached in enumerate(cached_responses) if cached is None]
+    uncached_prompts = [prompts[idx] for idx in uncached_indices]
+
+    responses = []
+    time_taken_set = []
+
+    if uncached_prompts:
+        llm = load_llm(model_name=model_name, enable_prefix_caching=enable_prefix_caching)
+
+        try:
+            start_time = time()
+
+            if continuous_batching:
+                # The engine returns outputs in prompt order
+                results = llm.client.generate(uncached_prompts, load_sampling_params(model_name=model_name), use_tqdm=False)
+                texts = [res.outputs[0].text for res in results]
+            else:
+                results = llm.generate(prompts=uncached_prompts)
+                texts = [res[0].text for res in results.generations]
+
+            end_time = time()
+
+            responses = [text.split('</think>', 1)[-1].replace('\n', ' ').strip() for text in texts]
+
+            time_taken = (end_time - start_time) / len(uncached_prompts)
+            time_taken_set = [_request_time_taken(res, default=time_taken) for res in results] if continuous_batching else [time_taken] * len(uncached_prompts)
+
+        except Exception:
+            return [
+                {
+                    'prompt': pmt,
+                    'response': '',
+                    'time_taken': -1,
+                    'error': f"[{batch_index}] {traceback.format_exc()}"
+                }
+                for pmt in prompts
+            ]
+
+        if response_cache is not None:
+            for idx, res in zip(uncached_indices, responses):
+                response_cache.set(cache_keys[idx], {'response': res})
+
+    uncached_outputs = iter(zip(responses, time_taken_set))
+    instance_list = []
+
+    for pmt, cached in zip(prompts, cached_responses):
+        res, time_taken = (cached['response'], 0) if cached is not None else next(uncached_outputs)
+        instance_list.append({'prompt': pmt, 'response': res, 'time_taken': time_taken})
+
+    return instance_list
\ No newline at end of file
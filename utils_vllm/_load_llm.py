@@ -1,21 +1,46 @@
-from langchain_community.llms.vllm import VLLM
+from typing import Any, Callable, Dict, Literal, Optional
+from utils import estimate_tokens
+from ._stub_llm import StubLLM
 
 
-def load_llm(model_name: str) -> VLLM:
-    """Load vLLM
+def load_llm_params(model_name: str) -> Dict[str, Any]:
+    """Load vLLM sampling parameters
 
     [Param]
     model_name : str
 
     [Return]
-    llm : VLLM
+    llm_params : Dict[str, Any]
+    """
+    llm_params = {'model': model_name, 'temperature': 0.0}
+
+    return llm_params
+
+
+def load_llm(model_name: str, enable_prefix_caching: bool=False, engine: Literal['vllm', 'stub']='vllm') -> Any:
+    """Load vLLM
+
+    The engine options of the first load of a model are kept. The stub engine is a CPU stand-in
+    with the same interface, for testing the orchestration without a GPU (or vLLM installed).
+
+    [Params]
+    model_name            : str
+    enable_prefix_caching : bool
+    engine                : Literal['vllm', 'stub']
+
+    [Return]
+    llm : Any
     """
     if model_name not in VLLM_BUFFER:
-        llm = VLLM(
-            model=model_name,
-            tensor_parallel_size=1,
-            temperature=0.0
-        )
+        if engine == 'stub':
+            llm = StubLLM(**load_llm_params(model_name=model_name))
+        else:
+            from langchain_community.llms.vllm import VLLM
+            llm = VLLM(
+                **load_llm_params(model_name=model_name),
+                tensor_parallel_size=1,
+                vllm_kwargs={'enable_prefix_caching': True} if enable_prefix_caching else dict()
+            )
         VLLM_BUFFER[model_name] = llm
     
     else:
@@ -24,5 +49,55 @@ def load_llm(model_name: str) -> VLLM:
     return llm
 
 
+def load_sampling_params(model_name: str) -> Optional[Any]:
+    """Load vLLM engine sampling parameters (same sampling as the LangChain wrapper, for direct engine calls)
+
+    [Param]
+    model_name : str
+
+    [Return]
+    sampling_params : Optional[SamplingParams]
+    """
+    llm = load_llm(model_name=model_name)
+
+    if isinstance(llm, StubLLM):
+        # The stub engine ignores sampling parameters
+        return None
+
+    from vllm import SamplingParams
+
+    sampling_params = SamplingParams(
+        temperature=load_llm_params(model_name=model_name)['temperature'],
+        top_p=llm.top_p,
+        top_k=llm.top_k,
+        max_tokens=llm.max_new_tokens
+    )
+
+    return sampling_params
+
+
+def load_tokenizer(model_name: str, engine: Literal['vllm', 'stub']='vllm') -> Callable[[str], int]:
+    """Load the token counter of a model (for token budgets that match what the engine sees)
+
+    [Params]
+    model_name : str
+    engine     : Literal['vllm', 'stub']
+
+    [Return]
+    tokenizer : Callable[[str], int]
+    """
+    if engine == 'stub':
+        # The stub engine has no tokenizer of its own
+        return estimate_tokens
+
+    if model_name not in TOKENIZER_BUFFER:
+        from transformers import AutoTokenizer
+        hf_tokenizer = AutoTokenizer.from_pretrained(model_name)
+        TOKENIZER_BUFFER[model_name] = lambda text: len(hf_tokenizer.encode(text, add_special_tokens=False))
+
+    return TOKENIZER_BUFFER[model_name]
+
+
 if __name__ == 'utils_vllm._load_llm':
-    VLLM_BUFFER = dict()
\ No newline at end of file
+    VLLM_BUFFER = dict()
+    TOKENIZER_BUFFER = dict()
\ No newline at end of file
@@ -0,0 +1,65 @@
+import hashlib
+from time import sleep, time
+from types import SimpleNamespace
+from typing import Any, List
+
+
+class _StubEngine:
+    def __init__(self, llm: 'StubLLM'):
+        """Initialization"""
+        self.llm = llm
+
+    def generate(self, prompts: List[str], sampling_params: Any=None, use_tqdm: bool=False) -> List[Any]:
+        """Engine generation (vLLM LLM.generate interface, with per-request metrics)"""
+        arrival_time = time()
+        texts = self.llm._decode(prompts=prompts)
+        finished_time = time()
+
+        return [
+            SimpleNamespace(
+                prompt=prompt,
+                outputs=[SimpleNamespace(text=text)],
+                metrics=SimpleNamespace(arrival_time=arrival_time, finished_time=finished_time)
+            )
+            for prompt, text in zip(prompts, texts)
+        ]
+
+
+class StubLLM:
+    def __init__(self, model: str, temperature: float=0.0, seconds_per_token: float=0.002, num_of_output_tokens: int=64):
+        """Initialization
+
+        A batch takes as long as decoding `num_of_output_tokens` tokens at `seconds_per_token`,
+        like a real engine that decodes a batch in lockstep.
+        """
+        self.model = model
+        self.temperature = temperature
+        self.seconds_per_token = seconds_per_token
+        self.num_of_output_tokens = num_of_output_tokens
+
+        self.top_p = 1.0
+        self.top_k = -1
+        self.max_new_tokens = num_of_output_tokens
+
+        self.client = _StubEngine(llm=self)
+
+    def _complete(self, prompt: str) -> str:
+        """Deterministic completion of a prompt (a reasoning block and a three-sentence insight)"""
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+        return (
+            f"<think>stub reasoning {digest[:8]}</think>"
+            f"The tables show a leading entry ({digest[8:12]}). "
+            f"The values change across the tables ({digest[12:16]}). "
+            f"The comparison points to a consistent pattern ({digest[16:20]})."
+        )
+
+    def _decode(self, prompts: List[str]) -> List[str]:
+        """Batch decoding with simulated latency"""
+        sleep(self.seconds_per_token * self.num_of_output_tokens)
+
+        return [self._complete(prompt=prompt) for prompt in prompts]
+
+    def generate(self, prompts: List[str]) -> Any:
+        """Batch generation (LangChain LLM interface)"""
+        return SimpleNamespace(generations=[[SimpleNamespace(text=text)] for text in self._decode(prompts=prompts)])
\ No newline at end of file
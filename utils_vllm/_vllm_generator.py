@@ -1,41 +1,316 @@
+import asyncio
 from tqdm import tqdm
-from typing import Any, Dict, List, Tuple
-from utils import load_prompt, serialize_table
+from typing import Any, AsyncIterator, Dict, Iterable, List, Literal, Optional, Tuple
+from utils import Checkpoint, estimate_tokens, load_dead_letter, load_tracer, prune_tables, render_prompt, render_prompt_prefix, serialize_tables, trace_stage
+from ._engine_pool import EnginePool
 from ._get_batch_response import get_batch_response
+from ._load_llm import load_llm, load_tokenizer
 
 
 class VLLMGenerator:
-    def __init__(self, model_name: str, batch_size: int):
-        """Initialization"""
+    def __init__(
+        self,
+        model_name: str,
+        batch_size: int,
+        continuous_batching: bool=False,
+        window_size: int=0,
+        enable_prefix_caching: bool=False,
+        num_of_workers: int=1,
+        engine: Literal['vllm', 'stub']='vllm'
+        ):
+        """Initialization
+
+        With continuous batching, windows of `window_size` inputs (0: the whole input set) are submitted
+        to the engine at once instead of batches of `batch_size`. With prefix caching, the engine reuses
+        the KV cache of shared prompt prefixes, and inputs sharing a prefix are submitted together.
+        With more than one worker, chunks are generated data-parallel by a pool of worker processes,
+        each owning its own engine.
+        """
         self.model_name = model_name
         self.batch_size = batch_size
+        self.continuous_batching = continuous_batching
+        self.window_size = window_size
+        self.enable_prefix_caching = enable_prefix_caching
+        self.num_of_workers = num_of_workers
+        self.engine = engine
+
+    def _chunk_size(self, num_of_inputs: int) -> int:
+        """Number of inputs submitted together"""
+        if self.continuous_batching and not self.window_size and self.num_of_workers > 1:
+            # A few chunks per worker, so idle workers can pick up the slack of slow ones
+            return max(1, -(-num_of_inputs // (4 * self.num_of_workers)))
+
+        if self.continuous_batching:
+            return self.window_size or max(1, num_of_inputs)
+
+        return self.batch_size
+
+    def _group_by_prefix(self, task: str, input_set: List[Dict[str, Any]], key_set: List[Any]) -> List[Any]:
+        """Key reordering so that inputs sharing a prompt prefix are adjacent (groups in order of first appearance)"""
+        match_group_with_prefix = dict()
+        match_group_with_key = dict()
+
+        for key in key_set:
+            prompt_prefix = render_prompt_prefix(role='user', task=task, task_input=input_set[key])
+            match_group_with_key[key] = match_group_with_prefix.setdefault(prompt_prefix, len(match_group_with_prefix))
+
+        return sorted(key_set, key=lambda key: match_group_with_key[key])
     
-    def preprocess_data(self, tables_set: List[List[Dict[str, Any]]], dataset: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Preprocessing"""
+    def preprocess_data(
+        self,
+        tables_set: List[List[Dict[str, Any]]],
+        dataset: List[Dict[str, Any]],
+        pruning_token_budget: int=None,
+        serialization_token_budget: int=None,
+        truncation_policy: Literal['rank', 'rows', 'even']='rank'
+        ) -> List[Dict[str, Any]]:
+        """Preprocessing
+
+        With a pruning token budget, tables are pruned to the question first. With a serialization token
+        budget, the serialized tables are truncated to fit it, and each input reports its dropped tokens.
+        Serialization tokens are counted with the model's own tokenizer.
+        """
+        tokenizer = load_tokenizer(model_name=self.model_name, engine=self.engine) if serialization_token_budget is not None else None
+
         preprocessed_input_set = []
         for tables, data in zip(tables_set, dataset):
-            serialized_tables = '\n'.join([serialize_table(table=table, table_index=idx + 1) for idx, table in enumerate(tables)])
-            preprocessed_input_set.append({'serialized_tables': serialized_tables, 'question': data['question']})
+            if pruning_token_budget is not None:
+                tables = prune_tables(tables=tables, query=data['question'], token_budget=pruning_token_budget)
+            serialized_tables, num_of_dropped_tokens = serialize_tables(
+                tables=tables,
+                token_budget=serialization_token_budget,
+                truncation_policy=truncation_policy,
+                tokenizer=tokenizer,
+                is_indexed=True
+            )
+            preprocessed_input_set.append({'serialized_tables': serialized_tables, 'question': data['question'], 'num_of_dropped_tokens': num_of_dropped_tokens})
         return preprocessed_input_set
     
-    def generate(self, task: str, input_set: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], str]:
-        """Generation"""
-        task_output_set = []
-
-        for idx in tqdm(
-            range(0, len(input_set), self.batch_size),
-            total=len(input_set) // self.batch_size + (1 if len(input_set) % self.batch_size != 0 else 0),
-            desc=f"{self.model_name:<30}"
-            ):
-            task_outputs = get_batch_response(
-                batch_size=self.batch_size,
-                prompts=[load_prompt(role='user', task=task).format(**task_input) for task_input in input_set[idx : idx + self.batch_size]],
+    def _trace(self, task_output: Dict[str, Any]):
+        """Span recording of a single request (the engine schedules internally, so only latency and estimated tokens are known)"""
+        with trace_stage(stage='generate_insight'):
+            span = load_tracer().start(client='vllm', model=self.model_name, key=task_output['key'])
+
+        span['latency_seconds'] = max(0.0, task_output['time_taken'])
+        load_tracer().finish(
+            span=span,
+            input_tokens=estimate_tokens(task_output['prompt']),
+            output_tokens=estimate_tokens(task_output['response']),
+            cached=task_output['time_taken'] == 0,
+            error=bool(task_output.get('error'))
+        )
+
+    def _load_engine_pool(self) -> Optional[EnginePool]:
+        """Engine pool loading (None with a single worker, which generates with the in-process engine)"""
+        if self.num_of_workers > 1:
+            return EnginePool(
                 model_name=self.model_name,
-                batch_index=idx
+                num_of_workers=self.num_of_workers,
+                engine=self.engine,
+                continuous_batching=self.continuous_batching,
+                enable_prefix_caching=self.enable_prefix_caching
             )
 
-            task_output_set.extend(task_outputs)
+        if self.engine == 'stub':
+            # The in-process engine is otherwise loaded (as vLLM) by the first uncached batch
+            load_llm(model_name=self.model_name, engine=self.engine)
+
+        return None
+
+    def _generate_batch(self, task: str, keyed_inputs: List[Tuple[Any, Dict[str, Any]]], batch_index: int, checkpoint: Checkpoint=None) -> List[Dict[str, Any]]:
+        """Generation of a single batch"""
+        task_outputs = get_batch_response(
+            prompts=[render_prompt(role='user', task=task, task_input=task_input) for _, task_input in keyed_inputs],
+            model_name=self.model_name,
+            batch_index=batch_index,
+            continuous_batching=self.continuous_batching,
+            enable_prefix_caching=self.enable_prefix_caching
+        )
+
+        return self._collect_batch(keys=[key for key, _ in keyed_inputs], task_outputs=task_outputs, checkpoint=checkpoint)
+
+    def _submit_batch(self, engine_pool: EnginePool, task: str, keyed_inputs: List[Tuple[Any, Dict[str, Any]]], batch_index: int):
+        """Submission of a single batch to the engine pool"""
+        engine_pool.submit(
+            batch_index=batch_index,
+            keys=[key for key, _ in keyed_inputs],
+            prompts=[render_prompt(role='user', task=task, task_input=task_input) for _, task_input in keyed_inputs]
+        )
+
+    def _gather_batch(self, engine_pool: EnginePool, checkpoint: Checkpoint=None) -> List[Dict[str, Any]]:
+        """Gathering of the next batch finished by the engine pool"""
+        keys, task_outputs = engine_pool.next_result()
+
+        return self._collect_batch(keys=keys, task_outputs=task_outputs, checkpoint=checkpoint)
+
+    def _collect_batch(self, keys: List[Any], task_outputs: List[Dict[str, Any]], checkpoint: Checkpoint=None) -> List[Dict[str, Any]]:
+        """Keying, tracing and checkpointing of the outputs of a single batch"""
+        for key, task_output in zip(keys, task_outputs):
+            task_output['key'] = key
+            self._trace(task_output=task_output)
+            if checkpoint is not None:
+                checkpoint.append(task_output)
+
+        return task_outputs
+
+    def _sweep_failures(
+        self,
+        task: str,
+        task_output_set: List[Dict[str, Any]],
+        match_input_with_key: Dict[Any, Dict[str, Any]],
+        engine_pool: EnginePool=None,
+        checkpoint: Checkpoint=None
+        ) -> List[Dict[str, Any]]:
+        """Re-submission of the failed inputs once more in smaller batches (a tenth of a chunk), dead-lettering the ones that still fail"""
+        failed_key_set = [task_output['key'] for task_output in task_output_set if task_output.get('error')]
+
+        if not failed_key_set:
+            return task_output_set
+
+        sweep_chunk_size = max(1, self._chunk_size(num_of_inputs=len(failed_key_set)) // 10)
+        resubmitted_task_output_set = []
+
+        for idx in range(0, len(failed_key_set), sweep_chunk_size):
+            keyed_inputs = [(key, match_input_with_key[key]) for key in failed_key_set[idx : idx + sweep_chunk_size]]
+            if engine_pool is None:
+                resubmitted_task_output_set.extend(self._generate_batch(task=task, keyed_inputs=keyed_inputs, batch_index=idx, checkpoint=checkpoint))
+            else:
+                self._submit_batch(engine_pool=engine_pool, task=task, keyed_inputs=keyed_inputs, batch_index=idx)
+
+        while engine_pool is not None and engine_pool.num_of_pending:
+            resubmitted_task_output_set.extend(self._gather_batch(engine_pool=engine_pool, checkpoint=checkpoint))
+
+        for task_output in resubmitted_task_output_set:
+            if task_output.get('error'):
+                load_dead_letter().append({'stage': 'generate_insight', 'key': task_output['key'], 'error': task_output['error']})
+
+        match_task_output_with_key = {task_output['key']: task_output for task_output in resubmitted_task_output_set}
+
+        return [match_task_output_with_key.get(task_output['key'], task_output) for task_output in task_output_set]
+    
+    def generate(self, task: str, input_set: List[Dict[str, Any]], checkpoint: Checkpoint=None) -> Tuple[List[Dict[str, Any]], str]:
+        """Generation"""
+        key_set = [key for key in range(len(input_set)) if checkpoint is None or key not in checkpoint]
+
+        task_output_set = [checkpoint[key] for key in range(len(input_set)) if key in checkpoint] if checkpoint is not None else []
+
+        if self.enable_prefix_caching:
+            key_set = self._group_by_prefix(task=task, input_set=input_set, key_set=key_set)
+
+        chunk_size = self._chunk_size(num_of_inputs=len(key_set))
+        engine_pool = self._load_engine_pool()
+
+        try:
+            if engine_pool is None:
+                for idx in tqdm(
+                    range(0, len(key_set), chunk_size),
+                    total=len(key_set) // chunk_size + (1 if len(key_set) % chunk_size != 0 else 0),
+                    desc=f"{self.model_name:<30}"
+                    ):
+                    task_outputs = self._generate_batch(
+                        task=task,
+                        keyed_inputs=[(key, input_set[key]) for key in key_set[idx : idx + chunk_size]],
+                        batch_index=idx,
+                        checkpoint=checkpoint
+                    )
+
+                    task_output_set.extend(task_outputs)
+
+            else:
+                for idx in range(0, len(key_set), chunk_size):
+                    self._submit_batch(
+                        engine_pool=engine_pool,
+                        task=task,
+                        keyed_inputs=[(key, input_set[key]) for key in key_set[idx : idx + chunk_size]],
+                        batch_index=idx
+                    )
+
+                # Batches come back in completion order; outputs are re-sorted by key below
+                for _ in tqdm(range(engine_pool.num_of_pending), desc=f"{self.model_name:<30}"):
+                    task_output_set.extend(self._gather_batch(engine_pool=engine_pool, checkpoint=checkpoint))
+
+            task_output_set = self._sweep_failures(
+                task=task,
+                task_output_set=task_output_set,
+                match_input_with_key={key: input_set[key] for key in key_set},
+                engine_pool=engine_pool,
+                checkpoint=checkpoint
+            )
+
+        finally:
+            if engine_pool is not None:
+                engine_pool.close()
         
         time = sum([output['time_taken'] for output in task_output_set])
 
-        return task_output_set, time
\ No newline at end of file
+        return sorted(task_output_set, key=lambda x: x['key']), time
+    
+    async def stream_generate(self, task: str, keyed_input_set: Iterable[Tuple[Any, Dict[str, Any]]], checkpoint: Checkpoint=None) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming generation
+
+        Batches run in a worker thread so the event loop keeps evaluating earlier outputs
+        while the engine generates the next batch. With an engine pool, up to two batches per
+        worker are in flight and finished batches are yielded in completion order. Failed inputs
+        are held back and re-submitted once at the end before they are yielded.
+        """
+        keyed_inputs = []
+        match_input_with_key = dict()
+        failed_task_output_set = []
+        batch_index = 0
+        # The input set is consumed lazily, so its size is unknown; a whole-set window is capped here
+        chunk_size = self._chunk_size(num_of_inputs=STREAM_WINDOW_SIZE)
+        engine_pool = self._load_engine_pool()
+
+        def hold_back_failures(task_outputs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            # Failed outputs wait for the final sweep; the inputs of the others are released
+            succeeded_task_outputs = []
+            for task_output in task_outputs:
+                if task_output.get('error'):
+                    failed_task_output_set.append(task_output)
+                else:
+                    del match_input_with_key[task_output['key']]
+                    succeeded_task_outputs.append(task_output)
+            return succeeded_task_outputs
+
+        async def dispatch(keyed_inputs: List[Tuple[Any, Dict[str, Any]]], batch_index: int, max_pending: int) -> AsyncIterator[Dict[str, Any]]:
+            if engine_pool is None:
+                for task_output in hold_back_failures(await asyncio.to_thread(self._generate_batch, task, keyed_inputs, batch_index, checkpoint)):
+                    yield task_output
+                return
+
+            if keyed_inputs:
+                self._submit_batch(engine_pool=engine_pool, task=task, keyed_inputs=keyed_inputs, batch_index=batch_index)
+
+            while engine_pool.num_of_pending > max_pending:
+                for task_output in hold_back_failures(await asyncio.to_thread(self._gather_batch, engine_pool, checkpoint)):
+                    yield task_output
+
+        try:
+            for key, task_input in keyed_input_set:
+                if checkpoint is not None and key in checkpoint:
+                    yield checkpoint[key]
+                    continue
+
+                keyed_inputs.append((key, task_input))
+                match_input_with_key[key] = task_input
+
+                if len(keyed_inputs) == chunk_size:
+                    async for task_output in dispatch(keyed_inputs=keyed_inputs, batch_index=batch_index, max_pending=2 * self.num_of_workers - 1):
+                        yield task_output
+                    keyed_inputs = []
+                    batch_index += chunk_size
+
+            if keyed_inputs or engine_pool is not None:
+                async for task_output in dispatch(keyed_inputs=keyed_inputs, batch_index=batch_index, max_pending=0):
+                    yield task_output
+
+            for task_output in await asyncio.to_thread(self._sweep_failures, task, failed_task_output_set, match_input_with_key, engine_pool, checkpoint):
+                yield task_output
+
+        finally:
+            if engine_pool is not None:
+                engine_pool.close()
+
+
+if __name__ == 'utils_vllm._vllm_generator':
+    STREAM_WINDOW_SIZE = 256
\ No newline at end of file